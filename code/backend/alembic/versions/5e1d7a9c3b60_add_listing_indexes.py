@@ -0,0 +1,30 @@
+"""add_listing_indexes
+
+Revision ID: 5e1d7a9c3b60
+Revises: 9b2f6c1d8e47
+Create Date: 2026-10-19 18:42:11.305927
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5e1d7a9c3b60'
+down_revision: Union[str, Sequence[str], None] = '9b2f6c1d8e47'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index(op.f('ix_rag_members_user_id'), 'rag_members', ['user_id'], unique=False)
+    op.create_index('ix_tasks_rag_id_id', 'tasks', ['rag_id', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_tasks_rag_id_id', table_name='tasks')
+    op.drop_index(op.f('ix_rag_members_user_id'), table_name='rag_members')
@@ -0,0 +1,38 @@
+"""add_cycle_task_indexes
+
+Revision ID: 7c4f2e9a1d35
+Revises: 5e1d7a9c3b60
+Create Date: 2026-10-19 19:27:48.611204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7c4f2e9a1d35'
+down_revision: Union[str, Sequence[str], None] = '5e1d7a9c3b60'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('ix_upload_cycles_rag_id_status_id', 'upload_cycles', ['rag_id', 'status', 'id'], unique=False)
+    op.create_index(op.f('ix_tasks_cycle_id'), 'tasks', ['cycle_id'], unique=False)
+    op.create_index(
+        'ix_tasks_rag_id_active',
+        'tasks',
+        ['rag_id'],
+        unique=False,
+        postgresql_where=sa.text("status IN ('pending', 'running')"),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_tasks_rag_id_active', table_name='tasks', postgresql_where=sa.text("status IN ('pending', 'running')"))
+    op.drop_index(op.f('ix_tasks_cycle_id'), table_name='tasks')
+    op.drop_index('ix_upload_cycles_rag_id_status_id', table_name='upload_cycles')
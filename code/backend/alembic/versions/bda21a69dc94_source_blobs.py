@@ -0,0 +1,95 @@
+"""source_blobs
+
+Revision ID: bda21a69dc94
+Revises: d5a89d7dd669
+Create Date: 2026-10-19 12:47:05.092311
+
+"""
+import hashlib
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import zstandard
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'bda21a69dc94'
+down_revision: Union[str, Sequence[str], None] = 'd5a89d7dd669'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+CHUNK_BYTES = 1024 * 1024
+
+
+def upgrade() -> None:
+    """Upgrade schema: source_blobs + chunks, перенос upload_cycles.source_content в блобы."""
+    op.create_table('source_blobs',
+    sa.Column('sha256', sa.Text(), nullable=False),
+    sa.Column('size', sa.BigInteger(), nullable=False),
+    sa.Column('stored_size', sa.BigInteger(), nullable=False),
+    sa.Column('codec', sa.Text(), nullable=False),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default='now()', nullable=False),
+    sa.PrimaryKeyConstraint('sha256')
+    )
+    op.create_table('source_blob_chunks',
+    sa.Column('sha256', sa.Text(), nullable=False),
+    sa.Column('seq', sa.Integer(), nullable=False),
+    sa.Column('data', sa.LargeBinary(), nullable=False),
+    sa.ForeignKeyConstraint(['sha256'], ['source_blobs.sha256'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('sha256', 'seq')
+    )
+
+    conn = op.get_bind()
+    ids = [row[0] for row in conn.execute(sa.text(
+        "SELECT id FROM upload_cycles WHERE source_content IS NOT NULL ORDER BY id"
+    ))]
+    cctx = zstandard.ZstdCompressor(level=3)
+    for cycle_id in ids:
+        content = conn.execute(
+            sa.text("SELECT source_content FROM upload_cycles WHERE id = :id"), {"id": cycle_id}
+        ).scalar_one()
+        raw = content.encode("utf-8")
+        sha = hashlib.sha256(raw).hexdigest()
+        compressed = cctx.compress(raw)
+        created = conn.execute(
+            sa.text(
+                "INSERT INTO source_blobs (sha256, size, stored_size, codec) "
+                "VALUES (:sha, :size, :stored, 'zstd') ON CONFLICT (sha256) DO NOTHING"
+            ),
+            {"sha": sha, "size": len(raw), "stored": len(compressed)},
+        ).rowcount
+        if created:
+            for seq, start in enumerate(range(0, len(compressed), CHUNK_BYTES)):
+                conn.execute(
+                    sa.text("INSERT INTO source_blob_chunks (sha256, seq, data) VALUES (:sha, :seq, :data)"),
+                    {"sha": sha, "seq": seq, "data": compressed[start:start + CHUNK_BYTES]},
+                )
+        conn.execute(
+            sa.text("UPDATE upload_cycles SET source_sha256 = :sha, source_size = :size WHERE id = :id"),
+            {"sha": sha, "size": len(raw), "id": cycle_id},
+        )
+    op.drop_column('upload_cycles', 'source_content')
+
+
+def downgrade() -> None:
+    """Downgrade schema: вернуть source_content из блобов."""
+    op.add_column('upload_cycles', sa.Column('source_content', sa.Text(), nullable=True))
+    conn = op.get_bind()
+    rows = list(conn.execute(sa.text(
+        "SELECT id, source_sha256 FROM upload_cycles WHERE source_sha256 IS NOT NULL ORDER BY id"
+    )))
+    dctx = zstandard.ZstdDecompressor()
+    for cycle_id, sha in rows:
+        chunks = [row[0] for row in conn.execute(
+            sa.text("SELECT data FROM source_blob_chunks WHERE sha256 = :sha ORDER BY seq"), {"sha": sha}
+        )]
+        if not chunks:
+            continue
+        raw = dctx.decompressobj().decompress(b"".join(chunks))
+        conn.execute(
+            sa.text("UPDATE upload_cycles SET source_content = :content WHERE id = :id"),
+            {"content": raw.decode("utf-8"), "id": cycle_id},
+        )
+    op.drop_table('source_blob_chunks')
+    op.drop_table('source_blobs')
@@ -1,30 +1,111 @@
-"""Утилиты аутентификации: bcrypt и JWT."""
+"""
+Утилиты аутентификации: bcrypt и JWT.
+bcrypt (сотни мс CPU на проверку) выполняется в отдельном пуле процессов (password_hash_workers),
+чтобы всплеск входов не держал GIL и потоки sync-эндпоинтов. Стоимость — bcrypt_rounds;
+хеш с другой стоимостью пересчитывается при успешном входе (verify_and_update_password).
+
+Refresh-токены отзываемы: вход открывает семейство (fam) — в Redis refresh:fam:<fam> хранится jti
+единственного действующего токена семейства, TTL — до абсолютного exp, заданного при входе. Обмен
+(rotate_refresh_token) одноразовый: выдаёт токен с новым jti и тем же exp; повтор уже обменянного
+токена (утечка) отзывает всё семейство. Выход — revoke_refresh_token / revoke_user_refresh_tokens.
+"""
+import multiprocessing
+import threading
+import uuid
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime, timedelta, timezone
+from functools import lru_cache
 
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 
 from app.config import get_settings
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+ACCESS_TOKEN_TYPE = "access"
+REFRESH_TOKEN_TYPE = "refresh"
+# Redis: семейство refresh-токенов → jti действующего; пользователь → его семейства (выход со всех устройств)
+REFRESH_FAMILY_KEY = "refresh:fam:{}"
+REFRESH_USER_KEY = "refresh:user:{}"
+# Обмен jti семейства атомарно: совпал — новый jti (TTL сохраняется); не совпал — повтор, семейство отзывается
+_ROTATE_SCRIPT = """
+local current = redis.call('GET', KEYS[1])
+if current == ARGV[1] then
+  redis.call('SET', KEYS[1], ARGV[2], 'KEEPTTL')
+  return 1
+end
+if current then
+  redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+_pool: ProcessPoolExecutor | None = None
+_pool_lock = threading.Lock()
+
+
+@lru_cache
+def _crypt_context(rounds: int) -> CryptContext:
+    """Контекст bcrypt с фиксированной стоимостью: хеш с иной стоимостью needs_update."""
+    return CryptContext(
+        schemes=["bcrypt"],
+        deprecated="auto",
+        bcrypt__default_rounds=rounds,
+        bcrypt__min_rounds=rounds,
+        bcrypt__max_rounds=rounds,
+    )
+
+
+def _hash(plain: str, rounds: int) -> str:
+    return _crypt_context(rounds).hash(plain)
+
+
+def _verify_and_update(plain: str, hashed: str, rounds: int) -> tuple[bool, str | None]:
+    return _crypt_context(rounds).verify_and_update(plain, hashed)
+
+
+def _run(fn, *args):
+    """Выполнить fn(*args) в пуле процессов bcrypt (при password_hash_workers = 0 — в текущем потоке)."""
+    global _pool
+    workers = get_settings().password_hash_workers
+    if workers <= 0:
+        return fn(*args)
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                # spawn: fork процесса с потоками uvicorn/redis небезопасен
+                _pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+    return _pool.submit(fn, *args).result()
+
+
+def shutdown_password_pool() -> None:
+    """Остановить пул процессов bcrypt (lifespan приложения)."""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
 
 
 def hash_password(plain: str) -> str:
-    """Хеширование пароля (bcrypt)."""
-    return pwd_context.hash(plain)
+    """Хеширование пароля (bcrypt, стоимость bcrypt_rounds)."""
+    return _run(_hash, plain, get_settings().bcrypt_rounds)
+
+
+def verify_and_update_password(plain: str, hashed: str) -> tuple[bool, str | None]:
+    """Проверка пароля; второй элемент — новый хеш, если стоимость хеша отличается от bcrypt_rounds."""
+    return _run(_verify_and_update, plain, hashed, get_settings().bcrypt_rounds)
 
 
 def verify_password(plain: str, hashed: str) -> bool:
     """Проверка пароля против хеша."""
-    return pwd_context.verify(plain, hashed)
+    return verify_and_update_password(plain, hashed)[0]
 
 
-def create_access_token(data: dict) -> str:
-    """Создание JWT. В data обычно передают sub (user_id). exp = now + jwt_expire_minutes."""
+def _create_token(data: dict, token_type: str, expires_at: datetime) -> str:
     settings = get_settings()
     to_encode = data.copy()
-    expire = datetime.now(timezone.utc) + timedelta(minutes=settings.jwt_expire_minutes)
-    to_encode["exp"] = expire
+    to_encode["exp"] = expires_at
+    to_encode["typ"] = token_type
     return jwt.encode(
         to_encode,
         settings.jwt_secret,
@@ -32,11 +113,86 @@ def create_access_token(data: dict) -> str:
     )
 
 
-def decode_access_token(token: str) -> dict:
-    """Декодирование JWT и проверка exp. При невалидном/истёкшем токене — JWTError."""
+def create_access_token(data: dict) -> str:
+    """Создание JWT. В data обычно передают sub (user_id). exp = now + jwt_expire_minutes."""
+    expires_at = datetime.now(timezone.utc) + timedelta(minutes=get_settings().jwt_expire_minutes)
+    return _create_token(data, ACCESS_TOKEN_TYPE, expires_at)
+
+
+def create_refresh_token(data: dict, family: str, jti: str, expires_at: datetime) -> str:
+    """Refresh-токен (JWT typ=refresh) семейства family: обмен на новый access без пароля."""
+    return _create_token({**data, "fam": family, "jti": jti}, REFRESH_TOKEN_TYPE, expires_at)
+
+
+def _decode(token: str) -> dict:
     settings = get_settings()
     return jwt.decode(
         token,
         settings.jwt_secret,
         algorithms=[settings.jwt_algorithm],
     )
+
+
+def decode_access_token(token: str) -> dict:
+    """
+    Декодирование JWT и проверка exp. При невалидном/истёкшем токене — JWTError.
+    Refresh-токен как access не принимается (токены без typ — выданные до refresh — принимаются).
+    """
+    payload = _decode(token)
+    if payload.get("typ", ACCESS_TOKEN_TYPE) != ACCESS_TOKEN_TYPE:
+        raise JWTError("not an access token")
+    return payload
+
+
+def decode_refresh_token(token: str) -> dict:
+    """Декодирование refresh-токена. Не refresh, невалидный или истёкший — JWTError."""
+    payload = _decode(token)
+    if payload.get("typ") != REFRESH_TOKEN_TYPE:
+        raise JWTError("not a refresh token")
+    return payload
+
+
+def issue_refresh_token(r, user_id: int) -> str:
+    """Вход: новое семейство refresh-токенов, exp = now + jwt_refresh_expire_days (дальше не продлевается)."""
+    family, jti = uuid.uuid4().hex, uuid.uuid4().hex
+    ttl = timedelta(days=get_settings().jwt_refresh_expire_days)
+    expires_at = datetime.now(timezone.utc) + ttl
+    user_key = REFRESH_USER_KEY.format(user_id)
+    pipe = r.pipeline()
+    pipe.set(REFRESH_FAMILY_KEY.format(family), jti, exat=int(expires_at.timestamp()))
+    pipe.sadd(user_key, family)
+    pipe.expire(user_key, ttl)
+    pipe.execute()
+    return create_refresh_token({"sub": str(user_id)}, family, jti, expires_at)
+
+
+def rotate_refresh_token(r, payload: dict) -> str | None:
+    """
+    Обменять refresh-токен (payload — decode_refresh_token) на следующий того же семейства с тем же exp.
+    None — токен отозван, истёк или уже обменян (тогда семейство отзывается целиком).
+    """
+    family, jti = payload.get("fam"), payload.get("jti")
+    if not family or not jti:
+        return None
+    new_jti = uuid.uuid4().hex
+    if not r.eval(_ROTATE_SCRIPT, 1, REFRESH_FAMILY_KEY.format(family), jti, new_jti):
+        return None
+    expires_at = datetime.fromtimestamp(payload["exp"], timezone.utc)
+    return create_refresh_token({"sub": payload["sub"]}, family, new_jti, expires_at)
+
+
+def revoke_refresh_token(r, payload: dict) -> None:
+    """Выход: отозвать семейство токена (токены других входов пользователя действуют)."""
+    family = payload.get("fam")
+    if family:
+        pipe = r.pipeline()
+        pipe.delete(REFRESH_FAMILY_KEY.format(family))
+        pipe.srem(REFRESH_USER_KEY.format(payload["sub"]), family)
+        pipe.execute()
+
+
+def revoke_user_refresh_tokens(r, user_id: int) -> None:
+    """Отозвать все refresh-токены пользователя (выход со всех устройств)."""
+    user_key = REFRESH_USER_KEY.format(user_id)
+    families = r.smembers(user_key)
+    r.delete(user_key, *(REFRESH_FAMILY_KEY.format(f) for f in families))
@@ -0,0 +1,226 @@
+"""
+Кэш авторизации: пользователь по sub из JWT и доступ к RAG (владелец или роль участника) — в памяти
+процесса с коротким TTL, чтобы проверки на горячем пути (чат, опрос задач, WebSocket) не ходили в БД.
+Изменения (участники, удаление RAG) сбрасывают записи локально и публикуются в Redis-канал
+authz:invalidate — остальные процессы API сбрасывают их у себя (AuthzInvalidationListener).
+Если Redis недоступен, устаревание ограничено TTL.
+"""
+import asyncio
+import contextlib
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Callable, Hashable
+
+import redis.asyncio as redis
+from sqlalchemy.orm import Session
+
+from app.config import get_settings
+from app.models import RagInstance, RagMember, User
+from app.task_events import get_sync_redis
+
+logger = logging.getLogger(__name__)
+
+AUTHZ_CHANNEL = "authz:invalidate"
+# Пауза перед переподключением listener после ошибки Redis
+RECONNECT_DELAY_SEC = 1.0
+
+_MISSING = object()
+
+
+class TTLCache:
+    """LRU-словарь с TTL записей (потокобезопасный: sync-эндпоинты выполняются в пуле потоков)."""
+
+    def __init__(self, ttl: float, max_entries: int) -> None:
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._data: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+        self._lock = threading.Lock()
+        # Счётчик сбросов: значение, прочитанное из БД до сброса, не должно попасть в кэш после него
+        self.generation = 0
+
+    def get(self, key: Hashable) -> Any:
+        """Значение или _MISSING (нет записи или истёк TTL)."""
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return _MISSING
+            expires, value = item
+            if expires < time.monotonic():
+                del self._data[key]
+                return _MISSING
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key: Hashable, value: Any, generation: int) -> None:
+        """Записать значение, прочитанное при данном generation (пропустить, если с тех пор был сброс)."""
+        if self.ttl <= 0:
+            return
+        with self._lock:
+            if generation != self.generation:
+                return
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def discard(self, match: Callable[[Hashable], bool]) -> None:
+        """Удалить записи с ключами, для которых match(key) истинно."""
+        with self._lock:
+            self.generation += 1
+            for key in [k for k in self._data if match(k)]:
+                del self._data[key]
+
+    def clear(self) -> None:
+        with self._lock:
+            self.generation += 1
+            self._data.clear()
+
+
+@dataclass(frozen=True)
+class RagAccess:
+    """Доступ пользователя к RAG: достаточно для проверок и чата без загрузки RagInstance."""
+
+    id: int
+    owner_id: int
+    fuseki_dataset: str
+    role: str  # owner | editor | viewer
+
+
+# ("user", user_id) → поля User; ("rag", rag_id) → (owner_id, fuseki_dataset); ("member", rag_id, user_id) → роль | None
+_cache = TTLCache(get_settings().authz_cache_ttl_sec, get_settings().authz_cache_max_entries)
+
+_USER_FIELDS = ("id", "email", "password_hash", "display_name", "created_at")
+
+
+def get_user(db: Session, user_id: int) -> User | None:
+    """
+    Пользователь по id: из кэша — новый несвязанный с сессией User (без обращения к БД),
+    иначе db.get. Отсутствующий пользователь не кэшируется.
+    """
+    key = ("user", user_id)
+    fields = _cache.get(key)
+    if fields is not _MISSING:
+        return User(**fields)
+    generation = _cache.generation
+    user = db.get(User, user_id)
+    if user is None:
+        return None
+    _cache.set(key, {f: getattr(user, f) for f in _USER_FIELDS}, generation)
+    return user
+
+
+def rag_access(db: Session, user_id: int, rag_id: int) -> RagAccess | None:
+    """Доступ пользователя к RAG (владелец или участник) или None. На попадании в кэш — без БД."""
+    key = ("rag", rag_id)
+    rag = _cache.get(key)
+    if rag is _MISSING:
+        generation = _cache.generation
+        row = db.get(RagInstance, rag_id)
+        if row is None:
+            return None
+        rag = (row.owner_id, row.fuseki_dataset)
+        _cache.set(key, rag, generation)
+    owner_id, fuseki_dataset = rag
+    if owner_id == user_id:
+        return RagAccess(rag_id, owner_id, fuseki_dataset, "owner")
+    key = ("member", rag_id, user_id)
+    role = _cache.get(key)
+    if role is _MISSING:
+        generation = _cache.generation
+        member = db.get(RagMember, (rag_id, user_id))
+        role = member.role if member else None
+        # Отказ тоже кэшируется: сбрасывается invalidate_member при добавлении участника
+        _cache.set(key, role, generation)
+    if role is None:
+        return None
+    return RagAccess(rag_id, owner_id, fuseki_dataset, role)
+
+
+def _apply(message: dict) -> None:
+    rag_id = message.get("rag_id")
+    user_id = message.get("user_id")
+    if rag_id is not None and user_id is not None:
+        _cache.discard(lambda k: k == ("member", rag_id, user_id))
+    elif rag_id is not None:
+        _cache.discard(lambda k: k[0] in ("rag", "member") and k[1] == rag_id)
+    elif user_id is not None:
+        _cache.discard(lambda k: k == ("user", user_id) or (k[0] == "member" and k[2] == user_id))
+    else:
+        _cache.clear()
+
+
+def _invalidate(message: dict) -> None:
+    """Сбросить записи у себя и разослать сброс остальным процессам API."""
+    _apply(message)
+    try:
+        get_sync_redis().publish(AUTHZ_CHANNEL, json.dumps(message))
+    except Exception:
+        logger.warning("failed to publish authz invalidation %s", message, exc_info=True)
+
+
+def invalidate_member(rag_id: int, user_id: int) -> None:
+    """Изменилось участие user_id в RAG (добавлен, удалён, сменилась роль)."""
+    _invalidate({"rag_id": rag_id, "user_id": user_id})
+
+
+def invalidate_rag(rag_id: int) -> None:
+    """RAG удалён или сменился владелец: сбросить RAG и всех его участников."""
+    _invalidate({"rag_id": rag_id})
+
+
+def invalidate_user(user_id: int) -> None:
+    """Изменился или удалён пользователь."""
+    _invalidate({"user_id": user_id})
+
+
+class AuthzInvalidationListener:
+    """Подписка процесса API на authz:invalidate (start/stop из lifespan, как TaskStatusHub)."""
+
+    def __init__(self) -> None:
+        self._redis: redis.Redis | None = None
+        self._listener: asyncio.Task | None = None
+
+    async def start(self, redis_url: str) -> None:
+        self._redis = redis.from_url(redis_url, decode_responses=True)
+        self._listener = asyncio.create_task(self._listen())
+
+    async def stop(self) -> None:
+        if self._listener is not None:
+            self._listener.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._listener
+            self._listener = None
+        if self._redis is not None:
+            await self._redis.aclose()
+            self._redis = None
+
+    async def _listen(self) -> None:
+        while True:
+            pubsub = self._redis.pubsub(ignore_subscribe_messages=True)
+            try:
+                await pubsub.subscribe(AUTHZ_CHANNEL)
+                # Сообщения, пропущенные до (пере)подключения, не придут — начать с чистого кэша
+                _cache.clear()
+                async for message in pubsub.listen():
+                    if message.get("type") != "message":
+                        continue
+                    try:
+                        payload = json.loads(message.get("data") or "{}")
+                    except json.JSONDecodeError:
+                        payload = {}
+                    _apply(payload if isinstance(payload, dict) else {})
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("authz invalidation listener failed, reconnecting")
+                await asyncio.sleep(RECONNECT_DELAY_SEC)
+            finally:
+                with contextlib.suppress(Exception):
+                    await pubsub.aclose()
+
+
+authz_listener = AuthzInvalidationListener()
@@ -1,35 +1,37 @@
-"""Отправка Celery-цепочки обновления RAG по имени задачи (без импорта worker-пакета)."""
-from celery import Celery, chain
+"""Отправка Celery-задач worker по имени (без импорта worker-пакета)."""
+from celery import Celery
 
 from app.config import get_settings
 
+# Имя задачи → очередь worker (как worker.celery_app.TASK_QUEUES)
+TASK_QUEUES = {
+    "worker.tasks.scheduler_task.schedule_cycles": "io",
+    "worker.tasks.workdir_task.archive_cycle": "io",
+    "worker.tasks.workdir_task.cleanup_work_dir": "io",
+}
+
 
 def _get_celery() -> Celery:
     s = get_settings()
     return Celery(broker=s.celery_broker_url, backend=s.celery_result_backend)
 
 
-def send_update_chain(rag_id: int, cycle_id: int, task_id: int, input_file: str) -> None:
-    """Запустить цепочку: run_graphrag → run_schema_induction → do_merge → load_to_staging."""
-    app = _get_celery()
-    chain(
-        app.signature(
-            "worker.tasks.graphrag_task.run_graphrag",
-            args=[rag_id, cycle_id, task_id, input_file],
-        ),
-        app.signature(
-            "worker.tasks.schema_task.run_schema_induction",
-            args=[rag_id, cycle_id, task_id],
-            immutable=True,
-        ),
-        app.signature(
-            "worker.tasks.merge_task.do_merge",
-            args=[rag_id, cycle_id, task_id],
-            immutable=True,
-        ),
-        app.signature(
-            "worker.tasks.staging_task.load_to_staging",
-            args=[rag_id, cycle_id, task_id],
-            immutable=True,
-        ),
-    ).apply_async()
+def send_schedule_cycles(rag_id: int) -> None:
+    """
+    Попросить worker запустить ожидающий цикл RAG, если активного нет (worker.tasks.scheduler_task).
+    Цепочку run_graphrag → run_schema_induction → do_merge → load_to_staging запускает worker.
+    """
+    name = "worker.tasks.scheduler_task.schedule_cycles"
+    _get_celery().send_task(name, args=[rag_id], queue=TASK_QUEUES[name])
+
+
+def send_archive_cycle(rag_id: int, cycle_id: int) -> None:
+    """После approve: снимок prod цикла в cas worker, каталог цикла удаляется (worker.tasks.workdir_task)."""
+    name = "worker.tasks.workdir_task.archive_cycle"
+    _get_celery().send_task(name, args=[rag_id, cycle_id], queue=TASK_QUEUES[name])
+
+
+def send_cleanup_work_dir() -> None:
+    """Очистка work_dir worker: каталоги удалённых RAG, квота (worker.tasks.workdir_task)."""
+    name = "worker.tasks.workdir_task.cleanup_work_dir"
+    _get_celery().send_task(name, queue=TASK_QUEUES[name])
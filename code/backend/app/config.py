@@ -1,6 +1,7 @@
 """Настройки приложения из переменных окружения (.env)."""
 from functools import lru_cache
 from pathlib import Path
+from typing import Literal
 
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
@@ -15,14 +16,46 @@ class Settings(BaseSettings):
     )
 
     database_url: str
+    # Пул соединений на процесс (см. app.db): uvicorn-процессов × (pool_size + max_overflow) [× 2 при db_async]
+    # + соединения worker'ов должно укладываться в max_connections PostgreSQL
+    db_pool_size: int = 10
+    db_max_overflow: int = 10
+    db_pool_timeout: float = 10.0
+    db_pool_recycle: int = 1800
+    db_statement_timeout_ms: int = 30000
+    # Async engine (asyncpg) для async-кода: upload, WebSocket; без него — sync-сессия в пуле потоков
+    db_async: bool = False
     jwt_secret: str
     jwt_algorithm: str = "HS256"
     jwt_expire_minutes: int = 60
+    # Refresh-токены (POST /auth/refresh): клиент продлевает access без повторного входа
+    jwt_refresh_expire_days: int = 14
+    # bcrypt: стоимость (хеши с другой стоимостью пересчитываются при входе) и процессы пула; 0 — в потоке запроса
+    bcrypt_rounds: int = 12
+    password_hash_workers: int = 2
+    # Кэш авторизации (app.authz): пользователь и доступ к RAG в памяти процесса; 0 — без кэша
+    authz_cache_ttl_sec: float = 30.0
+    authz_cache_max_entries: int = 10000
     fuseki_url: str
     fuseki_user: str
     fuseki_password: str
+    # Раскладка staging в Fuseki (должна совпадать с worker):
+    # datasets — отдельные датасеты -triples/-ontology/staging на каждый цикл;
+    # graphs — один датасет на RAG, цикл пишет named graphs urn:ferag:cycle:N:triples|ontology
+    fuseki_layout: Literal["datasets", "graphs"] = "datasets"
     # Базовый каталог рабочих файлов (должен совпадать с worker для upload → chain)
     work_dir: Path = Path("/tmp/ferag")
+    # Загрузка исходников: лимит размера файла и размер чанка потокового копирования на диск
+    upload_max_bytes: int = 200 * 1024 * 1024
+    upload_chunk_bytes: int = 1024 * 1024
+    # Пакетная загрузка (POST /rags/{id}/upload/bulk: файлы и/или архивы → один цикл):
+    # лимиты числа документов и суммарного размера (распакованного) на запрос
+    upload_bulk_max_documents: int = 5000
+    upload_bulk_max_bytes: int = 2 * 1024 * 1024 * 1024
+    # Сохранять исходник в БД (source_blobs, zstd + дедупликация по SHA-256) — нужно,
+    # если worker не видит work_dir backend
+    store_source_in_db: bool = True
+    source_zstd_level: int = 3
     # Redis (pub/sub для WebSocket статусов задач; тот же инстанс, что и Celery broker)
     redis_url: str = "redis://localhost:6379/0"
     celery_broker_url: str = "redis://localhost:6379/0"
@@ -30,6 +63,16 @@ class Settings(BaseSettings):
     # LLM для RAG-чата (LM Studio или OpenAI-совместимый)
     llm_api_url: str = "http://host.docker.internal:41234/v1"
     llm_model: str = "lmstudio-community/Meta-Llama-3.3-70B-Instruct-UDLQ4_K_M"
+    # Несколько LLM (балансировка и failover, см. graphrag-test/llm_router.py):
+    # "url;weight=2;max=4,url2;max=2"; пусто — только llm_api_url
+    llm_endpoints: str = ""
+    # Бюджет контекста чата в токенах (rag_context.pack_context: ранжирование и обрезка описаний); 0 — без ограничения
+    chat_context_token_budget: int = 1500
+    # POST /rags/{id}/chat/batch: вопросов в запросе и одновременных вызовов LLM
+    chat_batch_max_questions: int = 1000
+    chat_batch_concurrency: int = 8
+    # Импортировать модули чата (rag_context, rag_llm, llm_router) при старте процесса API
+    chat_preload: bool = True
 
 
 @lru_cache
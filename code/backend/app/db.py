@@ -1,19 +1,89 @@
-"""SQLAlchemy engine, сессия и FastAPI dependency для БД."""
+"""
+SQLAlchemy engine, сессия и FastAPI dependency для БД.
+Пул: db_pool_size + db_max_overflow соединений на процесс uvicorn (и столько же у async engine, если
+db_async). Sync-эндпоинты выполняются в пуле потоков (40 по умолчанию) — лишние сессии ждут соединение
+до db_pool_timeout, а не открывают новые сверх max_connections PostgreSQL.
+"""
+from typing import Any, Callable, TypeVar
+
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
 from sqlalchemy.orm import Session, declarative_base, sessionmaker
+from starlette.concurrency import run_in_threadpool
 
 from app.config import get_settings
+from app.metrics import span
+
+T = TypeVar("T")
 
 settings = get_settings()
-engine = create_engine(settings.database_url)
+
+
+def _pool_kwargs() -> dict:
+    return {
+        "pool_size": settings.db_pool_size,
+        "max_overflow": settings.db_max_overflow,
+        "pool_timeout": settings.db_pool_timeout,
+        "pool_recycle": settings.db_pool_recycle,
+        "pool_pre_ping": True,
+    }
+
+
+def _connect_args() -> dict:
+    """statement_timeout для соединений psycopg2 (зависший запрос не держит соединение пула)."""
+    if settings.db_statement_timeout_ms <= 0 or not make_url(settings.database_url).drivername.startswith("postgresql"):
+        return {}
+    return {"options": f"-c statement_timeout={settings.db_statement_timeout_ms}"}
+
+
+engine = create_engine(settings.database_url, connect_args=_connect_args(), **_pool_kwargs())
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
+# Async engine (asyncpg) для async-кода (upload, WebSocket) — только при db_async
+async_engine = None
+AsyncSessionLocal = None
+if settings.db_async:
+    from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+    _server_settings = (
+        {"statement_timeout": str(settings.db_statement_timeout_ms)} if settings.db_statement_timeout_ms > 0 else {}
+    )
+    async_engine = create_async_engine(
+        make_url(settings.database_url).set(drivername="postgresql+asyncpg"),
+        connect_args={"server_settings": _server_settings},
+        **_pool_kwargs(),
+    )
+    AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
 
 def get_db():
-    """FastAPI dependency: сессия БД с гарантированным close."""
+    """FastAPI dependency: сессия БД с гарантированным close (время жизни сессии — span db_session)."""
+    with span("db_session"):
+        db = SessionLocal()
+        try:
+            yield db
+        finally:
+            db.close()
+
+
+def _run_in_session(fn: Callable[..., T], *args: Any) -> T:
     db = SessionLocal()
     try:
-        yield db
+        return fn(db, *args)
     finally:
         db.close()
+
+
+async def run_db(fn: Callable[..., T], *args: Any) -> T:
+    """
+    Выполнить fn(session, *args) из async-кода, не блокируя event loop: при db_async — через
+    AsyncSession.run_sync (asyncpg, без потока), иначе — sync-сессия в пуле потоков.
+    fn — короткая работа с БД (без тяжёлого CPU: при db_async она выполняется в event loop);
+    возвращать лучше простые значения — сессия закрывается сразу после вызова.
+    """
+    with span("db_session"):
+        if AsyncSessionLocal is not None:
+            async with AsyncSessionLocal() as db:
+                return await db.run_sync(fn, *args)
+        return await run_in_threadpool(_run_in_session, fn, *args)
@@ -1,10 +1,11 @@
-"""FastAPI dependencies: БД и текущий пользователь."""
+"""FastAPI dependencies: БД и текущий пользователь (через кэш app.authz — без запроса к БД на попадании)."""
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import JWTError
 from sqlalchemy.orm import Session
 
 from app.auth import decode_access_token
+from app.authz import get_user
 from app.db import get_db
 from app.models import User
 
@@ -26,7 +27,7 @@ def get_current_user_ws(token: str, db: Session) -> User:
         user_id = int(sub)
     except (JWTError, ValueError, TypeError):
         raise WebSocketException(code=1008, reason="Invalid or missing token")
-    user = db.get(User, user_id)
+    user = get_user(db, user_id)
     if user is None:
         raise WebSocketException(code=1008, reason="User not found")
     return user
@@ -50,7 +51,7 @@ def get_current_user(
         user_id = int(sub)
     except (JWTError, ValueError):
         raise credentials_exception
-    user = db.get(User, user_id)
+    user = get_user(db, user_id)
     if user is None:
         raise credentials_exception
     return user
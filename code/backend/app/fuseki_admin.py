@@ -2,6 +2,7 @@
 import httpx
 
 from app.config import get_settings
+from app.metrics import observe_bytes, span
 
 
 def _client(timeout: float = 30.0) -> httpx.Client:
@@ -72,12 +73,41 @@ def rag_ontology_dataset(rag_id: int, cycle_n: int) -> str:
     return f"ferag-{rag_id:05d}-new-{cycle_n:05d}-ontology"
 
 
+def rag_cycle_graph(cycle_n: int, kind: str) -> str:
+    """Named graph цикла в prod-датасете (layout=graphs): urn:ferag:cycle:1:triples, urn:ferag:cycle:1:ontology."""
+    return f"urn:ferag:cycle:{cycle_n}:{kind}"
+
+
+def promote_cycle_graphs_update(cycle_n: int) -> str:
+    """
+    SPARQL Update для approve при layout=graphs: default graph prod заменяется триплетами цикла,
+    к нему добавляется онтология, named graphs цикла удаляются. Выполняется одним запросом
+    (одна транзакция Fuseki). SILENT: отсутствующий граф цикла не ошибка (как пустой TTL в layout=datasets).
+    """
+    tri = rag_cycle_graph(cycle_n, "triples")
+    ont = rag_cycle_graph(cycle_n, "ontology")
+    return (
+        "CLEAR SILENT DEFAULT ;\n"
+        f"MOVE SILENT GRAPH <{tri}> TO DEFAULT ;\n"
+        f"ADD SILENT GRAPH <{ont}> TO DEFAULT ;\n"
+        f"DROP SILENT GRAPH <{ont}>"
+    )
+
+
+def drop_cycle_graphs_update(cycle_n: int) -> str:
+    """SPARQL Update для reject при layout=graphs: named graphs цикла удаляются, default graph prod не меняется."""
+    return (
+        f"DROP SILENT GRAPH <{rag_cycle_graph(cycle_n, 'triples')}> ;\n"
+        f"DROP SILENT GRAPH <{rag_cycle_graph(cycle_n, 'ontology')}>"
+    )
+
+
 def sparql_update(dataset_name: str, update_body: str) -> None:
     """Выполнить SPARQL Update (DELETE/INSERT) на датасете. POST /{dataset}/update."""
     s = get_settings()
     base = s.fuseki_url.rstrip("/")
     url = f"{base}/{dataset_name}/update"
-    with _client(timeout=120.0) as client:
+    with span("fuseki.sparql_update"), _client(timeout=120.0) as client:
         r = client.post(
             url,
             content=update_body,
@@ -92,7 +122,7 @@ def get_dataset_ttl(dataset_name: str) -> str:
     base = s.fuseki_url.rstrip("/")
     url = f"{base}/{dataset_name}/query"
     query = "CONSTRUCT { ?s ?p ?o } WHERE { ?s ?p ?o }"
-    with _client(timeout=120.0) as client:
+    with span("fuseki.get_dataset_ttl"), _client(timeout=120.0) as client:
         r = client.post(
             url,
             data={"query": query},
@@ -101,6 +131,7 @@ def get_dataset_ttl(dataset_name: str) -> str:
         if r.status_code == 404:
             return "# Empty dataset\n"
         r.raise_for_status()
+        observe_bytes("fuseki.get_dataset_ttl", len(r.content))
         return r.text or "# Empty\n"
 
 
@@ -109,10 +140,12 @@ def put_dataset_ttl(dataset_name: str, ttl_content: str) -> None:
     s = get_settings()
     base = s.fuseki_url.rstrip("/")
     url = f"{base}/{dataset_name}/data?default"
-    with _client(timeout=300.0) as client:
+    body = ttl_content.encode("utf-8")
+    observe_bytes("fuseki.put_dataset_ttl", len(body))
+    with span("fuseki.put_dataset_ttl"), _client(timeout=300.0) as client:
         r = client.put(
             url,
-            content=ttl_content,
+            content=body,
             headers={"Content-Type": "text/turtle; charset=utf-8"},
         )
         r.raise_for_status()
@@ -123,10 +156,12 @@ def post_dataset_ttl(dataset_name: str, ttl_content: str) -> None:
     s = get_settings()
     base = s.fuseki_url.rstrip("/")
     url = f"{base}/{dataset_name}/data?default"
-    with _client(timeout=300.0) as client:
+    body = ttl_content.encode("utf-8")
+    observe_bytes("fuseki.post_dataset_ttl", len(body))
+    with span("fuseki.post_dataset_ttl"), _client(timeout=300.0) as client:
         r = client.post(
             url,
-            content=ttl_content,
+            content=body,
             headers={"Content-Type": "text/turtle; charset=utf-8"},
         )
         r.raise_for_status()
@@ -1,7 +1,10 @@
 """FastAPI приложение ferag API."""
 import asyncio
-import json
+import importlib
+import logging
 import sys
+import time
+from contextlib import asynccontextmanager
 from pathlib import Path
 
 # graphrag-test для RAG-чата (rag_context, rag_llm)
@@ -10,17 +13,73 @@ _graphrag_test = _project_root / "graphrag-test"
 if _graphrag_test.exists() and str(_graphrag_test) not in sys.path:
     sys.path.insert(0, str(_graphrag_test))
 
-import redis.asyncio as redis
-from fastapi import FastAPI, Query, WebSocket, WebSocketDisconnect
+from fastapi import FastAPI, Query, Request, Response, WebSocket, WebSocketDisconnect
+from sqlalchemy.orm import Session
 
+from app.auth import shutdown_password_pool
+from app.authz import authz_listener, rag_access
 from app.config import get_settings
-from app.db import SessionLocal
+from app.db import async_engine, run_db
 from app.deps import get_current_user_ws
+from app.metrics import HTTP_REQUEST_SECONDS, render_metrics
 from app.models import Task
 from app.routers import auth as auth_router, rags as rags_router, tasks as tasks_router
-from app.routers.rags import _can_access_rag
+from app.task_events import task_status_hub
+
+logger = logging.getLogger(__name__)
+
+TERMINAL_STATUSES = ("done", "failed")
+# Модули RAG-чата (graphrag-test): импорт при старте процесса, а не на первом запросе чата
+CHAT_MODULES = ("llm_router", "rag_context", "rag_llm")
+
+
+def _preload_chat_modules() -> None:
+    for name in CHAT_MODULES:
+        try:
+            importlib.import_module(name)
+        except Exception:
+            logger.warning("preload of %s failed", name, exc_info=True)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Общие Redis listeners (статусы задач, сброс кэша авторизации) на время жизни процесса;
+    модули чата импортируются до приёма запросов (chat_preload).
+    """
+    if get_settings().chat_preload:
+        await asyncio.to_thread(_preload_chat_modules)
+    await task_status_hub.start(get_settings().redis_url)
+    await authz_listener.start(get_settings().redis_url)
+    try:
+        yield
+    finally:
+        await authz_listener.stop()
+        await task_status_hub.stop()
+        shutdown_password_pool()
+        if async_engine is not None:
+            await async_engine.dispose()
+
+
+app = FastAPI(title="ferag API", root_path="/ferag/api", lifespan=lifespan)
+
+
+@app.middleware("http")
+async def observe_request_latency(request: Request, call_next):
+    """Длительность запроса в гистограмму по шаблону маршрута (/rags/{rag_id}/chat, а не /rags/7/chat)."""
+    started = time.perf_counter()
+    status_code = 500
+    try:
+        response = await call_next(request)
+        status_code = response.status_code
+        return response
+    finally:
+        route = request.scope.get("route")
+        route_path = getattr(route, "path", None) or "unmatched"
+        HTTP_REQUEST_SECONDS.labels(request.method, route_path, str(status_code)).observe(
+            time.perf_counter() - started
+        )
 
-app = FastAPI(title="ferag API", root_path="/ferag/api")
 
 app.include_router(auth_router.router, prefix="/auth", tags=["auth"])
 app.include_router(rags_router.router, prefix="/rags", tags=["rags"])
@@ -33,6 +92,24 @@ def health():
     return {"status": "ok"}
 
 
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    """Prometheus: латентность HTTP и внутренних участков, замеры шагов цепочки (task_steps)."""
+    body, content_type = render_metrics()
+    return Response(content=body, media_type=content_type)
+
+
+def _authorize_ws(db: Session, token: str, task_id: int) -> str | None:
+    """Проверка JWT и доступа к задаче для WebSocket: None — доступ есть, иначе причина закрытия."""
+    user = get_current_user_ws(token, db)
+    task = db.get(Task, task_id)
+    if not task:
+        return "Task not found"
+    if not rag_access(db, user.id, task.rag_id):
+        return "Access denied"
+    return None
+
+
 @app.websocket("/ws/tasks/{task_id}")
 async def ws_task_status(
     websocket: WebSocket,
@@ -41,52 +118,43 @@ async def ws_task_status(
 ):
     """
     WebSocket: стрим статусов задачи (running/done/failed, step, error).
-    Подписка на Redis channel task:{task_id}. Закрывается при status 'done' или 'failed'.
+    Сообщения канала task:{task_id} приходят из общего listener процесса (app.task_events);
+    при подключении сразу отправляется последний известный статус. Закрывается при status 'done' или 'failed'.
     """
     await websocket.accept()
-    db = SessionLocal()
-    try:
-        user = get_current_user_ws(token, db)
-        task = db.get(Task, task_id)
-        if not task:
-            db.close()
-            await websocket.close(code=1008, reason="Task not found")
-            return
-        if not _can_access_rag(db, user, task.rag_id):
-            db.close()
-            await websocket.close(code=1008, reason="Access denied")
-            return
-    except Exception:
-        db.close()
-        raise
-    settings = get_settings()
-    r = redis.from_url(settings.redis_url, decode_responses=True)
-    pubsub = r.pubsub()
-    channel = f"task:{task_id}"
-    try:
-        await pubsub.subscribe(channel)
-        while True:
-            message = await pubsub.get_message(ignore_subscribe_messages=True)
-            if message is None:
-                await asyncio.sleep(0.2)
-                continue
-            if message["type"] != "message":
-                continue
-            data = message.get("data")
-            if isinstance(data, str):
-                try:
-                    payload = json.loads(data)
-                except json.JSONDecodeError:
-                    payload = {"status": "running", "step": "", "error": None}
-            else:
-                payload = {"status": "running", "step": "", "error": None}
-            await websocket.send_json(payload)
-            if payload.get("status") in ("done", "failed"):
-                break
-    except WebSocketDisconnect:
-        pass
-    finally:
-        await pubsub.unsubscribe(channel)
-        await pubsub.close()
-        await r.close()
-        db.close()
+    reason = await run_db(_authorize_ws, token, task_id)
+    if reason:
+        await websocket.close(code=1008, reason=reason)
+        return
+    async with task_status_hub.subscribe(task_id) as queue:
+        last = await task_status_hub.last_status(task_id)
+        if last is not None:
+            await websocket.send_json(last)
+            if last["status"] in TERMINAL_STATUSES:
+                await websocket.close()
+                return
+        # receive() нужен только чтобы заметить отключение клиента, пока ждём статусы
+        receiver = asyncio.create_task(websocket.receive())
+        try:
+            while True:
+                getter = asyncio.create_task(queue.get())
+                done, _ = await asyncio.wait({getter, receiver}, return_when=asyncio.FIRST_COMPLETED)
+                if receiver in done:
+                    getter.cancel()
+                    if receiver.result().get("type") == "websocket.disconnect":
+                        return
+                    receiver = asyncio.create_task(websocket.receive())
+                    continue
+                payload = getter.result()
+                if payload == last:
+                    # тот же статус уже отправлен при подключении
+                    last = None
+                    continue
+                last = None
+                await websocket.send_json(payload)
+                if payload.get("status") in TERMINAL_STATUSES:
+                    break
+        except WebSocketDisconnect:
+            pass
+        finally:
+            receiver.cancel()
@@ -0,0 +1,183 @@
+"""
+Prometheus-метрики API (/metrics):
+- HTTP: гистограмма длительности запросов по шаблону маршрута (middleware в app.main);
+- spans: внутренние участки (SPARQL-подзапросы контекста чата, LLM, выгрузка/загрузка TTL, сессия БД, approve)
+  и их объёмы в байтах;
+- замеры шагов цепочки: суммы по шагу — counters (rate() в Prometheus) из монотонных сумм в Redis
+  (task_steps:totals, их пишет worker по завершении шага; строки task_steps удаляются вместе с RAG,
+  и счётчик из них пошёл бы вниз), пиковый RSS — gauge (максимум по task_steps).
+"""
+import contextlib
+import logging
+import time
+from typing import Iterator
+
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, Histogram, generate_latest
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+from sqlalchemy import func
+from sqlalchemy.exc import SQLAlchemyError
+
+logger = logging.getLogger(__name__)
+
+# Бакеты от миллисекунд (SPARQL, БД) до минут (LLM, approve больших графов)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+# Бакеты объёмов: от килобайт до гигабайта
+SIZE_BUCKETS = tuple(1024 * 4**i for i in range(11))
+
+HTTP_REQUEST_SECONDS = Histogram(
+    "ferag_http_request_seconds",
+    "HTTP request latency by route template",
+    ["method", "route", "status"],
+    buckets=LATENCY_BUCKETS,
+)
+SPAN_SECONDS = Histogram(
+    "ferag_span_seconds",
+    "Duration of internal operations",
+    ["span"],
+    buckets=LATENCY_BUCKETS,
+)
+SPAN_BYTES = Histogram(
+    "ferag_span_bytes",
+    "Payload size of internal operations",
+    ["span"],
+    buckets=SIZE_BUCKETS,
+)
+
+
+@contextlib.contextmanager
+def span(name: str) -> Iterator[None]:
+    """Замер длительности участка кода (в т.ч. при исключении) в ferag_span_seconds{span=name}."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        SPAN_SECONDS.labels(name).observe(time.perf_counter() - started)
+
+
+def observe_span(name: str, seconds: float) -> None:
+    """Готовый замер длительности в ferag_span_seconds{span=name}."""
+    SPAN_SECONDS.labels(name).observe(seconds)
+
+
+def observe_bytes(name: str, size: int) -> None:
+    """Объём данных операции в ferag_span_bytes{span=name}."""
+    SPAN_BYTES.labels(name).observe(size)
+
+
+def observe_sparql(name: str, seconds: float) -> None:
+    """observe-callback для rag_context.sparql: подзапросы контекста чата как spans sparql.<name>."""
+    observe_span(f"sparql.{name}", seconds)
+
+# Redis hash: "<step>|<status>|<столбец>" → сумма (как worker.instrumentation.STEP_TOTALS_KEY)
+STEP_TOTALS_KEY = "task_steps:totals"
+
+# Суммируемые столбцы task_steps → имя counter
+_STEP_SUMS = (
+    ("wall_seconds", "ferag_task_step_wall_seconds", "Wall time of pipeline steps"),
+    ("cpu_seconds", "ferag_task_step_cpu_seconds", "CPU time of pipeline steps (incl. subprocesses)"),
+    ("read_bytes", "ferag_task_step_read_bytes", "Bytes read from storage by pipeline steps"),
+    ("write_bytes", "ferag_task_step_write_bytes", "Bytes written to storage by pipeline steps"),
+    ("fuseki_requests", "ferag_task_step_fuseki_requests", "Fuseki HTTP requests made by pipeline steps"),
+    ("llm_calls", "ferag_task_step_llm_calls", "LLM calls made by pipeline steps"),
+    ("llm_tokens", "ferag_task_step_llm_tokens", "LLM completion (output) tokens used by pipeline steps"),
+)
+
+
+class TaskStepCollector:
+    """Замеры шагов по (step, status) для Prometheus: суммы — из Redis, пиковый RSS — из task_steps."""
+
+    @staticmethod
+    def _families():
+        runs = CounterMetricFamily(
+            "ferag_task_step_runs", "Finished pipeline steps", labels=["step", "status"]
+        )
+        peak_rss = GaugeMetricFamily(
+            "ferag_task_step_peak_rss_bytes", "Max peak RSS of a pipeline step", labels=["step", "status"]
+        )
+        sums = [CounterMetricFamily(name, doc, labels=["step", "status"]) for _, name, doc in _STEP_SUMS]
+        return runs, peak_rss, sums
+
+    def describe(self):
+        # Без describe() регистрация вызвала бы collect() — запрос к БД на импорте
+        runs, peak_rss, sums = self._families()
+        return [runs, peak_rss, *sums]
+
+    def collect(self):
+        runs, peak_rss, sums = self._families()
+        by_column = {"runs": runs, **{col: family for (col, _, _), family in zip(_STEP_SUMS, sums)}}
+        from app.task_events import get_sync_redis
+
+        try:
+            totals = get_sync_redis().hgetall(STEP_TOTALS_KEY)
+        except Exception:
+            logger.warning("task step totals read failed", exc_info=True)
+            totals = {}
+        for field, value in sorted(totals.items()):
+            step, status, column = field.split("|", 2)
+            family = by_column.get(column)
+            if family is not None:
+                family.add_metric([step, status], float(value))
+        yield runs
+        yield from sums
+
+        # app.db импортирует этот модуль (span сессии БД) — модели и сессия подключаются здесь
+        from app.db import SessionLocal
+        from app.models import TaskStep
+
+        db = SessionLocal()
+        try:
+            rows = (
+                db.query(TaskStep.step, TaskStep.status, func.max(TaskStep.peak_rss_bytes))
+                .group_by(TaskStep.step, TaskStep.status)
+                .all()
+            )
+        except SQLAlchemyError:
+            # БД недоступна — остальные метрики процесса отдаются без пикового RSS шагов
+            logger.exception("task_steps metrics query failed")
+            return
+        finally:
+            db.close()
+        for step, status, rss in rows:
+            peak_rss.add_metric([step, status], rss or 0)
+        yield peak_rss
+
+
+REGISTRY.register(TaskStepCollector())
+
+# Redis hash с объёмом work_dir worker (как worker.workdir.WORKDIR_USAGE_KEY): rag_<id> | cas | total → байт
+WORKDIR_USAGE_KEY = "workdir:usage"
+
+
+class WorkdirUsageCollector:
+    """Объём work_dir по RAG (каталоги циклов) и cas — из Redis, куда его пишет worker cleanup_work_dir."""
+
+    @staticmethod
+    def _family():
+        return GaugeMetricFamily(
+            "ferag_workdir_bytes", "Worker work dir disk usage (rag_<id>, cas, total)", labels=["area"]
+        )
+
+    def describe(self):
+        return [self._family()]
+
+    def collect(self):
+        from app.task_events import get_sync_redis
+
+        family = self._family()
+        try:
+            usage = get_sync_redis().hgetall(WORKDIR_USAGE_KEY)
+        except Exception:
+            logger.warning("work dir usage read failed", exc_info=True)
+            return
+        for area, value in usage.items():
+            if area != "updated_at":
+                family.add_metric([area], float(value))
+        yield family
+
+
+REGISTRY.register(WorkdirUsageCollector())
+
+
+def render_metrics() -> tuple[bytes, str]:
+    """Тело и Content-Type ответа /metrics."""
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
@@ -2,7 +2,7 @@
 from datetime import datetime
 from typing import Optional
 
-from sqlalchemy import DateTime, ForeignKey, Integer, Text
+from sqlalchemy import BigInteger, DateTime, Float, ForeignKey, Index, Integer, LargeBinary, Text, text
 from sqlalchemy.orm import Mapped, mapped_column
 
 from app.db import Base
@@ -42,41 +42,95 @@ class RagMember(Base):
     rag_id: Mapped[int] = mapped_column(
         Integer, ForeignKey("rag_instances.id"), primary_key=True, nullable=False
     )
+    # Отдельный индекс: PK (rag_id, user_id) не помогает поиску RAG пользователя (list_rags)
     user_id: Mapped[int] = mapped_column(
-        Integer, ForeignKey("users.id"), primary_key=True, nullable=False
+        Integer, ForeignKey("users.id"), primary_key=True, nullable=False, index=True
     )
     role: Mapped[str] = mapped_column(Text, nullable=False)  # 'viewer' | 'editor'
 
 
 class UploadCycle(Base):
     __tablename__ = "upload_cycles"
+    # Циклы RAG по статусу в порядке id: upload-status (review, queued), app.scheduler (активный, queued)
+    __table_args__ = (Index("ix_upload_cycles_rag_id_status_id", "rag_id", "status", "id"),)
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
     rag_id: Mapped[int] = mapped_column(
         Integer, ForeignKey("rag_instances.id"), nullable=False
     )
-    cycle_n: Mapped[int] = mapped_column(Integer, nullable=False)
+    # Присваивается при запуске цепочки (cycle_count + 1); у ожидающего цикла — NULL
+    cycle_n: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
     status: Mapped[str] = mapped_column(
         Text, nullable=False, server_default="pending"
-    )  # pending | running | review | merged | archived | failed
+    )  # queued | pending | running | review | merged | archived | failed
     created_at: Mapped[datetime] = mapped_column(
         DateTime(timezone=True), server_default="now()", nullable=False
     )
     merged_at: Mapped[Optional[datetime]] = mapped_column(
         DateTime(timezone=True), nullable=True
     )
-    source_content: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
+    # Исходный текст — в source_blobs (см. app.source_store), здесь только ссылка по SHA-256
+    source_sha256: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
+    source_size: Mapped[Optional[int]] = mapped_column(BigInteger, nullable=True)
+
+
+# Документ цикла: загрузки во время активного цикла копятся в одном ожидающем (app.scheduler)
+class CycleDocument(Base):
+    __tablename__ = "cycle_documents"
+
+    cycle_id: Mapped[int] = mapped_column(
+        Integer, ForeignKey("upload_cycles.id", ondelete="CASCADE"), primary_key=True
+    )
+    seq: Mapped[int] = mapped_column(Integer, primary_key=True)
+    filename: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
+    source_sha256: Mapped[str] = mapped_column(Text, nullable=False)
+    source_size: Mapped[int] = mapped_column(BigInteger, nullable=False)
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), server_default="now()", nullable=False
+    )
+
+
+class SourceBlob(Base):
+    __tablename__ = "source_blobs"
+
+    sha256: Mapped[str] = mapped_column(Text, primary_key=True)
+    size: Mapped[int] = mapped_column(BigInteger, nullable=False)
+    stored_size: Mapped[int] = mapped_column(BigInteger, nullable=False)
+    codec: Mapped[str] = mapped_column(Text, nullable=False)  # 'zstd'
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), server_default="now()", nullable=False
+    )
+
+
+class SourceBlobChunk(Base):
+    __tablename__ = "source_blob_chunks"
+
+    sha256: Mapped[str] = mapped_column(
+        Text, ForeignKey("source_blobs.sha256", ondelete="CASCADE"), primary_key=True
+    )
+    seq: Mapped[int] = mapped_column(Integer, primary_key=True)
+    data: Mapped[bytes] = mapped_column(LargeBinary, nullable=False)
 
 
 class Task(Base):
     __tablename__ = "tasks"
+    # Список задач RAG (WHERE rag_id ORDER BY id DESC) без сортировки; незавершённые задачи RAG
+    # (delete_rag) — частичный индекс, в нём только pending/running
+    __table_args__ = (
+        Index("ix_tasks_rag_id_id", "rag_id", "id"),
+        Index(
+            "ix_tasks_rag_id_active",
+            "rag_id",
+            postgresql_where=text("status IN ('pending', 'running')"),
+        ),
+    )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
     rag_id: Mapped[int] = mapped_column(
         Integer, ForeignKey("rag_instances.id"), nullable=False
     )
     cycle_id: Mapped[Optional[int]] = mapped_column(
-        Integer, ForeignKey("upload_cycles.id"), nullable=True
+        Integer, ForeignKey("upload_cycles.id"), nullable=True, index=True
     )
     type: Mapped[str] = mapped_column(Text, nullable=False)
     # full_cycle (один тип на весь pipeline, step публикуется через Redis pub/sub)
@@ -92,3 +146,26 @@ class Task(Base):
     updated_at: Mapped[datetime] = mapped_column(
         DateTime(timezone=True), server_default="now()", nullable=False
     )
+
+
+# Замеры шага цепочки; пишет worker.instrumentation по завершении Celery-задачи
+class TaskStep(Base):
+    __tablename__ = "task_steps"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    task_id: Mapped[int] = mapped_column(
+        Integer, ForeignKey("tasks.id", ondelete="CASCADE"), nullable=False, index=True
+    )
+    step: Mapped[str] = mapped_column(Text, nullable=False)  # graphrag | schema_induction | merge | staging
+    status: Mapped[str] = mapped_column(Text, nullable=False)  # done | failed
+    started_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False)
+    finished_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False)
+    wall_seconds: Mapped[float] = mapped_column(Float, nullable=False)
+    cpu_seconds: Mapped[float] = mapped_column(Float, nullable=False)
+    peak_rss_bytes: Mapped[int] = mapped_column(BigInteger, nullable=False)
+    read_bytes: Mapped[Optional[int]] = mapped_column(BigInteger, nullable=True)
+    write_bytes: Mapped[Optional[int]] = mapped_column(BigInteger, nullable=True)
+    fuseki_requests: Mapped[int] = mapped_column(Integer, nullable=False, server_default="0")
+    llm_calls: Mapped[int] = mapped_column(Integer, nullable=False, server_default="0")
+    # Completion-токены LLM (ответ модели) во всех шагах; NULL — usage неизвестен
+    llm_tokens: Mapped[Optional[int]] = mapped_column(BigInteger, nullable=True)
@@ -1,11 +1,27 @@
-"""Эндпоинты аутентификации: register, login, me."""
+"""Эндпоинты аутентификации: register, login, refresh, logout, me."""
+import logging
+
 from fastapi import APIRouter, Depends, HTTPException, status
+from jose import JWTError
 from pydantic import BaseModel, EmailStr
 from sqlalchemy.orm import Session
 
-from app.auth import create_access_token, hash_password, verify_password
+from app.auth import (
+    create_access_token,
+    decode_refresh_token,
+    hash_password,
+    issue_refresh_token,
+    revoke_refresh_token,
+    revoke_user_refresh_tokens,
+    rotate_refresh_token,
+    verify_and_update_password,
+)
+from app.authz import get_user, invalidate_user
 from app.deps import get_current_user, get_db
 from app.models import User
+from app.task_events import get_sync_redis
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
@@ -29,9 +45,47 @@ class UserResponse(BaseModel):
     model_config = {"from_attributes": True}
 
 
+class RefreshBody(BaseModel):
+    refresh_token: str
+
+
+class LogoutBody(BaseModel):
+    refresh_token: str
+    # Отозвать refresh-токены всех входов пользователя, а не только этого
+    all_sessions: bool = False
+
+
 class TokenResponse(BaseModel):
     access_token: str
     token_type: str = "bearer"
+    refresh_token: str | None = None
+
+
+def _issue_tokens(user_id: int) -> TokenResponse:
+    """Вход: access и refresh нового семейства (без Redis — только access, продление — повторным входом)."""
+    try:
+        refresh_token = issue_refresh_token(get_sync_redis(), user_id)
+    except Exception:
+        logger.warning("refresh token store unavailable, issuing access token only", exc_info=True)
+        refresh_token = None
+    return TokenResponse(
+        access_token=create_access_token(data={"sub": str(user_id)}),
+        token_type="bearer",
+        refresh_token=refresh_token,
+    )
+
+
+def _refresh_payload(token: str) -> dict:
+    try:
+        payload = decode_refresh_token(token)
+        int(payload["sub"])
+    except (JWTError, KeyError, ValueError, TypeError):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid refresh token",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    return payload
 
 
 @router.post("/register", response_model=UserResponse)
@@ -56,16 +110,65 @@ def register(body: RegisterBody, db: Session = Depends(get_db)):
 
 @router.post("/login", response_model=TokenResponse)
 def login(body: LoginBody, db: Session = Depends(get_db)):
-    """Вход. Возвращает JWT."""
+    """Вход. Возвращает access и refresh JWT. Хеш с устаревшей стоимостью bcrypt пересчитывается."""
     user = db.query(User).filter(User.email == body.email).first()
-    if not user or not verify_password(body.password, user.password_hash):
+    ok, new_hash = verify_and_update_password(body.password, user.password_hash) if user else (False, None)
+    if not ok:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
-    token = create_access_token(data={"sub": str(user.id)})
-    return TokenResponse(access_token=token, token_type="bearer")
+    if new_hash:
+        user.password_hash = new_hash
+        db.commit()
+        invalidate_user(user.id)
+    return _issue_tokens(user.id)
+
+
+@router.post("/refresh", response_model=TokenResponse)
+def refresh(body: RefreshBody, db: Session = Depends(get_db)):
+    """
+    Новая пара access/refresh по действующему refresh-токену (без пароля и bcrypt). Refresh одноразовый:
+    следующий — того же семейства с тем же exp (сессия не продлевается дальше срока входа).
+    401 — токен недействителен, отозван или уже обменян.
+    """
+    payload = _refresh_payload(body.refresh_token)
+    user_id = int(payload["sub"])
+    if get_user(db, user_id) is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid refresh token",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    try:
+        refresh_token = rotate_refresh_token(get_sync_redis(), payload)
+    except Exception:
+        logger.exception("refresh token store unavailable")
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Token refresh unavailable")
+    if refresh_token is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Refresh token revoked",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    return TokenResponse(
+        access_token=create_access_token(data={"sub": str(user_id)}),
+        token_type="bearer",
+        refresh_token=refresh_token,
+    )
+
+
+@router.post("/logout", status_code=status.HTTP_204_NO_CONTENT)
+def logout(body: LogoutBody):
+    """Выход: отозвать refresh-токен (all_sessions — все refresh-токены пользователя). Access истечёт сам."""
+    payload = _refresh_payload(body.refresh_token)
+    r = get_sync_redis()
+    if body.all_sessions:
+        revoke_user_refresh_tokens(r, int(payload["sub"]))
+    else:
+        revoke_refresh_token(r, payload)
+    return None
 
 
 @router.get("/me", response_model=UserResponse)
@@ -1,20 +1,32 @@
-"""CRUD RAG-экземпляров: создание, список, по id, удаление, загрузка файла, approve цикла."""
+"""CRUD RAG-экземпляров: создание, список, по id, удаление, загрузка файла, approve и reject цикла."""
+import json
+import logging
+import uuid
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime, timezone
 from pathlib import Path
 from typing import Literal
 
-from fastapi import APIRouter, Depends, File, HTTPException, status, UploadFile
+import httpx
+from fastapi import APIRouter, Depends, File, HTTPException, Query, Response, status, UploadFile
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
+from sqlalchemy import literal, select, tuple_
 from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
 
-from app.celery_sender import send_update_chain
+from app.authz import RagAccess, invalidate_member, invalidate_rag, rag_access
+from app.celery_sender import send_archive_cycle, send_cleanup_work_dir, send_schedule_cycles
 from app.config import get_settings
+from app.db import SessionLocal, run_db
 from app.deps import get_current_user, get_db
 from app.fuseki_admin import (
     create_dataset,
     delete_dataset,
+    drop_cycle_graphs_update,
     get_dataset_ttl,
     post_dataset_ttl,
+    promote_cycle_graphs_update,
     put_dataset_ttl,
     rag_ontology_dataset,
     rag_prod_dataset,
@@ -22,7 +34,14 @@ from app.fuseki_admin import (
     rag_triples_dataset,
     sparql_update,
 )
-from app.models import RagInstance, RagMember, Task, UploadCycle, User
+from app.models import CycleDocument, RagInstance, RagMember, Task, UploadCycle, User
+from app.scheduler import discard_documents, enqueue_documents, lock_rag
+from app.source_store import delete_unreferenced_blobs, store_source_blob
+from app.task_events import get_sync_redis, store_task_state
+from app.metrics import observe_bytes, observe_sparql, span
+from app.uploads import extract_archive, is_archive, save_upload
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
@@ -63,7 +82,10 @@ class MemberListItem(BaseModel):
 
 
 def _can_access_rag(db: Session, user: User, rag_id: int) -> RagInstance | None:
-    """Проверить доступ (owner или member). Вернуть RAG или None."""
+    """
+    Проверить доступ (owner или member). Вернуть RAG или None.
+    По БД, без кэша — для изменяющих эндпоинтов; горячий путь (чат, задачи) — app.authz.rag_access.
+    """
     rag = db.get(RagInstance, rag_id)
     if not rag:
         return None
@@ -75,7 +97,7 @@ def _can_access_rag(db: Session, user: User, rag_id: int) -> RagInstance | None:
     return None
 
 
-def _is_owner(user: User, rag: RagInstance) -> bool:
+def _is_owner(user: User, rag: RagInstance | RagAccess) -> bool:
     return rag.owner_id == user.id
 
 
@@ -106,26 +128,47 @@ def create_rag(
     return rag
 
 
+# Заголовок со следующим курсором keyset-пагинации (нет заголовка — последняя страница)
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
 @router.get("", response_model=list[RAGResponse])
 def list_rags(
+    response: Response,
+    cursor: int | None = Query(None, description="X-Next-Cursor предыдущей страницы"),
+    limit: int = Query(100, ge=1, le=500),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user),
 ):
-    """Список RAG текущего пользователя (владелец или участник)."""
-    owned = db.query(RagInstance).filter(RagInstance.owner_id == current_user.id).all()
-    member_rag_ids = [m.rag_id for m in db.query(RagMember).filter(RagMember.user_id == current_user.id).all()]
-    if member_rag_ids:
-        member_rags = db.query(RagInstance).filter(RagInstance.id.in_(member_rag_ids)).all()
-        owned_ids = {r.id for r in owned}
-        for r in member_rags:
-            if r.id not in owned_ids:
-                owned.append(r)
-    return owned
+    """
+    Список RAG текущего пользователя (владелец или участник) по id, страницами по limit.
+    Один запрос: id из rag_instances.owner_id и rag_members.user_id (UNION ALL, оба по индексу).
+    """
+    accessible = select(RagInstance.id).where(RagInstance.owner_id == current_user.id).union_all(
+        select(RagMember.rag_id).where(RagMember.user_id == current_user.id)
+    )
+    q = db.query(RagInstance).filter(RagInstance.id.in_(accessible))
+    if cursor is not None:
+        q = q.filter(RagInstance.id > cursor)
+    rags = q.order_by(RagInstance.id).limit(limit + 1).all()
+    if len(rags) > limit:
+        rags = rags[:limit]
+        response.headers[NEXT_CURSOR_HEADER] = str(rags[-1].id)
+    return rags
 
 
 class UploadResponse(BaseModel):
     cycle_id: int
     task_id: int
+    # Файл добавлен в ожидающий цикл: RAG занят другим циклом (running/review), старт — после него
+    queued: bool = False
+    documents: int = 1
+
+
+class BulkUploadResponse(UploadResponse):
+    # Документов добавлено этим запросом; пропущено элементов архивов (не .txt/.md, служебные)
+    added: int
+    skipped: int = 0
 
 
 class CycleInReview(BaseModel):
@@ -133,9 +176,17 @@ class CycleInReview(BaseModel):
     task_id: int
 
 
+class CycleQueued(BaseModel):
+    cycle_id: int
+    task_id: int
+    documents: int
+
+
 class UploadStatusResponse(BaseModel):
     """Есть ли цикл в статусе review (ожидает подтверждения). После перезагрузки/повторного входа фронт восстанавливает кнопку «Подтвердить»."""
     cycle_in_review: CycleInReview | None = None
+    # Ожидающий цикл (загрузки во время активного), если есть
+    cycle_queued: CycleQueued | None = None
 
 
 @router.get("/{rag_id}/upload-status", response_model=UploadStatusResponse)
@@ -154,28 +205,48 @@ def get_upload_status(
         .order_by(UploadCycle.id.desc())
         .first()
     )
+    queued = _queued_cycle(db, rag_id)
     if not cycle:
-        return UploadStatusResponse(cycle_in_review=None)
+        return UploadStatusResponse(cycle_in_review=None, cycle_queued=queued)
     task = db.query(Task).filter(Task.rag_id == rag_id, Task.cycle_id == cycle.id).first()
     if not task:
-        return UploadStatusResponse(cycle_in_review=None)
+        return UploadStatusResponse(cycle_in_review=None, cycle_queued=queued)
     return UploadStatusResponse(
-        cycle_in_review=CycleInReview(cycle_id=cycle.id, task_id=task.id)
+        cycle_in_review=CycleInReview(cycle_id=cycle.id, task_id=task.id),
+        cycle_queued=queued,
     )
 
 
+def _queued_cycle(db: Session, rag_id: int) -> CycleQueued | None:
+    cycle = (
+        db.query(UploadCycle)
+        .filter(UploadCycle.rag_id == rag_id, UploadCycle.status == "queued")
+        .order_by(UploadCycle.id)
+        .first()
+    )
+    if not cycle:
+        return None
+    task = db.query(Task).filter(Task.cycle_id == cycle.id).first()
+    if not task:
+        return None
+    documents = db.query(CycleDocument).filter(CycleDocument.cycle_id == cycle.id).count()
+    return CycleQueued(cycle_id=cycle.id, task_id=task.id, documents=documents)
+
+
 @router.post("/{rag_id}/upload", response_model=UploadResponse)
 async def upload_file(
     rag_id: int,
     file: UploadFile = File(...),
-    db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user),
 ):
     """
-    Загрузить текстовый файл для нового цикла. Только владелец RAG.
-    Создаётся UploadCycle и Task, файл сохраняется в work_dir, запускается цепочка задач.
+    Загрузить текстовый файл. Только владелец RAG.
+    Файл потоково копируется в work_dir (SHA-256 и размер считаются на лету, лимит upload_max_bytes)
+    и добавляется документом в ожидающий цикл RAG (app.scheduler): если RAG свободен, worker сразу
+    запускает цепочку; если занят активным циклом — файлы копятся и уходят одним циклом после него.
+    Работа с БД — вне event loop (run_db, пул потоков).
     """
-    rag = _can_access_rag(db, current_user, rag_id)
+    rag = await run_db(rag_access, current_user.id, rag_id)
     if not rag:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="RAG not found")
     if not _is_owner(current_user, rag):
@@ -190,50 +261,168 @@ async def upload_file(
         pass  # не отклоняем
     settings = get_settings()
     work_dir = Path(settings.work_dir)
-    cycle_n = rag.cycle_count + 1
-    cycle = UploadCycle(rag_id=rag_id, cycle_n=cycle_n, status="pending")
-    db.add(cycle)
-    db.flush()
-    input_dir = work_dir / f"rag_{rag_id}" / f"cycle_{cycle.id}" / "input"
-    input_dir.mkdir(parents=True, exist_ok=True)
-    file_path = input_dir / "source.txt"
-    content = await file.read()
-    cycle.source_content = content.decode("utf-8")
-    file_path.write_bytes(content)
-    task = Task(
-        rag_id=rag_id,
-        cycle_id=cycle.id,
-        type="full_cycle",
-        status="running",
+    # Сначала — во временный файл: цикл выбирается под блокировкой RAG, а не на время приёма файла
+    staged_path = work_dir / f"rag_{rag_id}" / "uploads" / f"{uuid.uuid4().hex}.txt"
+    saved = await save_upload(
+        file, staged_path, max_bytes=settings.upload_max_bytes, chunk_size=settings.upload_chunk_bytes
     )
-    db.add(task)
-    db.commit()
-    db.refresh(cycle)
-    db.refresh(task)
+    observe_bytes("upload", saved.size)
     try:
-        send_update_chain(rag_id, cycle.id, task.id, str(file_path))
+        # zstd исходника — CPU: в пуле потоков и при db_async
+        cycle_id, task_id, documents, queued = await run_in_threadpool(
+            _stage_documents, rag_id, [(staged_path, file.filename, saved.sha256, saved.size)], work_dir
+        )
+    finally:
+        staged_path.unlink(missing_ok=True)
+    _schedule_after_upload(rag_id)
+    return UploadResponse(cycle_id=cycle_id, task_id=task_id, queued=queued, documents=documents)
+
+
+@router.post("/{rag_id}/upload/bulk", response_model=BulkUploadResponse)
+async def upload_bulk(
+    rag_id: int,
+    files: list[UploadFile] = File(...),
+    current_user: User = Depends(get_current_user),
+):
+    """
+    Пакетная загрузка корпуса: несколько текстовых файлов и/или архивов (zip, tar[.gz|.bz2|.xz];
+    из архива берутся .txt и .md). Все документы добавляются одной транзакцией в один ожидающий цикл —
+    один graphrag index, одна выгрузка prod, merge и approve на весь пакет. Только владелец RAG.
+    Лимиты: upload_max_bytes на документ, upload_bulk_max_documents и upload_bulk_max_bytes на запрос.
+    Больше ~1000 файлов — архивом (multipart-парсер ограничивает число частей запроса).
+    """
+    rag = await run_db(rag_access, current_user.id, rag_id)
+    if not rag:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="RAG not found")
+    if not _is_owner(current_user, rag):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Only owner can upload")
+    settings = get_settings()
+    work_dir = Path(settings.work_dir)
+    uploads_dir = work_dir / f"rag_{rag_id}" / "uploads"
+    staged: list[tuple[Path, str | None, str, int]] = []
+    skipped = 0
+    total = 0
+    try:
+        for file in files:
+            remaining = settings.upload_bulk_max_bytes - total
+            if is_archive(file.filename, file.content_type):
+                archive_path = uploads_dir / f"{uuid.uuid4().hex}.archive"
+                await save_upload(
+                    file, archive_path, max_bytes=remaining, chunk_size=settings.upload_chunk_bytes, text=False
+                )
+                try:
+                    members, archive_skipped = await run_in_threadpool(
+                        extract_archive,
+                        archive_path,
+                        uploads_dir,
+                        settings.upload_max_bytes,
+                        settings.upload_chunk_bytes,
+                        settings.upload_bulk_max_documents - len(staged),
+                        remaining,
+                    )
+                finally:
+                    archive_path.unlink(missing_ok=True)
+                skipped += archive_skipped
+                for name, doc in members:
+                    staged.append((doc.path, f"{file.filename or 'archive'}/{name}", doc.sha256, doc.size))
+                    total += doc.size
+                continue
+            if file.content_type and file.content_type not in ("text/plain", "application/octet-stream"):
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail=f"{file.filename}: Content-Type must be text/plain or a zip/tar archive",
+                )
+            if len(staged) >= settings.upload_bulk_max_documents:
+                raise HTTPException(
+                    status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                    detail=f"Too many documents (limit {settings.upload_bulk_max_documents})",
+                )
+            saved = await save_upload(
+                file,
+                uploads_dir / f"{uuid.uuid4().hex}.txt",
+                max_bytes=min(settings.upload_max_bytes, remaining),
+                chunk_size=settings.upload_chunk_bytes,
+            )
+            staged.append((saved.path, file.filename, saved.sha256, saved.size))
+            total += saved.size
+        if not staged:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="No text documents in upload")
+        observe_bytes("upload", total)
+        cycle_id, task_id, documents, queued = await run_in_threadpool(_stage_documents, rag_id, staged, work_dir)
+    finally:
+        # После enqueue файлы уже перенесены в input/ цикла; здесь — остатки при ошибке
+        for path, *_ in staged:
+            path.unlink(missing_ok=True)
+    _schedule_after_upload(rag_id)
+    return BulkUploadResponse(
+        cycle_id=cycle_id, task_id=task_id, queued=queued, documents=documents, added=len(staged), skipped=skipped
+    )
+
+
+def _schedule_after_upload(rag_id: int) -> None:
+    try:
+        send_schedule_cycles(rag_id)
     except Exception as e:
-        task.status = "failed"
-        task.error = str(e)
-        db.commit()
+        # Документы уже в ожидающем цикле: его запустит следующая загрузка или approve
         raise HTTPException(
             status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
             detail=f"Failed to start pipeline: {e}",
         )
-    return UploadResponse(cycle_id=cycle.id, task_id=task.id)
+
+
+def _stage_documents(
+    rag_id: int, documents: list[tuple[Path, str | None, str, int]], work_dir: Path
+) -> tuple[int, int, int, bool]:
+    """
+    Исходники в source_blobs (если включено) и документы [(staged_path, filename, sha256, size)]
+    в ожидающий цикл одной транзакцией; (cycle_id, task_id, документов в цикле, queued).
+    """
+    settings = get_settings()
+    db = SessionLocal()
+    try:
+        if settings.store_source_in_db:
+            with span("upload.store_source_blob"):
+                for staged_path, _, sha256, size in documents:
+                    store_source_blob(db, staged_path, sha256, size, level=settings.source_zstd_level)
+        cycle, task, docs, queued = enqueue_documents(db, rag_id, documents, work_dir)
+        try:
+            db.commit()
+        except BaseException:
+            discard_documents(work_dir, rag_id, cycle.id, docs)
+            raise
+        try:
+            # Проекция для опроса GET /tasks/{id}; не затирает статус, если worker уже запустил цикл
+            store_task_state(get_sync_redis(), task, only_missing=True)
+        except Exception:
+            logger.warning("task state write failed for task %s", task.id, exc_info=True)
+        return cycle.id, task.id, docs[-1].seq, queued
+    finally:
+        db.close()
 
 
 class ApproveResponse(BaseModel):
     message: str = "approved"
 
 
+class RejectResponse(BaseModel):
+    message: str = "rejected"
+
+
 class ChatRequest(BaseModel):
     question: str
 
 
 class ChatResponse(BaseModel):
     answer: str
+    # Длина контекста в символах и в токенах (rag_context.count_tokens)
     context_used: int
+    context_tokens: int = 0
+
+
+class ChatBatchRequest(BaseModel):
+    questions: list[str]
+    # Одновременных вызовов LLM; не больше chat_batch_concurrency
+    concurrency: int | None = None
 
 
 @router.post("/{rag_id}/cycles/{cycle_id}/approve", response_model=ApproveResponse)
@@ -244,7 +433,8 @@ def approve_cycle(
     current_user: User = Depends(get_current_user),
 ):
     """
-    Одобрить цикл (только owner): скопировать staging (-tri, -ont) в prod, удалить staging-датасеты,
+    Одобрить цикл (только owner): скопировать staging (-tri, -ont) в prod, удалить staging-датасеты
+    (layout=graphs: MOVE/ADD named graphs цикла в default graph prod),
     UploadCycle.status='merged', RagInstance.cycle_count += 1.
     """
     rag = _can_access_rag(db, current_user, rag_id)
@@ -260,30 +450,103 @@ def approve_cycle(
             status_code=status.HTTP_409_CONFLICT,
             detail=f"Cycle status must be 'review', got '{cycle.status}'",
         )
-    prod_ds = rag_prod_dataset(rag_id)
-    cycle_n = cycle.cycle_n
-    ds_tri = rag_triples_dataset(rag_id, cycle_n)
-    ds_ont = rag_ontology_dataset(rag_id, cycle_n)
-    ds_stg = rag_staging_dataset(rag_id, cycle_n)
-    sparql_update(prod_ds, "DELETE WHERE { ?s ?p ?o }")
-    tri_ttl = get_dataset_ttl(ds_tri)
-    if tri_ttl.strip() and tri_ttl.strip() != "# Empty dataset\n" and tri_ttl.strip() != "# Empty\n":
-        put_dataset_ttl(prod_ds, tri_ttl)
-    ont_ttl = get_dataset_ttl(ds_ont)
-    if ont_ttl.strip() and ont_ttl.strip() != "# Empty dataset\n" and ont_ttl.strip() != "# Empty\n":
-        post_dataset_ttl(prod_ds, ont_ttl)
-    for name in (ds_tri, ds_ont, ds_stg):
-        try:
-            delete_dataset(name)
-        except Exception:
-            pass
+    with span("approve"):
+        _promote_cycle(rag_id, cycle.cycle_n)
     cycle.status = "merged"
     cycle.merged_at = datetime.now(timezone.utc)
     rag.cycle_count += 1
     db.commit()
+    try:
+        # RAG освободился: запустить ожидающий цикл, если загрузки копились
+        send_schedule_cycles(rag_id)
+    except Exception:
+        logger.exception("failed to schedule queued cycle of RAG %s", rag_id)
+    try:
+        # Каталог цикла больше не нужен: снимок prod — в cas worker, остальное удаляется
+        send_archive_cycle(rag_id, cycle_id)
+    except Exception:
+        logger.exception("failed to archive cycle %s of RAG %s", cycle_id, rag_id)
     return ApproveResponse()
 
 
+def _promote_cycle(rag_id: int, cycle_n: int) -> None:
+    """Перенос staging цикла cycle_n в prod-датасет RAG (по fuseki_layout)."""
+    prod_ds = rag_prod_dataset(rag_id)
+    if get_settings().fuseki_layout == "graphs":
+        # Named graphs цикла уже в prod-датасете: перенос на стороне Fuseki, без выгрузки TTL
+        sparql_update(prod_ds, promote_cycle_graphs_update(cycle_n))
+    else:
+        ds_tri = rag_triples_dataset(rag_id, cycle_n)
+        ds_ont = rag_ontology_dataset(rag_id, cycle_n)
+        ds_stg = rag_staging_dataset(rag_id, cycle_n)
+        sparql_update(prod_ds, "DELETE WHERE { ?s ?p ?o }")
+        tri_ttl = get_dataset_ttl(ds_tri)
+        if tri_ttl.strip() and tri_ttl.strip() != "# Empty dataset\n" and tri_ttl.strip() != "# Empty\n":
+            put_dataset_ttl(prod_ds, tri_ttl)
+        ont_ttl = get_dataset_ttl(ds_ont)
+        if ont_ttl.strip() and ont_ttl.strip() != "# Empty dataset\n" and ont_ttl.strip() != "# Empty\n":
+            post_dataset_ttl(prod_ds, ont_ttl)
+        for name in (ds_tri, ds_ont, ds_stg):
+            try:
+                delete_dataset(name)
+            except Exception:
+                pass
+
+
+@router.post("/{rag_id}/cycles/{cycle_id}/reject", response_model=RejectResponse)
+def reject_cycle(
+    rag_id: int,
+    cycle_id: int,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    """
+    Отклонить цикл (только owner): staging цикла удаляется (layout=graphs: named graphs цикла в prod-датасете),
+    prod не меняется, UploadCycle.status='failed'. RAG освобождается — запускается ожидающий цикл.
+    """
+    rag = _can_access_rag(db, current_user, rag_id)
+    if not rag:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="RAG not found")
+    if not _is_owner(current_user, rag):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Only owner can reject")
+    cycle = db.get(UploadCycle, cycle_id)
+    if not cycle or cycle.rag_id != rag_id:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Cycle not found")
+    if cycle.status != "review":
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"Cycle status must be 'review', got '{cycle.status}'",
+        )
+    with span("reject"):
+        # Следующий цикл получит тот же cycle_n — его staging не должен остаться в Fuseki
+        _drop_cycle_staging(rag_id, cycle.cycle_n)
+    cycle.status = "failed"
+    db.commit()
+    try:
+        send_schedule_cycles(rag_id)
+    except Exception:
+        logger.exception("failed to schedule queued cycle of RAG %s", rag_id)
+    return RejectResponse()
+
+
+def _drop_cycle_staging(rag_id: int, cycle_n: int) -> None:
+    """Удалить staging цикла cycle_n (по fuseki_layout); prod-данные не трогаются."""
+    if get_settings().fuseki_layout == "graphs":
+        sparql_update(rag_prod_dataset(rag_id), drop_cycle_graphs_update(cycle_n))
+        return
+    for name in (
+        rag_triples_dataset(rag_id, cycle_n),
+        rag_ontology_dataset(rag_id, cycle_n),
+        rag_staging_dataset(rag_id, cycle_n),
+    ):
+        try:
+            delete_dataset(name)
+        except httpx.HTTPStatusError as e:
+            # Уже удалён (повтор reject после частичного сбоя)
+            if e.response.status_code != status.HTTP_404_NOT_FOUND:
+                raise
+
+
 @router.post("/{rag_id}/chat", response_model=ChatResponse)
 def chat(
     rag_id: int,
@@ -295,11 +558,12 @@ def chat(
     RAG-вопрос по графу: контекст из Fuseki (prod-датасет RAG) + ответ LLM.
     Требует graphrag-test на sys.path (rag_context, rag_llm) и доступ к LLM API.
     """
-    rag = _can_access_rag(db, current_user, rag_id)
+    rag = rag_access(db, current_user.id, rag_id)
     if not rag:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="RAG not found")
     try:
-        from rag_context import build_context_by_question
+        from llm_router import NoHealthyEndpoint, get_router
+        from rag_context import build_context_by_question, count_tokens
         from rag_llm import answer_from_context, get_llm_client
     except ImportError as e:
         raise HTTPException(
@@ -311,20 +575,31 @@ def chat(
         "url": settings.fuseki_url,
         "auth": (settings.fuseki_user, settings.fuseki_password),
         "ds": rag.fuseki_dataset,
+        "observe": observe_sparql,
     }
-    context = build_context_by_question(body.question, **sparql_kw)
+    with span("chat.context"):
+        context = build_context_by_question(
+            body.question, token_budget=settings.chat_context_token_budget or None, **sparql_kw
+        )
     context_used = len(context)
-    client = get_llm_client(
-        base_url=settings.llm_api_url,
-        api_key="lm-studio",
-        timeout=120,
-    )
-    try:
-        answer = answer_from_context(
+    router = get_router(settings.llm_endpoints or settings.llm_api_url)
+
+    def ask(endpoint) -> str:
+        client = get_llm_client(base_url=endpoint.url, api_key="lm-studio", timeout=120)
+        return answer_from_context(
             context,
             body.question,
             client=client,
-            model=settings.llm_model,
+            model=endpoint.model or settings.llm_model,
+        )
+
+    try:
+        with span("chat.llm"):
+            answer = router.call(ask)
+    except NoHealthyEndpoint as e:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=f"LLM unavailable: {e}",
         )
     except ValueError as e:
         raise HTTPException(
@@ -336,7 +611,96 @@ def chat(
             status_code=status.HTTP_502_BAD_GATEWAY,
             detail=f"LLM error: {e}",
         )
-    return ChatResponse(answer=answer, context_used=context_used)
+    return ChatResponse(answer=answer, context_used=context_used, context_tokens=count_tokens(context))
+
+
+@router.post("/{rag_id}/chat/batch")
+def chat_batch(
+    rag_id: int,
+    body: ChatBatchRequest,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    """
+    Пакет RAG-вопросов (оценка качества): контекст всех вопросов — несколькими объединёнными
+    SPARQL-запросами (одинаковые наборы ключевых слов — один раз), вызовы LLM — параллельно
+    (до chat_batch_concurrency). Ответ — NDJSON по мере готовности: по строке на вопрос
+    {"index", "answer", "context_used", "context_tokens"} или {"index", "error"}.
+    """
+    rag = rag_access(db, current_user.id, rag_id)
+    if not rag:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="RAG not found")
+    settings = get_settings()
+    if not body.questions:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="No questions")
+    if len(body.questions) > settings.chat_batch_max_questions:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"Too many questions (max {settings.chat_batch_max_questions})",
+        )
+    try:
+        from llm_router import NoHealthyEndpoint, get_router
+        from rag_context import build_contexts_by_questions, count_tokens
+        from rag_llm import answer_from_context, get_llm_client
+    except ImportError as e:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=f"RAG chat unavailable (missing graphrag-test): {e}",
+        )
+    with span("chat.batch_context"):
+        contexts = build_contexts_by_questions(
+            body.questions,
+            url=settings.fuseki_url,
+            auth=(settings.fuseki_user, settings.fuseki_password),
+            ds=rag.fuseki_dataset,
+            observe=observe_sparql,
+            token_budget=settings.chat_context_token_budget or None,
+        )
+    router = get_router(settings.llm_endpoints or settings.llm_api_url)
+    concurrency = max(1, min(body.concurrency or settings.chat_batch_concurrency, settings.chat_batch_concurrency))
+    clients: dict[str, object] = {}
+
+    def ask(i: int) -> dict:
+        def call(endpoint) -> str:
+            client = clients.get(endpoint.url)
+            if client is None:
+                client = clients.setdefault(
+                    endpoint.url, get_llm_client(base_url=endpoint.url, api_key="lm-studio", timeout=120)
+                )
+            return answer_from_context(
+                contexts[i],
+                body.questions[i],
+                client=client,
+                model=endpoint.model or settings.llm_model,
+            )
+
+        try:
+            with span("chat.llm"):
+                answer = router.call(call)
+        except NoHealthyEndpoint as e:
+            return {"index": i, "error": f"LLM unavailable: {e}"}
+        except ValueError as e:
+            return {"index": i, "error": f"LLM returned empty or invalid response: {e}"}
+        except Exception as e:
+            return {"index": i, "error": f"LLM error: {e}"}
+        return {
+            "index": i,
+            "answer": answer,
+            "context_used": len(contexts[i]),
+            "context_tokens": count_tokens(contexts[i]),
+        }
+
+    def results():
+        pool = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="chat-batch")
+        try:
+            futures = [pool.submit(ask, i) for i in range(len(body.questions))]
+            for fut in as_completed(futures):
+                yield json.dumps(fut.result(), ensure_ascii=False) + "\n"
+        finally:
+            # Клиент отключился — не отправлять оставшиеся вопросы в LLM
+            pool.shutdown(wait=False, cancel_futures=True)
+
+    return StreamingResponse(results(), media_type="application/x-ndjson")
 
 
 @router.get("/{rag_id}", response_model=RAGResponse)
@@ -355,36 +719,46 @@ def get_rag(
 @router.get("/{rag_id}/members", response_model=list[MemberListItem])
 def list_members(
     rag_id: int,
+    response: Response,
+    cursor: str | None = Query(None, description="X-Next-Cursor предыдущей страницы"),
+    limit: int = Query(100, ge=1, le=500),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user),
 ):
-    """Список участников RAG (владелец + участники). Доступен владельцу и любому участнику."""
-    rag = _can_access_rag(db, current_user, rag_id)
+    """
+    Список участников RAG (владелец первым, затем участники по user_id), страницами по limit.
+    Доступен владельцу и любому участнику. Один запрос: владелец UNION ALL участники с JOIN users.
+    """
+    rag = rag_access(db, current_user.id, rag_id)
     if not rag:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="RAG not found")
-    owner = db.get(User, rag.owner_id)
-    result: list[MemberListItem] = []
-    if owner:
-        result.append(
-            MemberListItem(
-                user_id=owner.id,
-                email=owner.email,
-                display_name=owner.display_name,
-                role="owner",
-            )
-        )
-    for m in db.query(RagMember).filter(RagMember.rag_id == rag_id).all():
-        u = db.get(User, m.user_id)
-        if u:
-            result.append(
-                MemberListItem(
-                    user_id=u.id,
-                    email=u.email,
-                    display_name=u.display_name,
-                    role=m.role,
-                )
-            )
-    return result
+    # ord: 0 — владелец, 1 — участник; курсор "ord:user_id" последней строки страницы
+    owner_q = select(
+        literal(0).label("ord"), User.id.label("user_id"), User.email, User.display_name, literal("owner").label("role")
+    ).where(User.id == rag.owner_id)
+    members_q = (
+        select(literal(1).label("ord"), User.id, User.email, User.display_name, RagMember.role)
+        .join(User, User.id == RagMember.user_id)
+        .where(RagMember.rag_id == rag_id)
+    )
+    rows = owner_q.union_all(members_q).subquery()
+    q = select(rows)
+    if cursor is not None:
+        try:
+            after = tuple(int(x) for x in cursor.split(":", 1))
+            if len(after) != 2:
+                raise ValueError(cursor)
+        except ValueError:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+        q = q.where(tuple_(rows.c.ord, rows.c.user_id) > tuple_(*after))
+    result = db.execute(q.order_by(rows.c.ord, rows.c.user_id).limit(limit + 1)).all()
+    if len(result) > limit:
+        result = result[:limit]
+        response.headers[NEXT_CURSOR_HEADER] = f"{result[-1].ord}:{result[-1].user_id}"
+    return [
+        MemberListItem(user_id=r.user_id, email=r.email, display_name=r.display_name, role=r.role)
+        for r in result
+    ]
 
 
 @router.post("/{rag_id}/members", response_model=MemberResponse, status_code=status.HTTP_201_CREATED)
@@ -416,6 +790,7 @@ def add_member(
     member = RagMember(rag_id=rag_id, user_id=target.id, role=body.role)
     db.add(member)
     db.commit()
+    invalidate_member(rag_id, target.id)
     return MemberResponse(user_id=target.id, email=target.email, role=body.role)
 
 
@@ -442,6 +817,7 @@ def remove_member(
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Member not found")
     db.delete(member)
     db.commit()
+    invalidate_member(rag_id, user_id)
     return None
 
 
@@ -451,23 +827,64 @@ def delete_rag(
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user),
 ):
-    """Удалить RAG. Только владелец. Запущенных задач быть не должно. Prod-датасет в Fuseki удаляется (ошибку не поднимаем)."""
+    """
+    Удалить RAG. Только владелец. Запущенных задач быть не должно; ожидающие циклы (queued) и их задачи
+    отменяются — удаляются вместе с историей циклов и задач RAG (под блокировкой RAG: worker не запустит
+    ожидающий цикл одновременно) и исходниками, на которые не ссылаются другие RAG (source_blobs).
+    Prod-датасет и staging цикла на review в Fuseki удаляются (ошибку не поднимаем).
+    """
     rag = _can_access_rag(db, current_user, rag_id)
     if not rag:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="RAG not found")
     if not _is_owner(current_user, rag):
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Only owner can delete")
-    running = db.query(Task).filter(Task.rag_id == rag_id, Task.status == "running").first()
+    lock_rag(db, rag_id)
+    running = db.query(Task.id).filter(Task.rag_id == rag_id, Task.status == "running").first()
     if running:
         raise HTTPException(
             status_code=status.HTTP_409_CONFLICT,
             detail="Cannot delete: there are running tasks",
         )
+    review_cycle_ns = [
+        n
+        for (n,) in db.query(UploadCycle.cycle_n).filter(
+            UploadCycle.rag_id == rag_id, UploadCycle.status == "review"
+        )
+    ]
     ds_name = rag.fuseki_dataset
+    # Исходники RAG: после удаления циклов блобы без других ссылок (дедупликация между RAG) удаляются
+    source_shas = {
+        sha
+        for (sha,) in db.query(CycleDocument.source_sha256)
+        .join(UploadCycle, UploadCycle.id == CycleDocument.cycle_id)
+        .filter(UploadCycle.rag_id == rag_id)
+    }
+    source_shas.update(
+        sha
+        for (sha,) in db.query(UploadCycle.source_sha256).filter(
+            UploadCycle.rag_id == rag_id, UploadCycle.source_sha256.isnot(None)
+        )
+    )
+    # task_steps и cycle_documents удаляются каскадом (ON DELETE CASCADE)
+    db.query(Task).filter(Task.rag_id == rag_id).delete(synchronize_session=False)
+    db.query(UploadCycle).filter(UploadCycle.rag_id == rag_id).delete(synchronize_session=False)
+    db.query(RagMember).filter(RagMember.rag_id == rag_id).delete(synchronize_session=False)
     db.delete(rag)
+    delete_unreferenced_blobs(db, source_shas)
     db.commit()
+    invalidate_rag(rag_id)
+    if get_settings().fuseki_layout != "graphs":
+        for cycle_n in review_cycle_ns:
+            try:
+                _drop_cycle_staging(rag_id, cycle_n)
+            except Exception:
+                logger.warning("failed to drop staging of cycle %s of RAG %s", cycle_n, rag_id, exc_info=True)
     try:
         delete_dataset(ds_name)
     except Exception:
         pass
+    try:
+        send_cleanup_work_dir()
+    except Exception:
+        logger.exception("failed to clean up work dir of RAG %s", rag_id)
     return None
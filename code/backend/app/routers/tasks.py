@@ -1,13 +1,25 @@
-"""Эндпоинты статуса задач: по id и список по RAG (для polling)."""
+"""
+Эндпоинты статуса задач: по id, журнал событий (прогресс) и список по RAG (для polling).
+Ответы несут ETag; запрос с совпавшим If-None-Match получает 304 без тела. GET /tasks/{id} читает
+проекцию задачи в Redis (app.task_events.read_task_state) — PostgreSQL только при её отсутствии.
+"""
+import hashlib
+import json
+import logging
 from datetime import datetime
+from typing import Any
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from fastapi.encoders import jsonable_encoder
 from pydantic import BaseModel
 from sqlalchemy.orm import Session
 
+from app.authz import rag_access
 from app.deps import get_current_user, get_db
 from app.models import Task, User
-from app.routers.rags import _can_access_rag
+from app.task_events import get_sync_redis, read_task_events, read_task_state, store_task_state
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
@@ -18,6 +30,8 @@ class TaskResponse(BaseModel):
     cycle_id: int | None
     type: str
     status: str
+    # Текущий (последний опубликованный) шаг цепочки; None — из БД без проекции в Redis
+    step: str | None = None
     error: str | None
     created_at: datetime
     updated_at: datetime
@@ -25,33 +39,112 @@ class TaskResponse(BaseModel):
     model_config = {"from_attributes": True}
 
 
+class TaskEvent(BaseModel):
+    id: str
+    ts: float
+    kind: str
+    step: str
+    percent: float | None
+    data: dict[str, Any]
+
+
+class TaskEventsResponse(BaseModel):
+    task_id: int
+    events: list[TaskEvent]
+    next_cursor: str | None
+    percent: float | None
+    percent_per_sec: float | None
+    eta_seconds: int | None
+
+
+def _conditional(request: Request, response: Response, payload: Any) -> Any:
+    """
+    ETag по содержимому ответа; If-None-Match с тем же ETag → 304 без тела, иначе payload с ETag.
+    Cache-Control: no-cache — браузер хранит ответ, но каждый раз перепроверяет (опрос превращается в 304).
+    """
+    body = json.dumps(jsonable_encoder(payload), sort_keys=True, separators=(",", ":"))
+    etag = f'W/"{hashlib.sha1(body.encode()).hexdigest()[:20]}"'
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match:
+        # Сравнение слабое: W/"x" и "x" совпадают
+        tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+        if "*" in tags or etag.removeprefix("W/") in tags:
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    response.headers.update(headers)
+    return payload
+
+
+def _load_task(db: Session, task_id: int) -> dict | None:
+    """Задача из проекции в Redis; при промахе — из БД с записью проекции (Redis недоступен — только БД)."""
+    r = get_sync_redis()
+    try:
+        state = read_task_state(r, task_id)
+    except Exception:
+        logger.warning("task state read failed for task %s", task_id, exc_info=True)
+        r, state = None, None
+    if state is not None:
+        return state
+    task = db.get(Task, task_id)
+    if task is None:
+        return None
+    data = TaskResponse.model_validate(task).model_dump()
+    if r is not None:
+        try:
+            store_task_state(r, task, only_missing=True)
+        except Exception:
+            logger.warning("task state write failed for task %s", task_id, exc_info=True)
+    return data
+
+
 @router.get("/tasks/{task_id}", response_model=TaskResponse)
 def get_task(
     task_id: int,
+    request: Request,
+    response: Response,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user),
 ):
     """Статус задачи по id. Доступ только если пользователь имеет доступ к RAG задачи."""
-    task = db.get(Task, task_id)
-    if not task:
+    task = _load_task(db, task_id)
+    if not task or not rag_access(db, current_user.id, task["rag_id"]):
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Task not found")
-    rag = _can_access_rag(db, current_user, task.rag_id)
-    if not rag:
+    return _conditional(request, response, TaskResponse.model_validate(task))
+
+
+@router.get("/tasks/{task_id}/events", response_model=TaskEventsResponse)
+def get_task_events(
+    task_id: int,
+    request: Request,
+    response: Response,
+    cursor: str | None = None,
+    limit: int = Query(100, ge=1, le=1000),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    """
+    Журнал событий задачи (статусы шагов, этапы graphrag, счётчики LLM/байт) после cursor.
+    Клиент продолжает с next_cursor из предыдущего ответа — после переподключения ничего не теряется.
+    """
+    task = _load_task(db, task_id)
+    if not task or not rag_access(db, current_user.id, task["rag_id"]):
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Task not found")
-    return task
+    return _conditional(request, response, read_task_events(get_sync_redis(), task_id, cursor, limit))
 
 
 @router.get("/rags/{rag_id}/tasks", response_model=list[TaskResponse])
 def list_rag_tasks(
     rag_id: int,
+    request: Request,
+    response: Response,
     skip: int = 0,
     limit: int = 20,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user),
 ):
     """Список задач RAG с пагинацией. Доступ только у владельца или участника RAG."""
-    rag = _can_access_rag(db, current_user, rag_id)
+    rag = rag_access(db, current_user.id, rag_id)
     if not rag:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="RAG not found")
     tasks = db.query(Task).filter(Task.rag_id == rag_id).order_by(Task.id.desc()).offset(skip).limit(limit).all()
-    return tasks
+    return _conditional(request, response, [TaskResponse.model_validate(t) for t in tasks])
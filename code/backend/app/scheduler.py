@@ -0,0 +1,103 @@
+"""
+Очередь циклов RAG: не более одного активного цикла (running | review) на RAG.
+Загрузки, пришедшие во время активного цикла, складываются в один ожидающий цикл (status='queued')
+из нескольких документов — вместо отдельной цепочки с полной выгрузкой prod и merge на каждый файл.
+Запускает ожидающий цикл (и присваивает cycle_n) worker: задача schedule_cycles — после загрузки,
+approve и сбоя цепочки. Решения принимаются под advisory lock RAG в PostgreSQL.
+"""
+import os
+from pathlib import Path
+
+from sqlalchemy import func, text
+from sqlalchemy.orm import Session
+
+from app.models import CycleDocument, Task, UploadCycle
+
+# Первый ключ pg_advisory_xact_lock(int, int) ("FRAG"), второй — rag_id; тот же в worker.tasks.scheduler_task
+RAG_LOCK_NAMESPACE = 0x46524147
+# Цикл занимает RAG от старта цепочки до approve (review) или сбоя
+ACTIVE_CYCLE_STATUSES = ("running", "review")
+
+
+def lock_rag(db: Session, rag_id: int) -> None:
+    """Advisory lock RAG до конца транзакции (сериализует постановку и запуск циклов)."""
+    db.execute(text("SELECT pg_advisory_xact_lock(:ns, :rag_id)"), {"ns": RAG_LOCK_NAMESPACE, "rag_id": rag_id})
+
+
+def cycle_input_dir(work_dir: Path, rag_id: int, cycle_id: int) -> Path:
+    return Path(work_dir) / f"rag_{rag_id}" / f"cycle_{cycle_id}" / "input"
+
+
+def cycle_document_name(seq: int) -> str:
+    """Имя файла документа в input/ цикла (graphrag индексирует все *.txt каталога)."""
+    return f"doc_{seq:04d}.txt"
+
+
+def has_active_cycle(db: Session, rag_id: int) -> bool:
+    return (
+        db.query(UploadCycle.id)
+        .filter(UploadCycle.rag_id == rag_id, UploadCycle.status.in_(ACTIVE_CYCLE_STATUSES))
+        .first()
+        is not None
+    )
+
+
+def enqueue_documents(
+    db: Session,
+    rag_id: int,
+    documents: list[tuple[Path, str | None, str, int]],
+    work_dir: Path,
+) -> tuple[UploadCycle, Task, list[CycleDocument], bool]:
+    """
+    Добавить документы [(staged_path, filename, sha256, size)] в ожидающий цикл RAG одной транзакцией
+    под одной блокировкой: пакет целиком попадает в один цикл (один graphrag index, одна выгрузка prod,
+    merge и approve на весь корпус). Без commit: если commit вызывающего не удался — discard_documents.
+    Возвращает (цикл, задача, документы, queued).
+    """
+    lock_rag(db, rag_id)
+    cycle = (
+        db.query(UploadCycle)
+        .filter(UploadCycle.rag_id == rag_id, UploadCycle.status == "queued")
+        .order_by(UploadCycle.id)
+        .first()
+    )
+    if cycle is None:
+        cycle = UploadCycle(rag_id=rag_id, cycle_n=None, status="queued")
+        db.add(cycle)
+        db.flush()
+        task = Task(rag_id=rag_id, cycle_id=cycle.id, type="full_cycle", status="pending")
+        db.add(task)
+        db.flush()
+    else:
+        task = db.query(Task).filter(Task.cycle_id == cycle.id).one()
+    seq = (
+        db.query(func.coalesce(func.max(CycleDocument.seq), 0))
+        .filter(CycleDocument.cycle_id == cycle.id)
+        .scalar()
+    )
+    input_dir = cycle_input_dir(work_dir, rag_id, cycle.id)
+    input_dir.mkdir(parents=True, exist_ok=True)
+    docs = []
+    try:
+        for staged_path, filename, sha256, size in documents:
+            seq += 1
+            docs.append(
+                CycleDocument(cycle_id=cycle.id, seq=seq, filename=filename, source_sha256=sha256, source_size=size)
+            )
+            os.replace(staged_path, input_dir / cycle_document_name(seq))
+        db.add_all(docs)
+        db.flush()
+    except BaseException:
+        discard_documents(work_dir, rag_id, cycle.id, docs)
+        raise
+    return cycle, task, docs, has_active_cycle(db, rag_id)
+
+
+def discard_documents(work_dir: Path, rag_id: int, cycle_id: int, docs: list[CycleDocument]) -> None:
+    """
+    Убрать из input/ цикла файлы документов, строки которых не записаны (ошибка flush или commit):
+    graphrag индексирует все *.txt каталога — незаписанный документ попал бы в prod.
+    """
+    input_dir = cycle_input_dir(work_dir, rag_id, cycle_id)
+    for doc in docs:
+        (input_dir / cycle_document_name(doc.seq)).unlink(missing_ok=True)
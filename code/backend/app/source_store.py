@@ -0,0 +1,96 @@
+"""
+Хранилище исходных текстов циклов в Postgres: content-addressed (SHA-256) блобы, сжатые zstd,
+порезанные на bytea-чанки (source_blob_chunks). Одинаковые загрузки (в т.ч. в разные RAG) хранятся один раз.
+Worker читает блоб потоково (worker.source_store). Блобы, на которые больше не ссылается ни один документ
+или цикл, удаляются вместе с RAG (delete_unreferenced_blobs).
+"""
+from pathlib import Path
+from typing import Iterable
+
+import zstandard
+from sqlalchemy import delete, exists, insert, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session
+
+from app.models import CycleDocument, SourceBlob, SourceBlobChunk, UploadCycle
+
+CODEC_ZSTD = "zstd"
+# Размер чанка чтения с диска и целевой размер сжатой bytea-строки
+READ_CHUNK_BYTES = 1024 * 1024
+STORED_CHUNK_BYTES = 1024 * 1024
+
+
+def store_source_blob(
+    db: Session,
+    path: Path,
+    sha256: str,
+    size: int,
+    level: int = 3,
+) -> bool:
+    """
+    Сохранить файл path как блоб sha256 (без commit — в транзакции вызывающего).
+    True — блоб записан, False — такой блоб уже есть (дедупликация).
+    Параллельная загрузка того же содержимого ждёт на INSERT ... ON CONFLICT до commit первой.
+    Существующий блоб блокируется FOR KEY SHARE до commit: delete_unreferenced_blobs не удалит его,
+    пока ссылка на него из этой транзакции не станет видна.
+    """
+    while True:
+        created = db.execute(
+            pg_insert(SourceBlob)
+            .values(sha256=sha256, size=size, stored_size=0, codec=CODEC_ZSTD)
+            .on_conflict_do_nothing(index_elements=["sha256"])
+        ).rowcount
+        if created:
+            break
+        locked = db.execute(
+            select(SourceBlob.sha256).where(SourceBlob.sha256 == sha256).with_for_update(read=True, key_share=True)
+        ).first()
+        if locked is not None:
+            return False
+        # Блоб удалён между INSERT и блокировкой — записать заново
+    compressor = zstandard.ZstdCompressor(level=level).compressobj()
+    seq = 0
+    stored = 0
+    pending = bytearray()
+
+    def _flush(data: bytes) -> None:
+        nonlocal seq, stored
+        db.execute(insert(SourceBlobChunk).values(sha256=sha256, seq=seq, data=data))
+        seq += 1
+        stored += len(data)
+
+    with Path(path).open("rb") as f:
+        for chunk in iter(lambda: f.read(READ_CHUNK_BYTES), b""):
+            pending += compressor.compress(chunk)
+            if len(pending) >= STORED_CHUNK_BYTES:
+                _flush(bytes(pending))
+                pending.clear()
+    pending += compressor.flush()
+    if pending:
+        _flush(bytes(pending))
+    db.query(SourceBlob).filter(SourceBlob.sha256 == sha256).update({"stored_size": stored})
+    return True
+
+
+def delete_unreferenced_blobs(db: Session, sha256s: Iterable[str]) -> int:
+    """
+    Удалить блобы из sha256s, на которые не ссылается ни один документ (cycle_documents) или цикл
+    (upload_cycles.source_sha256); чанки — каскадом. Без commit. Сначала блобы блокируются FOR UPDATE:
+    загрузка того же содержимого держит FOR KEY SHARE до commit (store_source_blob) — её ждём, и
+    следующий запрос уже видит её ссылку. Возвращает число удалённых блобов.
+    """
+    shas = sorted(set(sha256s))
+    if not shas:
+        return 0
+    db.execute(
+        select(SourceBlob.sha256).where(SourceBlob.sha256.in_(shas)).order_by(SourceBlob.sha256).with_for_update()
+    )
+    return db.execute(
+        delete(SourceBlob)
+        .where(
+            SourceBlob.sha256.in_(shas),
+            ~exists().where(CycleDocument.source_sha256 == SourceBlob.sha256),
+            ~exists().where(UploadCycle.source_sha256 == SourceBlob.sha256),
+        )
+        .execution_options(synchronize_session=False)
+    ).rowcount
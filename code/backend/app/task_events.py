@@ -0,0 +1,260 @@
+"""
+Статусы задач для WebSocket: одно Redis-подключение на процесс API (PSUBSCRIBE task:*),
+сообщения раздаются подписанным сокетам через asyncio.Queue. Последний статус — из hash task:{id}:state,
+который пишет worker (worker.tasks.base.publish_status).
+В том же hash — проекция строки tasks (task_status, updated_at, ...): её пишут worker (update_task) и
+backend (создание задачи, промах чтения), GET /tasks/{id} отвечает из неё без обращения к PostgreSQL.
+Журнал событий задачи (статусы и прогресс шагов) — Redis Stream task:{id}:events, читается по курсору.
+"""
+import asyncio
+import contextlib
+import json
+import logging
+from functools import lru_cache
+from typing import AsyncIterator
+
+import redis as redis_sync
+import redis.asyncio as redis
+
+from app.config import get_settings
+
+logger = logging.getLogger(__name__)
+
+TASK_CHANNEL_PATTERN = "task:*"
+# Пауза перед переподключением listener после ошибки Redis
+RECONNECT_DELAY_SEC = 1.0
+# Последний статус задачи в Redis живёт неделю (как TASK_STATE_TTL_SEC в worker.tasks.base)
+TASK_STATE_TTL_SEC = 7 * 24 * 3600
+# Поля проекции строки tasks в hash task:{id}:state (status/step/error там же — статус шага)
+TASK_FIELDS = ("rag_id", "cycle_id", "type", "task_status", "task_error", "created_at", "updated_at")
+
+
+def task_state_key(task_id: int) -> str:
+    """Ключ hash с последним статусом задачи (совпадает с worker.tasks.base.task_state_key)."""
+    return f"task:{task_id}:state"
+
+
+def task_events_key(task_id: int) -> str:
+    """Ключ Redis Stream с журналом событий задачи (совпадает с worker.tasks.base.task_events_key)."""
+    return f"task:{task_id}:events"
+
+
+def task_state_fields(task) -> dict[str, str]:
+    """Строка tasks → поля проекции (как worker.tasks.base.task_state_fields; None → пустая строка)."""
+    return {
+        "rag_id": str(task.rag_id),
+        "cycle_id": "" if task.cycle_id is None else str(task.cycle_id),
+        "type": task.type,
+        "task_status": task.status,
+        "task_error": task.error or "",
+        "created_at": task.created_at.isoformat(),
+        "updated_at": task.updated_at.isoformat(),
+    }
+
+
+def store_task_state(r: redis_sync.Redis, task, only_missing: bool = False) -> None:
+    """
+    Записать проекцию задачи в hash task:{id}:state. only_missing — только отсутствующие поля (HSETNX):
+    так чтение из БД не затирает статус, который worker успел записать после этого чтения.
+    """
+    key = task_state_key(task.id)
+    fields = task_state_fields(task)
+    pipe = r.pipeline()
+    if only_missing:
+        for name, value in fields.items():
+            pipe.hsetnx(key, name, value)
+    else:
+        pipe.hset(key, mapping=fields)
+    pipe.expire(key, TASK_STATE_TTL_SEC)
+    pipe.execute()
+
+
+def read_task_state(r: redis_sync.Redis, task_id: int) -> dict | None:
+    """Задача из проекции (поля TaskResponse) или None, если проекции нет или она неполная."""
+    state = r.hgetall(task_state_key(task_id))
+    if not all(name in state for name in TASK_FIELDS):
+        return None
+    return {
+        "id": task_id,
+        "rag_id": int(state["rag_id"]),
+        "cycle_id": int(state["cycle_id"]) if state["cycle_id"] else None,
+        "type": state["type"],
+        "status": state["task_status"],
+        "step": state.get("step") or None,
+        "error": state["task_error"] or None,
+        "created_at": state["created_at"],
+        "updated_at": state["updated_at"],
+    }
+
+
+@lru_cache
+def get_sync_redis() -> redis_sync.Redis:
+    """Синхронный клиент Redis для sync-эндпоинтов (пул соединений на процесс)."""
+    return redis_sync.Redis.from_url(get_settings().redis_url, decode_responses=True)
+
+
+def _stream_id_ms(entry_id: str) -> int:
+    return int(entry_id.split("-", 1)[0])
+
+
+def _parse_event(entry_id: str, fields: dict) -> dict:
+    try:
+        data = json.loads(fields.get("data") or "{}")
+    except json.JSONDecodeError:
+        data = {}
+    percent = fields.get("percent")
+    return {
+        "id": entry_id,
+        "ts": _stream_id_ms(entry_id) / 1000.0,
+        "kind": fields.get("kind", ""),
+        "step": fields.get("step", ""),
+        "percent": float(percent) if percent else None,
+        "data": data,
+    }
+
+
+# Сколько последних записей просматривать в поисках события с процентом
+_LAST_PERCENT_SCAN = 50
+
+
+def read_task_events(
+    r: redis_sync.Redis,
+    task_id: int,
+    cursor: str | None = None,
+    limit: int = 100,
+) -> dict:
+    """
+    События задачи после cursor (id записи stream, не включая её) — не больше limit.
+    Возвращает events, next_cursor (передать в следующий запрос; None — событий ещё не было),
+    текущий percent и оценку скорости/ETA по первой и последней записям с процентом.
+    """
+    key = task_events_key(task_id)
+    start = f"({cursor}" if cursor else "-"
+    entries = r.xrange(key, min=start, max="+", count=limit)
+    events = [_parse_event(entry_id, fields) for entry_id, fields in entries]
+
+    first = next((_parse_event(i, f) for i, f in r.xrange(key, count=1)), None)
+    last = None
+    for entry_id, fields in r.xrevrange(key, count=_LAST_PERCENT_SCAN):
+        ev = _parse_event(entry_id, fields)
+        if ev["percent"] is not None:
+            last = ev
+            break
+
+    percent = last["percent"] if last else None
+    percent_per_sec = None
+    eta_seconds = None
+    if first and last and first["percent"] is not None:
+        elapsed = last["ts"] - first["ts"]
+        gained = last["percent"] - first["percent"]
+        if elapsed > 0 and gained > 0:
+            percent_per_sec = gained / elapsed
+            eta_seconds = round((100.0 - last["percent"]) / percent_per_sec)
+    return {
+        "task_id": task_id,
+        "events": events,
+        "next_cursor": events[-1]["id"] if events else cursor,
+        "percent": percent,
+        "percent_per_sec": percent_per_sec,
+        "eta_seconds": eta_seconds,
+    }
+
+
+def parse_status_payload(data) -> dict:
+    """JSON из канала task:{id} → {status, step, error}. Нераспознанное — как running без шага."""
+    if isinstance(data, str):
+        try:
+            payload = json.loads(data)
+        except json.JSONDecodeError:
+            payload = None
+        if isinstance(payload, dict):
+            return payload
+    return {"status": "running", "step": "", "error": None}
+
+
+class TaskStatusHub:
+    """
+    Общий listener статусов задач. start() поднимает фоновую задачу с `async for pubsub.listen()`;
+    сокеты подписываются через subscribe(task_id) и получают dict-статусы из очереди.
+    Сотни наблюдателей — одно подключение к Redis и ни одного пробуждения без сообщений.
+    """
+
+    def __init__(self) -> None:
+        self._redis: redis.Redis | None = None
+        self._listener: asyncio.Task | None = None
+        self._subscribers: dict[int, set[asyncio.Queue]] = {}
+
+    async def start(self, redis_url: str) -> None:
+        """Подключиться к Redis и запустить listener (вызывается из lifespan приложения)."""
+        self._redis = redis.from_url(redis_url, decode_responses=True)
+        self._listener = asyncio.create_task(self._listen())
+
+    async def stop(self) -> None:
+        """Остановить listener и закрыть подключение."""
+        if self._listener is not None:
+            self._listener.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._listener
+            self._listener = None
+        if self._redis is not None:
+            await self._redis.aclose()
+            self._redis = None
+
+    async def _listen(self) -> None:
+        while True:
+            pubsub = self._redis.pubsub(ignore_subscribe_messages=True)
+            try:
+                await pubsub.psubscribe(TASK_CHANNEL_PATTERN)
+                async for message in pubsub.listen():
+                    if message.get("type") == "pmessage":
+                        self._dispatch(message["channel"], message.get("data"))
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("task status listener failed, reconnecting")
+                await asyncio.sleep(RECONNECT_DELAY_SEC)
+            finally:
+                with contextlib.suppress(Exception):
+                    await pubsub.aclose()
+
+    def _dispatch(self, channel: str, data) -> None:
+        try:
+            task_id = int(channel.split(":", 1)[1])
+        except (IndexError, ValueError):
+            return
+        queues = self._subscribers.get(task_id)
+        if not queues:
+            return
+        payload = parse_status_payload(data)
+        for queue in queues:
+            queue.put_nowait(payload)
+
+    @contextlib.asynccontextmanager
+    async def subscribe(self, task_id: int) -> AsyncIterator[asyncio.Queue]:
+        """Очередь статусов задачи task_id на время контекста."""
+        queue: asyncio.Queue = asyncio.Queue()
+        self._subscribers.setdefault(task_id, set()).add(queue)
+        try:
+            yield queue
+        finally:
+            queues = self._subscribers.get(task_id)
+            if queues is not None:
+                queues.discard(queue)
+                if not queues:
+                    del self._subscribers[task_id]
+
+    async def last_status(self, task_id: int) -> dict | None:
+        """Последний опубликованный статус задачи или None (ещё не публиковался / истёк)."""
+        if self._redis is None:
+            return None
+        state = await self._redis.hgetall(task_state_key(task_id))
+        if not state or "status" not in state:
+            return None
+        return {
+            "status": state["status"],
+            "step": state.get("step", ""),
+            "error": state.get("error") or None,
+        }
+
+
+task_status_hub = TaskStatusHub()
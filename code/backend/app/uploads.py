@@ -0,0 +1,216 @@
+"""
+Потоковое сохранение загружаемых файлов: копирование чанками на диск, SHA-256 и размер на лету.
+Архивы (zip, tar[.gz|.bz2|.xz]) для пакетной загрузки распаковываются по одному элементу тем же способом.
+"""
+import codecs
+import hashlib
+import lzma
+import tarfile
+import uuid
+import zipfile
+import zlib
+from dataclasses import dataclass
+from pathlib import Path, PurePosixPath
+from typing import BinaryIO, Callable, Iterator
+
+from fastapi import HTTPException, UploadFile, status
+
+# Имя константы 413 в starlette менялось между версиями (REQUEST_ENTITY_TOO_LARGE → CONTENT_TOO_LARGE)
+_HTTP_413_TOO_LARGE = 413
+
+ARCHIVE_SUFFIXES = (".zip", ".tar", ".tar.gz", ".tgz", ".tar.bz2", ".tbz2", ".tar.xz", ".txz")
+ARCHIVE_CONTENT_TYPES = frozenset(
+    {
+        "application/zip",
+        "application/x-zip-compressed",
+        "application/x-tar",
+        "application/gzip",
+        "application/x-gzip",
+        "application/x-bzip2",
+        "application/x-xz",
+    }
+)
+# Из архива берутся только текстовые документы; прочее (картинки, служебные файлы) пропускается
+ARCHIVE_TEXT_SUFFIXES = (".txt", ".md")
+# Повреждённый или зашифрованный архив → 400, а не 500
+_ARCHIVE_ERRORS = (zipfile.BadZipFile, tarfile.TarError, EOFError, zlib.error, lzma.LZMAError, RuntimeError)
+
+
+@dataclass
+class SavedUpload:
+    """Результат сохранения: путь на диске, размер в байтах, SHA-256 (hex)."""
+
+    path: Path
+    size: int
+    sha256: str
+
+
+class _ChunkWriter:
+    """Запись чанков в открытый файл: SHA-256, размер с лимитом max_bytes, проверка UTF-8 (если text)."""
+
+    def __init__(self, out: BinaryIO, max_bytes: int, text: bool, name: str) -> None:
+        self.out = out
+        self.max_bytes = max_bytes
+        self.name = name
+        self.digest = hashlib.sha256()
+        self.decoder = codecs.getincrementaldecoder("utf-8")() if text else None
+        self.size = 0
+
+    def write(self, chunk: bytes) -> None:
+        self.size += len(chunk)
+        if self.size > self.max_bytes:
+            raise HTTPException(
+                status_code=_HTTP_413_TOO_LARGE,
+                detail=f"{self.name} too large (limit {self.max_bytes} bytes)",
+            )
+        if self.decoder is not None:
+            self.decoder.decode(chunk)
+        self.digest.update(chunk)
+        self.out.write(chunk)
+
+    def finish(self) -> None:
+        if self.decoder is not None:
+            self.decoder.decode(b"", final=True)
+
+
+def _utf8_error(name: str) -> HTTPException:
+    return HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"{name} must be UTF-8 text")
+
+
+async def save_upload(
+    file: UploadFile,
+    dest: Path,
+    max_bytes: int,
+    chunk_size: int = 1024 * 1024,
+    text: bool = True,
+) -> SavedUpload:
+    """
+    Скопировать UploadFile в dest чанками по chunk_size, попутно считая SHA-256 и проверяя UTF-8
+    (text=False — без проверки, для архивов). В памяти одновременно не больше одного чанка.
+    Превышение max_bytes → 413, не UTF-8 → 400; в обоих случаях частично записанный файл удаляется.
+    """
+    if file.size is not None and file.size > max_bytes:
+        raise HTTPException(
+            status_code=_HTTP_413_TOO_LARGE,
+            detail=f"File too large (limit {max_bytes} bytes)",
+        )
+    dest = Path(dest)
+    dest.parent.mkdir(parents=True, exist_ok=True)
+    try:
+        with dest.open("wb") as out:
+            writer = _ChunkWriter(out, max_bytes, text, "File")
+            while True:
+                chunk = await file.read(chunk_size)
+                if not chunk:
+                    break
+                writer.write(chunk)
+            writer.finish()
+    except UnicodeDecodeError:
+        dest.unlink(missing_ok=True)
+        raise _utf8_error("File")
+    except BaseException:
+        dest.unlink(missing_ok=True)
+        raise
+    return SavedUpload(path=dest, size=writer.size, sha256=writer.digest.hexdigest())
+
+
+def save_fileobj(src: BinaryIO, dest: Path, max_bytes: int, chunk_size: int, name: str) -> SavedUpload:
+    """Sync-аналог save_upload для элемента архива (UTF-8 обязателен; name — для текста ошибок)."""
+    dest = Path(dest)
+    dest.parent.mkdir(parents=True, exist_ok=True)
+    try:
+        with dest.open("wb") as out:
+            writer = _ChunkWriter(out, max_bytes, True, name)
+            for chunk in iter(lambda: src.read(chunk_size), b""):
+                writer.write(chunk)
+            writer.finish()
+    except UnicodeDecodeError:
+        dest.unlink(missing_ok=True)
+        raise _utf8_error(name)
+    except BaseException:
+        dest.unlink(missing_ok=True)
+        raise
+    return SavedUpload(path=dest, size=writer.size, sha256=writer.digest.hexdigest())
+
+
+def is_archive(filename: str | None, content_type: str | None) -> bool:
+    """Файл пакетной загрузки — архив (по расширению или Content-Type), а не текстовый документ."""
+    if filename and filename.lower().endswith(ARCHIVE_SUFFIXES):
+        return True
+    return (content_type or "").split(";")[0].strip().lower() in ARCHIVE_CONTENT_TYPES
+
+
+def _wanted_member(name: str) -> bool:
+    path = PurePosixPath(name)
+    if any(part.startswith(".") or part == "__MACOSX" for part in path.parts):
+        return False
+    return path.suffix.lower() in ARCHIVE_TEXT_SUFFIXES
+
+
+def _archive_members(path: Path) -> Iterator[tuple[str, Callable[[], BinaryIO]]]:
+    """(имя, открыть поток) для обычных файлов архива; не архив → 400."""
+    if zipfile.is_zipfile(path):
+        with zipfile.ZipFile(path) as zf:
+            for info in zf.infolist():
+                if not info.is_dir():
+                    yield info.filename, lambda info=info: zf.open(info)
+        return
+    try:
+        tf = tarfile.open(path, "r:*")
+    except tarfile.TarError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Archive must be zip or tar (.tar, .tar.gz, .tar.bz2, .tar.xz)",
+        )
+    with tf:
+        for member in tf:
+            if member.isreg():
+                yield member.name, lambda member=member: tf.extractfile(member)
+
+
+def extract_archive(
+    path: Path,
+    dest_dir: Path,
+    max_bytes: int,
+    chunk_size: int,
+    max_documents: int,
+    max_total_bytes: int,
+) -> tuple[list[tuple[str, SavedUpload]], int]:
+    """
+    Распаковать текстовые документы архива path в dest_dir под уникальными именами (пути из архива
+    в файловую систему не попадают). Каждый элемент — потоково, с лимитом max_bytes и проверкой UTF-8;
+    суммарно не больше max_documents документов и max_total_bytes распакованных байт (защита от zip-бомб).
+    Возвращает ([(имя в архиве, SavedUpload)], число пропущенных не-текстовых элементов).
+    При ошибке уже распакованные файлы удаляются.
+    """
+    saved: list[tuple[str, SavedUpload]] = []
+    skipped = 0
+    total = 0
+    try:
+        try:
+            for name, open_member in _archive_members(path):
+                if not _wanted_member(name):
+                    skipped += 1
+                    continue
+                if len(saved) >= max_documents:
+                    raise HTTPException(
+                        status_code=_HTTP_413_TOO_LARGE,
+                        detail=f"Too many documents (limit {max_documents})",
+                    )
+                with open_member() as src:
+                    doc = save_fileobj(
+                        src,
+                        Path(dest_dir) / f"{uuid.uuid4().hex}.txt",
+                        min(max_bytes, max_total_bytes - total),
+                        chunk_size,
+                        name,
+                    )
+                saved.append((name, doc))
+                total += doc.size
+        except _ARCHIVE_ERRORS as e:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Cannot read archive: {e}")
+    except BaseException:
+        for _, doc in saved:
+            doc.path.unlink(missing_ok=True)
+        raise
+    return saved, skipped
@@ -0,0 +1,466 @@
+#!/usr/bin/env python3
+"""
+Балансировка запросов к нескольким OpenAI-совместимым LLM (LM Studio на разных машинах).
+
+Список endpoint'ов — строка через запятую, параметры через «;»:
+  http://10.7.0.3:1234/v1;weight=2;max=4,http://10.7.0.5:1234/v1;max=2;model=llama-3.3-70b-instruct
+  weight — доля нагрузки (по умолчанию 1), max — лимит одновременных запросов (0 — без лимита),
+  model — имя модели на этом endpoint (если отличается от общего llm_model).
+
+Выбор endpoint: из здоровых со свободным слотом — с наименьшим (outstanding + 1) / weight
+(least outstanding requests с весами); нет свободного слота — ждать освобождения.
+Сбой (соединение, таймаут, 5xx, 429) — endpoint выводится из ротации на cooldown,
+запрос повторяется на другом (failover). Фоновая проверка GET {url}/models возвращает endpoint.
+
+Использование:
+  - чат и schema induction: get_router(spec).call(lambda ep: ...(ep.url, ep.model or model)) — в fn только
+    сам запрос к LLM (повторяется на каждом endpoint'е при failover);
+  - graphrag index (отдельный процесс, один api_base): LLMProxy — локальный HTTP-прокси
+    в процессе worker, api_base = proxy.base_url; запросы сверх лимитов ждут в прокси;
+  - отдельный сервис: python llm_router.py serve --endpoints "..." --port 41240
+"""
+
+import argparse
+import http.client
+import json
+import logging
+import random
+import socket
+import threading
+import time
+import urllib.error
+import urllib.request
+from dataclasses import dataclass, field
+from functools import lru_cache
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, TypeVar
+from urllib.parse import urlsplit
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+HEALTH_INTERVAL_SEC = 15.0
+HEALTH_TIMEOUT_SEC = 5.0
+FAIL_COOLDOWN_SEC = 30.0
+# Коды ответа, после которых запрос повторяется на другом endpoint
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+# Сколько байт ответа прокси держит в памяти ради usage (on_usage)
+USAGE_CAPTURE_MAX_BYTES = 8 * 1024 * 1024
+# Сбои соединения с endpoint'ом (отказ, таймаут, DNS, обрыв HTTP); URLError — обёртка urllib над ними
+NETWORK_ERRORS = (ConnectionError, TimeoutError, socket.gaierror, urllib.error.URLError, http.client.HTTPException)
+
+
+class NoHealthyEndpoint(RuntimeError):
+    """Все endpoint'ы недоступны (или исчерпаны попытки failover)."""
+
+
+@dataclass
+class Endpoint:
+    url: str
+    weight: float = 1.0
+    max_concurrency: int = 0
+    model: str | None = None
+    outstanding: int = 0
+    healthy: bool = True
+    down_until: float = 0.0
+    requests: int = 0
+    failures: int = 0
+    last_error: str | None = field(default=None, repr=False)
+
+    def available(self, now: float) -> bool:
+        return self.healthy or now >= self.down_until
+
+    def has_slot(self) -> bool:
+        return not self.max_concurrency or self.outstanding < self.max_concurrency
+
+
+def parse_endpoints(spec: str) -> list[Endpoint]:
+    """Разбор строки endpoint'ов (формат — в docstring модуля)."""
+    endpoints = []
+    for item in spec.split(","):
+        item = item.strip()
+        if not item:
+            continue
+        url, *params = [p.strip() for p in item.split(";")]
+        ep = Endpoint(url=url.rstrip("/"))
+        for param in params:
+            key, _, value = param.partition("=")
+            key = key.strip().lower()
+            if key == "weight":
+                ep.weight = float(value)
+            elif key in ("max", "max_concurrency"):
+                ep.max_concurrency = int(value)
+            elif key == "model":
+                ep.model = value.strip() or None
+            else:
+                raise ValueError(f"Неизвестный параметр endpoint {url}: {key}")
+        if ep.weight <= 0:
+            raise ValueError(f"weight должен быть > 0: {item}")
+        endpoints.append(ep)
+    if not endpoints:
+        raise ValueError("Пустой список LLM endpoint'ов")
+    return endpoints
+
+
+def is_retryable(exc: BaseException) -> bool:
+    """Ошибка endpoint'а (имеет смысл повторить на другом), а не запроса."""
+    status = getattr(exc, "status_code", None) or getattr(exc, "code", None)
+    if isinstance(status, int):
+        return status in RETRYABLE_STATUS
+    # Сетевые ошибки — не любой OSError: локальные FileNotFoundError / PermissionError не сбой endpoint'а
+    if isinstance(exc, NETWORK_ERRORS):
+        return True
+    # openai.APIConnectionError / APITimeoutError — без status_code
+    return type(exc).__name__ in ("APIConnectionError", "APITimeoutError")
+
+
+class LLMRouter:
+    """Выбор endpoint'а, учёт незавершённых запросов, health checks и failover."""
+
+    def __init__(
+        self,
+        endpoints: list[Endpoint],
+        health_interval: float = HEALTH_INTERVAL_SEC,
+        fail_cooldown: float = FAIL_COOLDOWN_SEC,
+    ) -> None:
+        self.endpoints = endpoints
+        self.health_interval = health_interval
+        self.fail_cooldown = fail_cooldown
+        self._cond = threading.Condition()
+        self._health_thread: threading.Thread | None = None
+
+    # --- выбор endpoint ---
+
+    def acquire(self, exclude: set[str] | None = None, timeout: float | None = None) -> Endpoint:
+        """
+        Занять слот на лучшем endpoint (без exclude). Если все доступные заняты — ждать;
+        если все endpoint'ы в exclude — NoHealthyEndpoint.
+        """
+        self._ensure_health_checks()
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while True:
+                now = time.time()
+                untried = [ep for ep in self.endpoints if not (exclude and ep.url in exclude)]
+                if not untried:
+                    raise NoHealthyEndpoint("Нет доступных LLM endpoint'ов")
+                # Все на cooldown — пробуем всё равно: попытка лучше гарантированного отказа
+                candidates = [ep for ep in untried if ep.available(now)] or untried
+                free = [ep for ep in candidates if ep.has_slot()]
+                if free:
+                    best = min((ep.outstanding + 1) / ep.weight for ep in free)
+                    ep = random.choice([e for e in free if (e.outstanding + 1) / e.weight == best])
+                    ep.outstanding += 1
+                    ep.requests += 1
+                    return ep
+                wait = None if deadline is None else deadline - time.monotonic()
+                if wait is not None and wait <= 0:
+                    raise NoHealthyEndpoint("Таймаут ожидания свободного LLM endpoint")
+                # Пробуждение по release или по концу cooldown упавшего endpoint
+                self._cond.wait(min(wait, self.fail_cooldown) if wait is not None else self.fail_cooldown)
+
+    def release(self, ep: Endpoint, error: BaseException | None = None) -> None:
+        with self._cond:
+            ep.outstanding -= 1
+            if error is not None:
+                self._mark_down(ep, error)
+            elif not ep.healthy:
+                ep.healthy = True
+            self._cond.notify_all()
+
+    def _mark_down(self, ep: Endpoint, error: BaseException | str) -> None:
+        ep.failures += 1
+        ep.last_error = str(error)
+        if ep.healthy:
+            logger.warning("LLM endpoint %s выведен из ротации: %s", ep.url, error)
+        ep.healthy = False
+        ep.down_until = time.time() + self.fail_cooldown
+
+    def call(self, fn: Callable[[Endpoint], T], attempts: int | None = None) -> T:
+        """
+        fn(endpoint) с failover: при ошибке endpoint'а (is_retryable) — повтор на другом,
+        не более attempts раз (по умолчанию — по числу endpoint'ов). Ошибки запроса — сразу наружу.
+        """
+        attempts = attempts or len(self.endpoints)
+        tried: set[str] = set()
+        last_error: BaseException | None = None
+        for _ in range(attempts):
+            try:
+                ep = self.acquire(exclude=tried)
+            except NoHealthyEndpoint:
+                if last_error is not None:
+                    raise last_error
+                raise
+            try:
+                result = fn(ep)
+            except BaseException as e:
+                retry = is_retryable(e)
+                self.release(ep, e if retry else None)
+                if not retry:
+                    raise
+                tried.add(ep.url)
+                last_error = e
+                continue
+            self.release(ep)
+            return result
+        raise last_error or NoHealthyEndpoint("Нет доступных LLM endpoint'ов")
+
+    # --- health checks ---
+
+    def _ensure_health_checks(self) -> None:
+        if self.health_interval <= 0 or len(self.endpoints) < 2 or self._health_thread is not None:
+            return
+        with self._cond:
+            if self._health_thread is None:
+                self._health_thread = threading.Thread(target=self._health_loop, name="llm-health", daemon=True)
+                self._health_thread.start()
+
+    def check_health(self) -> None:
+        """GET {url}/models по каждому endpoint: 200 — в ротации, иначе — на cooldown."""
+        for ep in self.endpoints:
+            try:
+                with urllib.request.urlopen(f"{ep.url}/models", timeout=HEALTH_TIMEOUT_SEC) as resp:
+                    ok = resp.status == 200
+                error = None if ok else f"HTTP {resp.status}"
+            except (OSError, http.client.HTTPException) as e:
+                error = e
+            with self._cond:
+                if error is None:
+                    if not ep.healthy:
+                        logger.info("LLM endpoint %s снова доступен", ep.url)
+                    ep.healthy = True
+                    ep.down_until = 0.0
+                    self._cond.notify_all()
+                else:
+                    self._mark_down(ep, error)
+
+    def _health_loop(self) -> None:
+        while True:
+            time.sleep(self.health_interval)
+            try:
+                self.check_health()
+            except Exception:
+                logger.exception("LLM health check failed")
+
+    def snapshot(self) -> list[dict]:
+        with self._cond:
+            return [
+                {
+                    "url": ep.url, "weight": ep.weight, "max_concurrency": ep.max_concurrency,
+                    "model": ep.model, "healthy": ep.healthy, "outstanding": ep.outstanding,
+                    "requests": ep.requests, "failures": ep.failures, "last_error": ep.last_error,
+                }
+                for ep in self.endpoints
+            ]
+
+
+@lru_cache(maxsize=None)
+def get_router(spec: str) -> LLMRouter:
+    """Роутер на процесс для строки endpoint'ов (состояние здоровья и счётчики — общие)."""
+    return LLMRouter(parse_endpoints(spec))
+
+
+# --- HTTP-прокси (graphrag index, внешние клиенты) ---
+
+_HOP_HEADERS = {"connection", "keep-alive", "transfer-encoding", "te", "upgrade", "host", "content-length"}
+
+
+def response_usage(body: bytes) -> dict | None:
+    """
+    usage ответа OpenAI API (prompt_tokens, completion_tokens, total_tokens): JSON (chat.completions,
+    embeddings) или поток SSE (usage — в последнем событии при stream_options.include_usage). None — usage нет.
+    """
+    text = body.decode("utf-8", errors="replace").strip()
+    if text.startswith("{"):
+        docs = [text]
+    else:
+        docs = [line[5:].strip() for line in text.splitlines() if line.startswith("data:")]
+    for doc in reversed(docs):
+        try:
+            usage = json.loads(doc).get("usage")
+        except (ValueError, AttributeError):
+            continue
+        if isinstance(usage, dict):
+            return usage
+    return None
+
+
+class _ProxyHandler(BaseHTTPRequestHandler):
+    router: LLMRouter
+    timeout_sec: float = 3600.0
+    # on_usage(usage | None) — после каждого успешно отданного ответа endpoint'а (response_usage)
+    on_usage: Callable[[dict | None], None] | None = None
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, fmt, *args):
+        logger.debug("llm proxy: " + fmt, *args)
+
+    def do_GET(self):
+        if self.path.rstrip("/").endswith("/router/status"):
+            body = json.dumps(self.router.snapshot(), ensure_ascii=False).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+            return
+        self._forward(None)
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        self._forward(self.rfile.read(length))
+
+    def _forward(self, body: bytes | None) -> None:
+        # Путь клиента относительно /v1 прокси → относительно base url endpoint'а
+        path = self.path.split("/v1", 1)[1] if "/v1" in self.path else self.path
+        headers = {k: v for k, v in self.headers.items() if k.lower() not in _HOP_HEADERS}
+        if self.on_usage is not None:
+            # usage читается из тела ответа — без сжатия
+            headers = {k: v for k, v in headers.items() if k.lower() != "accept-encoding"}
+        started = False
+
+        def send(ep: Endpoint) -> None:
+            nonlocal started
+            payload = body
+            if ep.model and body:
+                try:
+                    data = json.loads(body)
+                    data["model"] = ep.model
+                    payload = json.dumps(data).encode("utf-8")
+                except ValueError:
+                    pass
+            target = urlsplit(ep.url)
+            conn_cls = http.client.HTTPSConnection if target.scheme == "https" else http.client.HTTPConnection
+            conn = conn_cls(target.netloc, timeout=self.timeout_sec)
+            try:
+                conn.request(self.command, target.path.rstrip("/") + path, body=payload, headers=headers)
+                resp = conn.getresponse()
+                if resp.status in RETRYABLE_STATUS:
+                    resp.read()
+                    raise urllib.error.HTTPError(ep.url + path, resp.status, resp.reason, resp.headers, None)
+                # С первого байта ответа failover невозможен: обрыв (клиента или endpoint'а) —
+                # только закрыть соединение, не считая его сбоем endpoint'а
+                started = True
+                # Копия ответа для usage (on_usage): ответы LLM — килобайты, крупнее лимита не разбираются
+                captured = bytearray() if self.on_usage is not None and resp.status == 200 else None
+                try:
+                    self.send_response(resp.status)
+                    for k, v in resp.getheaders():
+                        if k.lower() not in _HOP_HEADERS:
+                            self.send_header(k, v)
+                    self.send_header("Transfer-Encoding", "chunked")
+                    self.end_headers()
+                    while True:
+                        chunk = resp.read1(65536)
+                        if not chunk:
+                            break
+                        if captured is not None:
+                            captured += chunk
+                            if len(captured) > USAGE_CAPTURE_MAX_BYTES:
+                                captured = None
+                                self.on_usage(None)
+                        self.wfile.write(f"{len(chunk):x}\r\n".encode("ascii") + chunk + b"\r\n")
+                        self.wfile.flush()
+                    self.wfile.write(b"0\r\n\r\n")
+                    if captured is not None:
+                        self.on_usage(response_usage(bytes(captured)))
+                except (OSError, http.client.HTTPException) as e:
+                    self.close_connection = True
+                    logger.info("llm proxy: ответ %s прерван: %s", ep.url, e)
+            finally:
+                conn.close()
+
+        try:
+            self.router.call(send)
+        except Exception as e:
+            if started:
+                self.close_connection = True
+                return
+            status = getattr(e, "code", None) if isinstance(getattr(e, "code", None), int) else 502
+            msg = json.dumps({"error": {"message": f"LLM router: {e}", "type": "upstream_error"}}).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(msg)))
+            self.end_headers()
+            self.wfile.write(msg)
+
+
+class LLMProxy:
+    """
+    Локальный OpenAI-совместимый прокси поверх LLMRouter в фоновом потоке.
+    with LLMProxy(router) as proxy: ... api_base=proxy.base_url ...
+    on_usage — учёт вызовов и токенов (usage ответов) клиента, который сам их не сообщает (graphrag index).
+    """
+
+    def __init__(
+        self,
+        router: LLMRouter,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        timeout: float = 3600.0,
+        on_usage: Callable[[dict | None], None] | None = None,
+    ) -> None:
+        attrs = {"router": router, "timeout_sec": timeout}
+        if on_usage is not None:
+            # staticmethod: иначе функция в атрибуте класса станет методом обработчика
+            attrs["on_usage"] = staticmethod(on_usage)
+        handler = type("LLMProxyHandler", (_ProxyHandler,), attrs)
+        self.server = ThreadingHTTPServer((host, port), handler)
+        self.server.daemon_threads = True
+        self._thread: threading.Thread | None = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def start(self) -> "LLMProxy":
+        self._thread = threading.Thread(target=self.server.serve_forever, name="llm-proxy", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self) -> "LLMProxy":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Балансировщик OpenAI-совместимых LLM endpoint'ов")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    serve = sub.add_parser("serve", help="HTTP-прокси /v1 → endpoint'ы")
+    serve.add_argument("--endpoints", required=True, help="url[;weight=N][;max=N][;model=M],...")
+    serve.add_argument("--host", default="127.0.0.1")
+    serve.add_argument("--port", type=int, default=41240)
+    serve.add_argument("--health-interval", type=float, default=HEALTH_INTERVAL_SEC)
+    status = sub.add_parser("status", help="Проверить доступность endpoint'ов")
+    status.add_argument("--endpoints", required=True)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+
+    if args.cmd == "status":
+        router = LLMRouter(parse_endpoints(args.endpoints), health_interval=0)
+        router.check_health()
+        print(json.dumps(router.snapshot(), ensure_ascii=False, indent=2))
+        return
+
+    router = LLMRouter(parse_endpoints(args.endpoints), health_interval=args.health_interval)
+    router.check_health()
+    proxy = LLMProxy(router, host=args.host, port=args.port)
+    print(f"LLM router: {proxy.base_url} → {', '.join(ep.url for ep in router.endpoints)}")
+    try:
+        proxy.server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        proxy.server.server_close()
+
+
+if __name__ == "__main__":
+    main()
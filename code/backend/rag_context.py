@@ -5,8 +5,12 @@
 План 26-0215-1600: вариант A — привязка контекста к словам вопроса (1.2.x).
 """
 
+import math
 import re
 import sys
+import time
+from functools import lru_cache
+from typing import Callable, Optional
 
 try:
     import requests
@@ -14,6 +18,11 @@ except ImportError:
     print("Требуется requests: pip install requests", file=sys.stderr)
     sys.exit(1)
 
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
 FUSEKI = "http://localhost:3030"
 AUTH = ("admin", "ferag2026")
 DS = "ferag-prod"
@@ -22,6 +31,12 @@ DS = "ferag-prod"
 ENTITY_LIMIT = 15
 RELATIONSHIP_LIMIT = 15
 
+# Бюджет контекста в токенах (pack_context): кодировка tiktoken; без tiktoken — оценка по символам
+TOKEN_ENCODING = "cl100k_base"
+CHARS_PER_TOKEN = 3
+# Описание сначала обрезается до стольких токенов (больше фактов), затем дополняется по рангу
+DESC_MIN_TOKENS = 24
+
 # 1.2.1 Стоп-слова (рус/англ) для извлечения ключевых слов из вопроса
 STOP_WORDS = frozenset({
     "кто", "что", "где", "как", "какой", "какая", "какие", "почему", "когда",
@@ -103,7 +118,53 @@ LIMIT %(limit)d
 """
 
 
-def sparql(query: str, url: str = FUSEKI, auth: tuple = AUTH, ds: str = DS) -> dict:
+# Пакетный контекст (чат batch): подзапросы 1.2.2/1.2.3 нескольких вопросов объединяются через UNION
+# в один SELECT; у каждого подзапроса свои ORDER BY/LIMIT, ?g — номер набора ключевых слов.
+# Подстановка: %(union)s — подзапросы через UNION
+BATCH_QUERY = """
+PREFIX rdf: <http://www.w3.org/1999/02/22-rdf-syntax-ns#>
+PREFIX ferag: <http://example.org/ferag#>
+SELECT * WHERE {
+%(union)s
+}
+"""
+
+# Подстановка: %(g)d — номер набора, %(filter)s — FILTER(...), %(limit)d — LIMIT
+ENTITIES_SUBQUERY = """  { SELECT ?g ?s ?type ?desc WHERE {
+    ?s rdf:type ?type .
+    FILTER(STRSTARTS(STR(?s), "http://example.org/ferag#"))
+    FILTER(STRSTARTS(STR(?type), "http://example.org/ferag#"))
+    OPTIONAL { ?s ferag:description ?desc }
+    %(filter)s
+    BIND(%(g)d AS ?g)
+  } ORDER BY ?s LIMIT %(limit)d }"""
+
+RELATIONSHIPS_SUBQUERY = """  { SELECT ?g ?from ?to ?desc WHERE {
+    ?r a ferag:Relationship ;
+       ferag:from ?from ;
+       ferag:to ?to .
+    OPTIONAL { ?r ferag:description ?desc }
+    %(filter)s
+    BIND(%(g)d AS ?g)
+  } ORDER BY ?from ?to LIMIT %(limit)d }"""
+
+# Подзапросов в одном SELECT (длина запроса и время выполнения в Fuseki)
+BATCH_GROUPS_PER_QUERY = 25
+
+
+def sparql(
+    query: str,
+    url: str = FUSEKI,
+    auth: tuple = AUTH,
+    ds: str = DS,
+    name: str = "query",
+    observe: Optional[Callable[[str, float], None]] = None,
+) -> dict:
+    """
+    SELECT-запрос к {url}/{ds}/query, результат — SPARQL JSON.
+    observe(name, seconds) — необязательный замер длительности (backend: гистограмма по подзапросам).
+    """
+    started = time.perf_counter()
     r = requests.post(
         f"{url.rstrip('/')}/{ds}/query",
         auth=auth,
@@ -112,7 +173,10 @@ def sparql(query: str, url: str = FUSEKI, auth: tuple = AUTH, ds: str = DS) -> d
         timeout=30,
     )
     r.raise_for_status()
-    return r.json()
+    result = r.json()
+    if observe is not None:
+        observe(name, time.perf_counter() - started)
+    return result
 
 
 def _local_name(uri: str) -> str:
@@ -145,32 +209,40 @@ def extract_keywords(question: str) -> list[str]:
     return out
 
 
-def fetch_entities_by_keywords(
-    keywords: list[str],
-    limit: int = 20,
-    **sparql_kw,
-) -> list[dict]:
-    """
-    1.2.2 SPARQL: сущности по совпадению с вопросом (план 26-0215-1600).
-    Возвращает сущности из ferag#, у которых в локальном имени или в описании
-    встречается хотя бы одно из переданных слов (без учёта регистра).
-    Формат возврата: как у fetch_entities() — name, type, description.
-    """
-    if not keywords:
-        return []
+def _entity_keywords_filter(keywords: list[str]) -> str:
+    """FILTER 1.2.2: любое из слов в URI сущности (локальное имя после #) или в описании."""
     parts = []
     for w in keywords:
         esc = _sparql_str_escape(w)
-        # Совпадение в URI (локальное имя после #) или в описании
         parts.append(
             f'CONTAINS(LCASE(STR(?s)), "{esc}") '
             f'|| (BOUND(?desc) && CONTAINS(LCASE(STR(?desc)), "{esc}"))'
         )
-    filter_clause = "FILTER(" + " || ".join(parts) + ")"
-    q = ENTITIES_BY_KEYWORDS_QUERY % {"filter": filter_clause, "limit": limit}
-    j = sparql(q, **sparql_kw)
+    return "FILTER(" + " || ".join(parts) + ")"
+
+
+def _entity_names_filter(entity_names: list[str]) -> str:
+    """FILTER 1.2.3 (вариант 1): from или to — среди локальных имён сущностей."""
+    in_list = ", ".join(f'"{_sparql_str_escape(n)}"' for n in entity_names)
+    return (
+        f"FILTER(REPLACE(STR(?from), \"^.*#\", \"\") IN ({in_list}) "
+        f"|| REPLACE(STR(?to), \"^.*#\", \"\") IN ({in_list}))"
+    )
+
+
+def _description_keywords_filter(keywords: list[str]) -> str:
+    """FILTER 1.2.3 (вариант 2): любое из слов в ferag:description связи."""
+    parts = []
+    for w in keywords:
+        esc = _sparql_str_escape(w)
+        parts.append("(BOUND(?desc) && CONTAINS(LCASE(STR(?desc)), \"" + esc + "\"))")
+    return "FILTER(" + " || ".join(parts) + ")"
+
+
+def _parse_entity_bindings(bindings: list) -> list[dict]:
+    """Разбор результатов SPARQL по сущностям в формат name, type, description."""
     out = []
-    for b in j["results"]["bindings"]:
+    for b in bindings:
         name = _local_name(b["s"]["value"])
         type_local = _local_name(b["type"]["value"])
         desc = b.get("desc")
@@ -179,21 +251,32 @@ def fetch_entities_by_keywords(
     return out
 
 
+def fetch_entities_by_keywords(
+    keywords: list[str],
+    limit: int = 20,
+    **sparql_kw,
+) -> list[dict]:
+    """
+    1.2.2 SPARQL: сущности по совпадению с вопросом (план 26-0215-1600).
+    Возвращает сущности из ferag#, у которых в локальном имени или в описании
+    встречается хотя бы одно из переданных слов (без учёта регистра).
+    Формат возврата: как у fetch_entities() — name, type, description.
+    """
+    if not keywords:
+        return []
+    q = ENTITIES_BY_KEYWORDS_QUERY % {"filter": _entity_keywords_filter(keywords), "limit": limit}
+    j = sparql(q, name="entities_by_keywords", **sparql_kw)
+    return _parse_entity_bindings(j["results"]["bindings"])
+
+
 def fetch_entities(limit: int = ENTITY_LIMIT, **sparql_kw) -> list[dict]:
     """
     Запрос 1.1.2: фиксированная выборка сущностей из ferag-prod.
     Возвращает список словарей с ключами: name, type, description (str или пустая строка).
     """
     q = ENTITIES_QUERY % limit
-    j = sparql(q, **sparql_kw)
-    out = []
-    for b in j["results"]["bindings"]:
-        name = _local_name(b["s"]["value"])
-        type_local = _local_name(b["type"]["value"])
-        desc = b.get("desc")
-        desc_str = desc["value"] if desc else ""
-        out.append({"name": name, "type": type_local, "description": desc_str})
-    return out
+    j = sparql(q, name="entities", **sparql_kw)
+    return _parse_entity_bindings(j["results"]["bindings"])
 
 
 def fetch_relationships(limit: int = RELATIONSHIP_LIMIT, **sparql_kw) -> list[dict]:
@@ -202,7 +285,7 @@ def fetch_relationships(limit: int = RELATIONSHIP_LIMIT, **sparql_kw) -> list[di
     Возвращает список словарей с ключами: from_name, to_name, description (str или пустая строка).
     """
     q = RELATIONSHIPS_QUERY % limit
-    j = sparql(q, **sparql_kw)
+    j = sparql(q, name="relationships", **sparql_kw)
     out = []
     for b in j["results"]["bindings"]:
         from_name = _local_name(b["from"]["value"])
@@ -237,14 +320,8 @@ def fetch_relationships_by_entity_names(
     """
     if not entity_names:
         return []
-    escaped = [_sparql_str_escape(n) for n in entity_names]
-    in_list = ", ".join(f'"{s}"' for s in escaped)
-    filter_clause = (
-        f"FILTER(REPLACE(STR(?from), \"^.*#\", \"\") IN ({in_list}) "
-        f"|| REPLACE(STR(?to), \"^.*#\", \"\") IN ({in_list}))"
-    )
-    q = RELATIONSHIPS_BY_ENTITIES_QUERY % {"filter": filter_clause, "limit": limit}
-    j = sparql(q, **sparql_kw)
+    q = RELATIONSHIPS_BY_ENTITIES_QUERY % {"filter": _entity_names_filter(entity_names), "limit": limit}
+    j = sparql(q, name="relationships_by_entities", **sparql_kw)
     return _parse_relationship_bindings(j["results"]["bindings"])
 
 
@@ -258,13 +335,8 @@ def fetch_relationships_by_description_keywords(
     """
     if not keywords:
         return []
-    parts = []
-    for w in keywords:
-        esc = _sparql_str_escape(w)
-        parts.append("(BOUND(?desc) && CONTAINS(LCASE(STR(?desc)), \"" + esc + "\"))")
-    filter_clause = "FILTER(" + " || ".join(parts) + ")"
-    q = RELATIONSHIPS_BY_DESC_QUERY % {"filter": filter_clause, "limit": limit}
-    j = sparql(q, **sparql_kw)
+    q = RELATIONSHIPS_BY_DESC_QUERY % {"filter": _description_keywords_filter(keywords), "limit": limit}
+    j = sparql(q, name="relationships_by_description", **sparql_kw)
     return _parse_relationship_bindings(j["results"]["bindings"])
 
 
@@ -307,35 +379,151 @@ def fetch_relationships_for_question(
     return result
 
 
-def build_context_fixed(**sparql_kw) -> str:
+def build_context_fixed(token_budget: Optional[int] = None, **sparql_kw) -> str:
     """
     1.1.4 Сборка контекста (вариант B): вызывает fetch_entities() и fetch_relationships(),
     возвращает один текстовый блок в формате 1.1.1 для подстановки в промпт LLM.
-    Вход: без параметра вопроса. Выход: строка контекста.
+    Вход: без параметра вопроса (token_budget — см. pack_context). Выход: строка контекста.
     """
     entities = fetch_entities(**sparql_kw)
     relationships = fetch_relationships(**sparql_kw)
-    return _format_context(entities, relationships)
+    return pack_context(entities, relationships, token_budget=token_budget)
+
+
+def _entity_line(e: dict, desc: str) -> str:
+    return f"Сущность {e['name']} (тип {e['type']}): {desc or '—'}"
+
+
+def _relationship_line(r: dict, desc: str) -> str:
+    return f"Связь: {r['from_name']} → {r['to_name']} — {desc or '—'}"
 
 
 def _format_context(entities: list[dict], relationships: list[dict]) -> str:
     """Сборка текстового блока контекста в формате 1.1.1 (сущности + связи)."""
     lines = ["=== Сущности ==="]
     for e in entities:
-        desc = e["description"].strip() or "—"
-        lines.append(f"Сущность {e['name']} (тип {e['type']}): {desc}")
+        lines.append(_entity_line(e, e["description"].strip()))
     lines.append("")
     lines.append("=== Связи ===")
     for r in relationships:
-        desc = r["description"].strip() or "—"
-        lines.append(f"Связь: {r['from_name']} → {r['to_name']} — {desc}")
+        lines.append(_relationship_line(r, r["description"].strip()))
     return "\n".join(lines)
 
 
-def build_context_by_question(question: str, **sparql_kw) -> str:
+@lru_cache(maxsize=1)
+def _encoding():
+    """Кодировка tiktoken или None (не установлен или нет файла BPE офлайн)."""
+    if tiktoken is None:
+        return None
+    try:
+        return tiktoken.get_encoding(TOKEN_ENCODING)
+    except Exception:
+        return None
+
+
+def count_tokens(text: str) -> int:
+    """Число токенов текста (tiktoken TOKEN_ENCODING; без него — len / CHARS_PER_TOKEN с округлением вверх)."""
+    enc = _encoding()
+    if enc is not None:
+        return len(enc.encode(text, disallowed_special=()))
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def _trim_to_tokens(text: str, max_tokens: int) -> str:
+    """Обрезать текст до max_tokens токенов (с «…» в конце, если обрезан)."""
+    if max_tokens <= 0:
+        return ""
+    if count_tokens(text) <= max_tokens:
+        return text
+    enc = _encoding()
+    if enc is not None:
+        cut = enc.decode(enc.encode(text, disallowed_special=())[: max_tokens - 1])
+    else:
+        cut = text[: (max_tokens - 1) * CHARS_PER_TOKEN]
+        # по границе слова, если она не слишком далеко
+        space = cut.rfind(" ")
+        if space > len(cut) // 2:
+            cut = cut[:space]
+    return cut.rstrip() + "…"
+
+
+def _keyword_score(text: str, keywords: list[str]) -> int:
+    low = text.lower()
+    return sum(1 for w in keywords if w in low)
+
+
+def pack_context(
+    entities: list[dict],
+    relationships: list[dict],
+    keywords: Optional[list[str]] = None,
+    token_budget: Optional[int] = None,
+) -> str:
+    """
+    Контекст в формате 1.1.1, уложенный в token_budget токенов (count_tokens).
+    Ранжирование: сущности — по совпадению слов вопроса в имени (×2) и описании; связи — по рангу
+    сущностей на концах и словам в описании; при равенстве — исходный порядок выборки.
+    Сначала в бюджет попадают факты с описанием, обрезанным до DESC_MIN_TOKENS, затем описания
+    дополняются по рангу. Без token_budget — как _format_context().
+    """
+    if not token_budget:
+        return _format_context(entities, relationships)
+    keywords = sorted(set(keywords or []))
+    entity_score = {}
+    for e in entities:
+        score = 2 * _keyword_score(e["name"], keywords) + _keyword_score(e["description"], keywords)
+        entity_score[e["name"]] = max(score, entity_score.get(e["name"], 0))
+    # (score, вид: 0 — сущность, 1 — связь, исходный индекс, строка без описания, описание)
+    items = []
+    for i, e in enumerate(entities):
+        items.append((entity_score[e["name"]], 0, i, e, e["description"].strip()))
+    for i, r in enumerate(relationships):
+        score = (
+            entity_score.get(r["from_name"], 0)
+            + entity_score.get(r["to_name"], 0)
+            + _keyword_score(r["description"], keywords)
+        )
+        items.append((score, 1, i, r, r["description"].strip()))
+    items.sort(key=lambda it: (-it[0], it[1], it[2]))
+
+    def line(it, desc: str) -> str:
+        return _entity_line(it[3], desc) if it[1] == 0 else _relationship_line(it[3], desc)
+
+    used = count_tokens(_format_context([], []))
+    chosen: dict[tuple[int, int], str] = {}
+    for it in items:
+        desc = _trim_to_tokens(it[4], DESC_MIN_TOKENS)
+        cost = count_tokens(line(it, desc)) + 1
+        if used + cost <= token_budget:
+            chosen[(it[1], it[2])] = desc
+            used += cost
+    for it in items:
+        key = (it[1], it[2])
+        if key not in chosen or chosen[key] == it[4]:
+            continue
+        short_cost = count_tokens(line(it, chosen[key]))
+        full_cost = count_tokens(line(it, it[4]))
+        if used + full_cost - short_cost <= token_budget:
+            desc = it[4]
+        else:
+            desc = _trim_to_tokens(it[4], count_tokens(chosen[key]) + token_budget - used)
+            if count_tokens(line(it, desc)) > short_cost + token_budget - used:
+                continue
+        used += count_tokens(line(it, desc)) - short_cost
+        chosen[key] = desc
+
+    lines = ["=== Сущности ==="]
+    lines += [line(it, chosen[(0, it[2])]) for it in items if it[1] == 0 and (0, it[2]) in chosen]
+    lines.append("")
+    lines.append("=== Связи ===")
+    lines += [line(it, chosen[(1, it[2])]) for it in items if it[1] == 1 and (1, it[2]) in chosen]
+    return "\n".join(lines)
+
+
+def build_context_by_question(question: str, token_budget: Optional[int] = None, **sparql_kw) -> str:
     """
     1.2.4 Интеграция и fallback (вариант A): контекст по словам вопроса.
-    1.2.1 (слова) → 1.2.2 и 1.2.3 (запросы) → сборка в формате 1.1.1.
+    1.2.1 (слова) → 1.2.2 и 1.2.3 (запросы) → сборка в формате 1.1.1
+    (с token_budget — ранжирование и обрезка, pack_context).
     Если 0 сущностей и 0 связей — возвращает результат build_context_fixed().
     """
     keywords = extract_keywords(question)
@@ -344,8 +532,122 @@ def build_context_by_question(question: str, **sparql_kw) -> str:
         entities, keywords, limit=RELATIONSHIP_LIMIT, **sparql_kw
     )
     if not entities and not relationships:
-        return build_context_fixed(**sparql_kw)
-    return _format_context(entities, relationships)
+        return build_context_fixed(token_budget=token_budget, **sparql_kw)
+    return pack_context(entities, relationships, keywords, token_budget)
+
+
+def _sparql_union(
+    subqueries: dict[int, str],
+    sort_vars: tuple[str, ...],
+    name: str,
+    groups_per_query: int = BATCH_GROUPS_PER_QUERY,
+    **sparql_kw,
+) -> dict[int, list]:
+    """
+    Выполнить подзапросы {g: подзапрос} пачками по groups_per_query через BATCH_QUERY.
+    Возвращает {g: bindings} в порядке ORDER BY подзапроса (sort_vars) — UNION порядок не гарантирует.
+    """
+    out: dict[int, list] = {g: [] for g in subqueries}
+    items = list(subqueries.items())
+    for i in range(0, len(items), groups_per_query):
+        chunk = items[i : i + groups_per_query]
+        q = BATCH_QUERY % {"union": "\n  UNION\n".join(sub for _, sub in chunk)}
+        j = sparql(q, name=name, **sparql_kw)
+        for b in j["results"]["bindings"]:
+            out[int(b["g"]["value"])].append(b)
+    for bindings in out.values():
+        bindings.sort(key=lambda b: tuple(b[v]["value"] for v in sort_vars))
+    return out
+
+
+def build_contexts_by_questions(
+    questions: list[str],
+    groups_per_query: int = BATCH_GROUPS_PER_QUERY,
+    token_budget: Optional[int] = None,
+    **sparql_kw,
+) -> list[str]:
+    """
+    Контексты build_context_by_question() для списка вопросов за несколько SPARQL-запросов.
+    Вопросы с одинаковым набором ключевых слов получают один контекст; запросы 1.2.2 и 1.2.3
+    всех наборов объединяются (BATCH_QUERY, по groups_per_query наборов). Fallback
+    build_context_fixed() выполняется не более одного раза; token_budget — см. pack_context.
+    Возвращает контексты в порядке questions.
+    """
+    keys = [tuple(sorted(set(extract_keywords(q)))) for q in questions]
+    groups = list(dict.fromkeys(keys))
+    kw_by_g = {g: list(k) for g, k in enumerate(groups) if k}
+
+    # 1.2.2 сущности по ключевым словам
+    entity_bindings = _sparql_union(
+        {
+            g: ENTITIES_SUBQUERY % {"g": g, "filter": _entity_keywords_filter(kw), "limit": 20}
+            for g, kw in kw_by_g.items()
+        },
+        ("s",),
+        "entities_by_keywords_batch",
+        groups_per_query,
+        **sparql_kw,
+    )
+    entities = {g: _parse_entity_bindings(b) for g, b in entity_bindings.items()}
+
+    # 1.2.3 связи по сущностям, затем (если не набран лимит) по словам в описании
+    rel_bindings = _sparql_union(
+        {
+            g: RELATIONSHIPS_SUBQUERY
+            % {"g": g, "filter": _entity_names_filter([e["name"] for e in ents]), "limit": RELATIONSHIP_LIMIT}
+            for g, ents in entities.items()
+            if ents
+        },
+        ("from", "to"),
+        "relationships_by_entities_batch",
+        groups_per_query,
+        **sparql_kw,
+    )
+    relationships: dict[int, list[dict]] = {}
+    for g, b in rel_bindings.items():
+        seen: set[tuple[str, str]] = set()
+        rels = []
+        for r in _parse_relationship_bindings(b):
+            key = (r["from_name"], r["to_name"])
+            if key not in seen:
+                seen.add(key)
+                rels.append(r)
+        relationships[g] = rels[:RELATIONSHIP_LIMIT]
+    desc_bindings = _sparql_union(
+        {
+            g: RELATIONSHIPS_SUBQUERY
+            % {"g": g, "filter": _description_keywords_filter(kw), "limit": RELATIONSHIP_LIMIT}
+            for g, kw in kw_by_g.items()
+            if len(relationships.get(g, [])) < RELATIONSHIP_LIMIT
+        },
+        ("from", "to"),
+        "relationships_by_description_batch",
+        groups_per_query,
+        **sparql_kw,
+    )
+    for g, b in desc_bindings.items():
+        rels = relationships.setdefault(g, [])
+        seen = {(r["from_name"], r["to_name"]) for r in rels}
+        for r in _parse_relationship_bindings(b):
+            if len(rels) >= RELATIONSHIP_LIMIT:
+                break
+            key = (r["from_name"], r["to_name"])
+            if key not in seen:
+                seen.add(key)
+                rels.append(r)
+
+    fixed: Optional[str] = None
+    contexts: dict[tuple, str] = {}
+    for g, key in enumerate(groups):
+        ents = entities.get(g, [])
+        rels = relationships.get(g, [])
+        if not ents and not rels:
+            if fixed is None:
+                fixed = build_context_fixed(token_budget=token_budget, **sparql_kw)
+            contexts[key] = fixed
+        else:
+            contexts[key] = pack_context(ents, rels, list(key), token_budget)
+    return [contexts[k] for k in keys]
 
 
 def main() -> None:
@@ -4,6 +4,15 @@ export interface ApproveResponse {
   message: string
 }
 
+export interface RejectResponse {
+  message: string
+}
+
 export function approveCycle(ragId: number, cycleId: number): Promise<ApproveResponse> {
   return apiClient.post<ApproveResponse>(`/rags/${ragId}/cycles/${cycleId}/approve`).then((r) => r.data)
 }
+
+// Отклонить цикл: staging удаляется, prod не меняется, ожидающие загрузки запускаются
+export function rejectCycle(ragId: number, cycleId: number): Promise<RejectResponse> {
+  return apiClient.post<RejectResponse>(`/rags/${ragId}/cycles/${cycleId}/reject`).then((r) => r.data)
+}
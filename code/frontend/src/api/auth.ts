@@ -1,4 +1,4 @@
-import { apiClient, setStoredToken } from './client'
+import { apiClient, getStoredRefreshToken, setStoredToken } from './client'
 
 export interface User {
   id: number
@@ -9,6 +9,7 @@ export interface User {
 export interface TokenResponse {
   access_token: string
   token_type: string
+  refresh_token: string | null
 }
 
 export function register(data: { email: string; password: string; display_name?: string }): Promise<User> {
@@ -17,7 +18,7 @@ export function register(data: { email: string; password: string; display_name?:
 
 export function login(data: { email: string; password: string }): Promise<TokenResponse> {
   return apiClient.post<TokenResponse>('/auth/login', data).then((r) => {
-    setStoredToken(r.data.access_token)
+    setStoredToken(r.data.access_token, r.data.refresh_token)
     return r.data
   })
 }
@@ -25,3 +26,13 @@ export function login(data: { email: string; password: string }): Promise<TokenR
 export function me(): Promise<User> {
   return apiClient.get<User>('/auth/me').then((r) => r.data)
 }
+
+/** Выход: отозвать refresh-токен на сервере (ошибка не мешает выйти локально). */
+export function logout(): Promise<void> {
+  const refreshToken = getStoredRefreshToken()
+  if (!refreshToken) return Promise.resolve()
+  return apiClient
+    .post('/auth/logout', { refresh_token: refreshToken })
+    .then(() => undefined)
+    .catch(() => undefined)
+}
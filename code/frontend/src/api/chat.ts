@@ -3,6 +3,7 @@ import { apiClient } from './client'
 export interface ChatResponse {
   answer: string
   context_used: number
+  context_tokens: number
 }
 
 export function sendQuestion(ragId: number, question: string): Promise<ChatResponse> {
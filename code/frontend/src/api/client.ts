@@ -4,14 +4,22 @@
 import axios from 'axios'
 
 const TOKEN_KEY = 'ferag_token'
+const REFRESH_TOKEN_KEY = 'ferag_refresh_token'
 
 export function getStoredToken(): string | null {
   return localStorage.getItem(TOKEN_KEY)
 }
 
-export function setStoredToken(token: string | null): void {
+export function getStoredRefreshToken(): string | null {
+  return localStorage.getItem(REFRESH_TOKEN_KEY)
+}
+
+/** Сохранить access (и refresh, если передан); null — выход: удаляются оба. */
+export function setStoredToken(token: string | null, refreshToken?: string | null): void {
   if (token) localStorage.setItem(TOKEN_KEY, token)
   else localStorage.removeItem(TOKEN_KEY)
+  if (!token || refreshToken === null) localStorage.removeItem(REFRESH_TOKEN_KEY)
+  else if (refreshToken) localStorage.setItem(REFRESH_TOKEN_KEY, refreshToken)
 }
 
 export const apiClient = axios.create({
@@ -25,12 +33,55 @@ apiClient.interceptors.request.use((config) => {
   return config
 })
 
+// Один запрос /auth/refresh на все одновременно получившие 401
+let refreshing: Promise<string | null> | null = null
+
+function refreshAccessToken(): Promise<string | null> {
+  const refreshToken = getStoredRefreshToken()
+  if (!refreshToken) return Promise.resolve(null)
+  if (!refreshing) {
+    refreshing = axios
+      .post('/ferag/api/auth/refresh', { refresh_token: refreshToken })
+      .then((r) => {
+        setStoredToken(r.data.access_token, r.data.refresh_token)
+        return r.data.access_token as string
+      })
+      .catch(() => null)
+      .finally(() => {
+        refreshing = null
+      })
+  }
+  return refreshing
+}
+
 apiClient.interceptors.response.use(
   (r) => r,
-  (err) => {
+  async (err) => {
+    const config = err.config
     if (err.response?.status === 401) {
+      // Истёк access: обменять refresh-токен и повторить запрос один раз (без повторного входа)
+      if (config && !config._retried && !String(config.url).startsWith('/auth/')) {
+        config._retried = true
+        const token = await refreshAccessToken()
+        if (token) {
+          config.headers.Authorization = `Bearer ${token}`
+          return apiClient(config)
+        }
+      }
       setStoredToken(null)
     }
     return Promise.reject(err)
   }
 )
+
+/** Все страницы списка с keyset-пагинацией: следующая — по заголовку X-Next-Cursor. */
+export async function getAllPages<T>(url: string): Promise<T[]> {
+  const items: T[] = []
+  let cursor: string | undefined
+  do {
+    const r = await apiClient.get<T[]>(url, { params: cursor ? { cursor } : undefined })
+    items.push(...r.data)
+    cursor = r.headers['x-next-cursor'] || undefined
+  } while (cursor)
+  return items
+}
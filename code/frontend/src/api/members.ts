@@ -1,4 +1,4 @@
-import { apiClient } from './client'
+import { apiClient, getAllPages } from './client'
 
 export interface MemberListItem {
   user_id: number
@@ -14,7 +14,7 @@ export interface MemberResponse {
 }
 
 export function listMembers(ragId: number): Promise<MemberListItem[]> {
-  return apiClient.get<MemberListItem[]>(`/rags/${ragId}/members`).then((r) => r.data)
+  return getAllPages<MemberListItem>(`/rags/${ragId}/members`)
 }
 
 export function addMember(
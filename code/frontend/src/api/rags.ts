@@ -1,4 +1,4 @@
-import { apiClient } from './client'
+import { apiClient, getAllPages } from './client'
 
 export interface Rag {
   id: number
@@ -11,7 +11,7 @@ export interface Rag {
 }
 
 export function listRags(): Promise<Rag[]> {
-  return apiClient.get<Rag[]>('/rags').then((r) => r.data)
+  return getAllPages<Rag>('/rags')
 }
 
 export function createRag(data: { name: string; description?: string }): Promise<Rag> {
@@ -6,6 +6,8 @@ export interface Task {
   cycle_id: number | null
   type: string
   status: string
+  // Текущий шаг цепочки (из проекции задачи в Redis)
+  step?: string | null
   error: string | null
   created_at: string
   updated_at: string
@@ -3,10 +3,20 @@ import { apiClient } from './client'
 export interface UploadResponse {
   cycle_id: number
   task_id: number
+  // true — RAG занят другим циклом, файл добавлен в ожидающий цикл
+  queued: boolean
+  documents: number
+}
+
+export interface BulkUploadResponse extends UploadResponse {
+  // Документов добавлено запросом; пропущено элементов архивов
+  added: number
+  skipped: number
 }
 
 export interface UploadStatusResponse {
   cycle_in_review: { cycle_id: number; task_id: number } | null
+  cycle_queued: { cycle_id: number; task_id: number; documents: number } | null
 }
 
 export function getUploadStatus(ragId: number): Promise<UploadStatusResponse> {
@@ -22,3 +32,14 @@ export function uploadFile(ragId: number, file: File): Promise<UploadResponse> {
     })
     .then((r) => r.data)
 }
+
+// Несколько файлов и/или архивов (zip, tar) — одним циклом
+export function uploadBulk(ragId: number, files: File[]): Promise<BulkUploadResponse> {
+  const form = new FormData()
+  for (const file of files) form.append('files', file)
+  return apiClient
+    .post<BulkUploadResponse>(`/rags/${ragId}/upload/bulk`, form, {
+      headers: { 'Content-Type': 'multipart/form-data' },
+    })
+    .then((r) => r.data)
+}
@@ -29,6 +29,7 @@ export const useAuthStore = defineStore('auth', () => {
   }
 
   function logout(): void {
+    void authApi.logout()
     token.value = null
     user.value = null
     setStoredToken(null)
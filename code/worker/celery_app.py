@@ -1,24 +1,63 @@
-"""Celery app для ferag worker (GraphRAG pipeline, staging)."""
+"""
+Celery app для ferag worker (GraphRAG pipeline, staging).
+
+Очереди (отдельный worker на очередь — своя concurrency, см. deploy/nb-win/docker-compose.yml):
+  indexing — graphrag index (часы, CPU + LLM);
+  llm      — schema induction (один долгий запрос к LLM);
+  io       — merge, загрузка в Fuseki, запуск циклов, служебные задачи (секунды–минуты).
+Короткие шаги одних RAG не ждут за индексацией других.
+"""
 from celery import Celery
+from kombu import Queue
 
 from worker.config import get_settings
 
 settings = get_settings()
 
+QUEUE_INDEXING = "indexing"
+QUEUE_LLM = "llm"
+QUEUE_IO = "io"
+
+# Имя задачи → очередь (дублируется в backend app.celery_sender.TASK_QUEUES)
+TASK_QUEUES = {
+    "worker.tasks.graphrag_task.run_graphrag": QUEUE_INDEXING,
+    "worker.tasks.schema_task.run_schema_induction": QUEUE_LLM,
+    "worker.tasks.merge_task.do_merge": QUEUE_IO,
+    "worker.tasks.staging_task.load_to_staging": QUEUE_IO,
+    "worker.tasks.base.on_chain_failure": QUEUE_IO,
+    "worker.tasks.scheduler_task.schedule_cycles": QUEUE_IO,
+    "worker.tasks.workdir_task.archive_cycle": QUEUE_IO,
+    "worker.tasks.workdir_task.cleanup_work_dir": QUEUE_IO,
+}
+
 celery = Celery(
     "ferag_worker",
     broker=settings.celery_broker_url,
     backend=settings.celery_result_backend,
     include=[
+        "worker.instrumentation",
+        "worker.preload",
         "worker.tasks",
         "worker.tasks.graphrag_task",
         "worker.tasks.schema_task",
         "worker.tasks.merge_task",
         "worker.tasks.staging_task",
+        "worker.tasks.scheduler_task",
+        "worker.tasks.workdir_task",
     ],
 )
 
 celery.conf.update(
     task_serializer="json",
     result_serializer="json",
+    task_queues=[Queue(QUEUE_INDEXING), Queue(QUEUE_LLM), Queue(QUEUE_IO)],
+    task_default_queue=QUEUE_IO,
+    task_routes={name: {"queue": queue} for name, queue in TASK_QUEUES.items()},
+    # Задача подтверждается после выполнения, worker берёт по одной: долгий шаг не держит
+    # в своём prefetch-буфере задачи, которые мог бы выполнить свободный worker
+    task_acks_late=True,
+    worker_prefetch_multiplier=1,
+    # Redis переотдаёт неподтверждённую задачу через visibility_timeout — он должен быть
+    # больше самого долгого шага, иначе индексация запустится второй раз параллельно
+    broker_transport_options={"visibility_timeout": settings.celery_visibility_timeout},
 )
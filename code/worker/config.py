@@ -1,6 +1,7 @@
 """Настройки worker из переменных окружения (.env). Аналогично backend: BaseSettings, загрузка из .env."""
 from functools import lru_cache
 from pathlib import Path
+from typing import Literal
 
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
@@ -17,19 +18,42 @@ class Settings(BaseSettings):
     # Celery
     celery_broker_url: str
     celery_result_backend: str
-    # БД
+    # Больше time_limit самого долгого шага (acks_late: раньше Redis переотдаст задачу другому worker)
+    celery_visibility_timeout: int = 6 * 3600
+    # БД: один engine на процесс (worker.tasks.base); дочерний процесс prefork выполняет одну задачу
+    # за раз — пул маленький. Всего соединений ≈ сумма --concurrency worker'ов × (pool_size + max_overflow)
     database_url: str
+    db_pool_size: int = 2
+    db_max_overflow: int = 2
+    db_pool_recycle: int = 1800
+    db_statement_timeout_ms: int = 60000
     # Fuseki
     fuseki_url: str
     fuseki_user: str
     fuseki_password: str
+    # Раскладка staging: datasets (датасеты на цикл) | graphs (named graphs в prod-датасете RAG)
+    fuseki_layout: Literal["datasets", "graphs"] = "datasets"
     # LLM (LM Studio или OpenAI-совместимый)
     llm_api_url: str = "http://host.docker.internal:41234/v1"
     llm_model: str = "lmstudio-community/Meta-Llama-3.3-70B-Instruct-UDLQ4_K_M"
+    # Несколько LLM (балансировка и failover, см. graphrag-test/llm_router.py):
+    # "url;weight=2;max=4,url2;max=2"; пусто — только llm_api_url
+    llm_endpoints: str = ""
     # Базовый каталог рабочих файлов циклов
     work_dir: Path = Path("/tmp/ferag")
     # Каталог graphrag-test (шаблоны settings, prompts) — в Docker: /app/graphrag-test
     graphrag_test_dir: Path = Path("/app/graphrag-test")
+    # graphrag index: inprocess — graphrag.api.build_index в процессе worker (без старта интерпретатора и
+    # импорта graphrag на каждый цикл; нужен graphrag с Python API), subprocess — CLI `graphrag index`
+    graphrag_index_mode: Literal["inprocess", "subprocess"] = "inprocess"
+    # Импорт graphrag_lib / llm_router / graphrag.api в главном процессе worker до fork пула (по очередям -Q, worker.preload)
+    worker_preload: bool = True
+    # work_dir (worker.workdir): квота в байтах (0 — без квоты; LRU-вытеснение неактивных циклов и cas),
+    # уровень zstd артефактов в cas, сколько снимков prod хранить на RAG, брать prod_export из снимка в merge
+    workdir_quota_bytes: int = 50 * 1024 * 1024 * 1024
+    workdir_zstd_level: int = 10
+    workdir_keep_snapshots: int = 2
+    workdir_reuse_prod_snapshot: bool = True
 
 
 @lru_cache
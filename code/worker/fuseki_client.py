@@ -4,14 +4,16 @@ from pathlib import Path
 import httpx
 
 from worker.config import get_settings
+from worker.instrumentation import count_fuseki_request
 
 
 def _client() -> httpx.Client:
-    """Клиент с basic auth из настроек."""
+    """Клиент с basic auth из настроек; каждый запрос учитывается в замерах шага (task_steps)."""
     s = get_settings()
     return httpx.Client(
         auth=(s.fuseki_user, s.fuseki_password),
         timeout=30.0,
+        event_hooks={"request": [count_fuseki_request]},
     )
 
 
@@ -73,6 +75,11 @@ def rag_ontology_dataset(rag_id: int, cycle_n: int) -> str:
     return f"ferag-{rag_id:05d}-new-{cycle_n:05d}-ontology"
 
 
+def rag_cycle_graph(cycle_n: int, kind: str) -> str:
+    """Named graph цикла в prod-датасете (layout=graphs): urn:ferag:cycle:1:triples, ..."""
+    return f"urn:ferag:cycle:{cycle_n}:{kind}"
+
+
 def export_dataset_to_ttl(dataset_name: str, out_path: Path) -> None:
     """
     Экспорт датасета Fuseki в TTL через SPARQL CONSTRUCT.
@@ -117,3 +124,24 @@ def load_ttl_into_dataset(dataset_name: str, ttl_path: Path) -> None:
             timeout=300.0,
         )
         r.raise_for_status()
+
+
+def load_ttl_into_graph(dataset_name: str, graph_uri: str, ttl_path: Path) -> None:
+    """
+    Загрузить TTL-файл в named graph датасета (Graph Store Protocol: PUT /{dataset}/data?graph=...).
+    Граф заменяется целиком; default graph датасета не затрагивается.
+    """
+    s = get_settings()
+    base = s.fuseki_url.rstrip("/")
+    url = f"{base}/{dataset_name}/data"
+    ttl_path = Path(ttl_path)
+    content = ttl_path.read_text(encoding="utf-8")
+    with _client() as client:
+        r = client.put(
+            url,
+            params={"graph": graph_uri},
+            content=content,
+            headers={"Content-Type": "text/turtle; charset=utf-8"},
+            timeout=300.0,
+        )
+        r.raise_for_status()
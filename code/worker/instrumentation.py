@@ -0,0 +1,198 @@
+"""
+Замеры шагов цепочки: wall/CPU время, пиковый RSS, байты чтения/записи, запросы к Fuseki, токены LLM.
+Подключается к сигналам Celery (task_prerun/task_postrun) — задачи не оборачиваются вручную;
+результат шага пишется в таблицу task_steps и прибавляется к монотонным суммам в Redis hash
+task_steps:totals (counters backend /metrics: строки task_steps удаляются вместе с RAG, суммы — нет).
+"""
+import logging
+import resource
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Optional
+
+from celery.signals import task_postrun, task_prerun
+from sqlalchemy import text
+
+logger = logging.getLogger(__name__)
+
+# Имя Celery-задачи → шаг цепочки (как в publish_status)
+STEP_BY_TASK = {
+    "worker.tasks.graphrag_task.run_graphrag": "graphrag",
+    "worker.tasks.schema_task.run_schema_induction": "schema_induction",
+    "worker.tasks.merge_task.do_merge": "merge",
+    "worker.tasks.staging_task.load_to_staging": "staging",
+}
+
+# Redis hash: "<step>|<status>|<столбец>" → сумма (runs — число шагов); как app.metrics.STEP_TOTALS_KEY
+STEP_TOTALS_KEY = "task_steps:totals"
+# Суммируемые замеры шага (как app.metrics._STEP_SUMS)
+STEP_SUM_COLUMNS = ("wall_seconds", "cpu_seconds", "read_bytes", "write_bytes", "fuseki_requests", "llm_calls", "llm_tokens")
+
+_lock = threading.Lock()
+_fuseki_requests = 0
+_llm_calls = 0
+_llm_tokens = 0
+# Сколько раз токены были известны: шаг без новых отчётов пишет llm_tokens = NULL, а не 0
+_llm_token_reports = 0
+
+
+def count_fuseki_request(request=None) -> None:
+    """Event hook httpx-клиента Fuseki: +1 запрос."""
+    global _fuseki_requests
+    with _lock:
+        _fuseki_requests += 1
+
+
+def record_llm_usage(calls: int = 1, tokens: Optional[int] = None) -> None:
+    """Учесть вызовы LLM и (если известны) completion-токены (ответ модели) в текущем шаге."""
+    global _llm_calls, _llm_tokens, _llm_token_reports
+    with _lock:
+        _llm_calls += calls
+        if tokens is not None:
+            _llm_tokens += int(tokens)
+            _llm_token_reports += 1
+
+
+def _counters() -> tuple[int, int, int, int]:
+    with _lock:
+        return _fuseki_requests, _llm_calls, _llm_tokens, _llm_token_reports
+
+
+def _cpu_seconds() -> float:
+    """CPU процесса и завершённых дочерних (graphrag index — подпроцесс)."""
+    total = 0.0
+    for who in (resource.RUSAGE_SELF, resource.RUSAGE_CHILDREN):
+        usage = resource.getrusage(who)
+        total += usage.ru_utime + usage.ru_stime
+    return total
+
+
+def _proc_io() -> tuple[Optional[int], Optional[int]]:
+    """(read_bytes, write_bytes) из /proc/self/io — включая дождавшихся дочерних; (None, None) вне Linux."""
+    try:
+        with open("/proc/self/io", encoding="ascii") as f:
+            values = dict(line.split(":", 1) for line in f if ":" in line)
+        return int(values["read_bytes"]), int(values["write_bytes"])
+    except (OSError, KeyError, ValueError):
+        return None, None
+
+
+def _reset_peak_rss() -> bool:
+    """Сбросить VmHWM процесса (Linux ≥ 4.0, clear_refs=5). False — сброс недоступен."""
+    try:
+        with open("/proc/self/clear_refs", "w", encoding="ascii") as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+
+def _peak_rss_self() -> int:
+    """Пиковый RSS процесса в байтах: VmHWM, иначе ru_maxrss (KiB на Linux)."""
+    try:
+        with open("/proc/self/status", encoding="ascii") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError, IndexError):
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+@dataclass
+class StepProbe:
+    """Снимок счётчиков на старте шага; finish() возвращает приращения."""
+
+    started_at: float = field(default_factory=time.time)
+    wall_start: float = field(default_factory=time.monotonic)
+    cpu_start: float = field(default_factory=_cpu_seconds)
+    io_start: tuple = field(default_factory=_proc_io)
+    counters_start: tuple = field(default_factory=_counters)
+    children_rss_start: int = field(
+        default_factory=lambda: resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    )
+    rss_reset: bool = field(default_factory=_reset_peak_rss)
+
+    def finish(self) -> dict:
+        read_end, write_end = _proc_io()
+        read_start, write_start = self.io_start
+        fuseki, llm_calls, llm_tokens, token_reports = _counters()
+        fuseki0, llm_calls0, llm_tokens0, token_reports0 = self.counters_start
+        peak = _peak_rss_self()
+        children_rss = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+        if children_rss > self.children_rss_start:
+            # ru_maxrss детей — максимум по всем дочерним за жизнь процесса; вырос — значит, это наш шаг
+            peak = max(peak, children_rss * 1024)
+        return {
+            "wall_seconds": time.monotonic() - self.wall_start,
+            "cpu_seconds": _cpu_seconds() - self.cpu_start,
+            "peak_rss_bytes": peak,
+            "read_bytes": read_end - read_start if read_end is not None and read_start is not None else None,
+            "write_bytes": write_end - write_start if write_end is not None and write_start is not None else None,
+            "fuseki_requests": fuseki - fuseki0,
+            "llm_calls": llm_calls - llm_calls0,
+            "llm_tokens": llm_tokens - llm_tokens0 if token_reports > token_reports0 else None,
+        }
+
+
+def save_step_metrics(task_id: int, step: str, status: str, started_at: float, metrics: dict) -> None:
+    """Записать строку task_steps."""
+    from worker.tasks.base import get_db_session  # fuseki_client импортирует модуль раньше tasks
+
+    db = get_db_session()
+    try:
+        db.execute(
+            text(
+                "INSERT INTO task_steps (task_id, step, status, started_at, finished_at, wall_seconds, "
+                "cpu_seconds, peak_rss_bytes, read_bytes, write_bytes, fuseki_requests, llm_calls, llm_tokens) "
+                "VALUES (:task_id, :step, :status, to_timestamp(:started_at), now(), :wall_seconds, "
+                ":cpu_seconds, :peak_rss_bytes, :read_bytes, :write_bytes, :fuseki_requests, :llm_calls, :llm_tokens)"
+            ),
+            {"task_id": task_id, "step": step, "status": status, "started_at": started_at, **metrics},
+        )
+        db.commit()
+    finally:
+        db.close()
+
+
+def add_step_totals(step: str, status: str, metrics: dict) -> None:
+    """Прибавить замеры шага к монотонным суммам в Redis (неизвестные — NULL — пропускаются)."""
+    from worker.tasks.base import get_redis
+
+    pipe = get_redis().pipeline()
+    pipe.hincrbyfloat(STEP_TOTALS_KEY, f"{step}|{status}|runs", 1)
+    for column in STEP_SUM_COLUMNS:
+        if metrics.get(column) is not None:
+            pipe.hincrbyfloat(STEP_TOTALS_KEY, f"{step}|{status}|{column}", metrics[column])
+    pipe.execute()
+
+
+# Celery task id → (task_id ferag, шаг, снимок)
+_probes: dict[str, tuple[int, str, StepProbe]] = {}
+
+
+@task_prerun.connect
+def _on_task_prerun(task_id=None, task=None, args=None, **kwargs) -> None:
+    step = STEP_BY_TASK.get(getattr(task, "name", ""))
+    # args у всех шагов: (rag_id, cycle_id, task_id[, input_file])
+    if step is None or not args or len(args) < 3:
+        return
+    _probes[task_id] = (int(args[2]), step, StepProbe())
+
+
+@task_postrun.connect
+def _on_task_postrun(task_id=None, state=None, **kwargs) -> None:
+    entry = _probes.pop(task_id, None)
+    if entry is None:
+        return
+    ferag_task_id, step, probe = entry
+    status = "done" if state == "SUCCESS" else "failed"
+    try:
+        metrics = probe.finish()
+        save_step_metrics(ferag_task_id, step, status, probe.started_at, metrics)
+        add_step_totals(step, status, metrics)
+        logger.info("step %s of task %s: %s", step, ferag_task_id, metrics)
+    except Exception:
+        # Замеры не должны ронять цепочку
+        logger.exception("failed to record metrics for step %s of task %s", step, ferag_task_id)
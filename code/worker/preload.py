@@ -0,0 +1,63 @@
+"""
+Предзагрузка тяжёлых модулей worker: graphrag_test_dir на sys.path и импорт graphrag_lib (pandas, rdflib),
+llm_router, graphrag.api в главном процессе на worker_init — до fork пула, дочерние процессы получают модули
+готовыми, и первая задача не платит за импорт. Не на worker_process_init: дочерний процесс prefork, не
+ответивший за worker_proc_alive_timeout (4 с), Celery убивает, а холодный импорт graphrag.api бывает дольше.
+Что грузить — по очередям, которые слушает worker (-Q): worker io не импортирует pandas ради merge.
+"""
+import importlib
+import logging
+import sys
+import time
+
+from celery.signals import worker_init
+
+from worker.celery_app import QUEUE_INDEXING, QUEUE_IO, QUEUE_LLM
+from worker.config import get_settings
+
+logger = logging.getLogger(__name__)
+
+# Очередь → модули, которые импортируют её задачи
+PRELOAD_BY_QUEUE: dict[str, tuple[str, ...]] = {
+    QUEUE_INDEXING: ("graphrag.api", "graphrag_lib.pipeline", "llm_router"),
+    QUEUE_LLM: ("graphrag_lib.schema", "llm_router"),
+    QUEUE_IO: ("graphrag_lib.merge",),
+}
+
+
+def ensure_graphrag_test_path() -> None:
+    """graphrag_test_dir (graphrag_lib, llm_router, скрипты) на sys.path — один раз на процесс."""
+    path = str(get_settings().graphrag_test_dir)
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+
+def preload_modules(queues) -> list[str]:
+    """Импортировать модули задач очередей queues; недоступные пропускаются (ошибку покажет задача)."""
+    ensure_graphrag_test_path()
+    names = list(dict.fromkeys(name for queue in queues for name in PRELOAD_BY_QUEUE.get(queue, ())))
+    loaded = []
+    for name in names:
+        try:
+            importlib.import_module(name)
+        except Exception:
+            logger.warning("preload of %s failed", name, exc_info=True)
+            continue
+        loaded.append(name)
+    return loaded
+
+
+@worker_init.connect
+def _preload_before_fork(sender=None, **kwargs) -> None:
+    if not get_settings().worker_preload or sender is None:
+        return
+    started = time.perf_counter()
+    # Очереди, выбранные -Q (без -Q — все объявленные); к worker_init они уже разобраны
+    queues = list(sender.app.amqp.queues.consume_from)
+    loaded = preload_modules(queues)
+    logger.info(
+        "preloaded %s for queues %s in %.1fs",
+        ", ".join(loaded) or "nothing",
+        ",".join(queues),
+        time.perf_counter() - started,
+    )
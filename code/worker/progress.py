@@ -0,0 +1,97 @@
+"""
+Прогресс цикла для журнала событий задачи: доли шагов в общем проценте и разбор вывода `graphrag index`.
+"""
+import re
+import time
+from typing import Callable, Optional
+
+# Доли шагов цепочки в общем проценте цикла (по замерам: graphrag index ~3 ч, schema induction 15–30 мин)
+STEP_PROGRESS_RANGES: dict[str, tuple[float, float]] = {
+    "graphrag": (0.0, 80.0),
+    "schema_induction": (80.0, 93.0),
+    "merge": (93.0, 97.0),
+    "staging": (97.0, 100.0),
+}
+
+# Строки ConsoleWorkflowCallbacks graphrag (CLI `graphrag index`)
+_PIPELINE_START_RE = re.compile(r"^Starting pipeline with workflows:\s*(.+)$")
+_WORKFLOW_START_RE = re.compile(r"^Starting workflow:\s*(\S+)")
+_WORKFLOW_END_RE = re.compile(r"^Workflow complete:\s*(\S+)")
+_ITEMS_RE = re.compile(r"^\s*(\d+)\s*/\s*(\d+)\s*\.*\s*$")
+
+
+def step_percent(step: str, fraction: float) -> Optional[float]:
+    """Общий процент цикла для доли fraction (0..1) шага step; None для неизвестного шага."""
+    bounds = STEP_PROGRESS_RANGES.get(step)
+    if bounds is None:
+        return None
+    lo, hi = bounds
+    fraction = min(max(fraction, 0.0), 1.0)
+    return lo + (hi - lo) * fraction
+
+
+class GraphragProgress:
+    """
+    Прогресс pipeline graphrag: workflow из списка pipeline_start, элементы внутри workflow
+    (чанки, LLM-вызовы extract_graph/summarize/community reports). emit(fraction, data) вызывается
+    на старте/завершении workflow и не чаще min_interval_sec для счётчиков элементов.
+    """
+
+    def __init__(
+        self,
+        emit: Callable[[float, dict], None],
+        min_interval_sec: float = 5.0,
+    ) -> None:
+        self._emit = emit
+        self._min_interval = min_interval_sec
+        self._workflows: list[str] = []
+        self._current: Optional[str] = None
+        self._completed = 0
+        self._last_items_emit = 0.0
+
+    def _fraction(self, within: float = 0.0) -> float:
+        total = len(self._workflows) or 1
+        return min((self._completed + within) / total, 1.0)
+
+    def pipeline_start(self, names: list[str]) -> None:
+        self._workflows = list(names)
+        self._emit(0.0, {"workflows": len(self._workflows)})
+
+    def workflow_start(self, name: str) -> None:
+        self._current = name
+        self._emit(self._fraction(), {"workflow": name, "event": "start"})
+
+    def workflow_end(self, name: str) -> None:
+        self._completed += 1
+        self._current = None
+        self._emit(self._fraction(), {"workflow": name, "event": "end"})
+
+    def items(self, done: int, total: int) -> None:
+        now = time.monotonic()
+        if done < total and now - self._last_items_emit < self._min_interval:
+            return
+        self._last_items_emit = now
+        within = done / total if total else 0.0
+        self._emit(
+            self._fraction(within),
+            {"workflow": self._current, "items_done": done, "items_total": total},
+        )
+
+    def feed_line(self, line: str) -> None:
+        """Разобрать одну строку stdout `graphrag index` (строки прогресса заканчиваются \\r)."""
+        line = line.rstrip("\r\n")
+        m = _PIPELINE_START_RE.match(line)
+        if m:
+            self.pipeline_start([n.strip() for n in m.group(1).split(",") if n.strip()])
+            return
+        m = _WORKFLOW_START_RE.match(line)
+        if m:
+            self.workflow_start(m.group(1))
+            return
+        m = _WORKFLOW_END_RE.match(line)
+        if m:
+            self.workflow_end(m.group(1))
+            return
+        m = _ITEMS_RE.match(line)
+        if m and self._current is not None:
+            self.items(int(m.group(1)), int(m.group(2)))
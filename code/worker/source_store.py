@@ -0,0 +1,39 @@
+"""Чтение исходников циклов из source_blobs (zstd, content-addressed): потоково, по одному bytea-чанку."""
+from pathlib import Path
+
+import zstandard
+from sqlalchemy import text
+
+from worker.tasks.base import get_db_session
+
+
+def stream_source_blob(sha256: str, dest: Path) -> int:
+    """
+    Распаковать блоб sha256 в файл dest. Чанки читаются серверным курсором и распаковываются по одному,
+    в памяти нет ни всего сжатого, ни всего исходного текста. Возвращает число записанных байт.
+    Бросает FileNotFoundError, если блоба нет.
+    """
+    dest = Path(dest)
+    dest.parent.mkdir(parents=True, exist_ok=True)
+    decompressor = zstandard.ZstdDecompressor().decompressobj()
+    written = 0
+    found = False
+    db = get_db_session()
+    try:
+        result = db.execute(
+            text("SELECT data FROM source_blob_chunks WHERE sha256 = :sha ORDER BY seq"),
+            {"sha": sha256},
+            execution_options={"stream_results": True},
+        ).yield_per(4)
+        with dest.open("wb") as out:
+            for (data,) in result:
+                found = True
+                out_chunk = decompressor.decompress(bytes(data))
+                out.write(out_chunk)
+                written += len(out_chunk)
+    finally:
+        db.close()
+    if not found:
+        dest.unlink(missing_ok=True)
+        raise FileNotFoundError(f"source blob {sha256} not found")
+    return written
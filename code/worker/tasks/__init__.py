@@ -1,4 +1,4 @@
-# Celery tasks: graphrag, schema_induction, merge, staging, chain
+# Celery tasks: graphrag, schema_induction, merge, staging, chain, запуск циклов
 from celery import chain
 
 from worker.tasks.base import on_chain_failure
@@ -10,7 +10,8 @@ from worker.tasks.staging_task import load_to_staging
 
 def start_update_chain(rag_id: int, cycle_id: int, task_id: int, input_file: str):
     """
-    Запуск цепочки: run_graphrag → run_schema_induction → do_merge → load_to_staging.
+    Запуск цепочки: run_graphrag → run_schema_induction → do_merge → load_to_staging
+    (вызывает scheduler_task.start_next_cycle; input_file — каталог input/ цикла).
     Возвращает AsyncResult. При падении любого шага вызывается on_chain_failure (Task.status='failed', publish).
     """
     return chain(
@@ -1,19 +1,95 @@
 """Вспомогательные функции для задач: БД, Redis pub/sub, обновление Task."""
 import json
+import logging
 from typing import Any, Optional, Tuple
 
 import redis
+from celery.signals import worker_process_init
 from sqlalchemy import create_engine, text
 from sqlalchemy.orm import Session, sessionmaker
 
 from worker.celery_app import celery
 from worker.config import get_settings
+from worker.progress import step_percent
+
+logger = logging.getLogger(__name__)
 
 _settings = get_settings()
-_engine = create_engine(_settings.database_url)
+_engine = create_engine(
+    _settings.database_url,
+    pool_size=_settings.db_pool_size,
+    max_overflow=_settings.db_max_overflow,
+    pool_recycle=_settings.db_pool_recycle,
+    pool_pre_ping=True,
+    connect_args=(
+        {"options": f"-c statement_timeout={_settings.db_statement_timeout_ms}"}
+        if _settings.db_statement_timeout_ms > 0
+        else {}
+    ),
+)
 _SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=_engine)
 
 
+@worker_process_init.connect
+def _reset_engine_after_fork(**kwargs) -> None:
+    """Prefork: соединения, открытые родителем до fork, дочернему процессу не принадлежат — свой пул."""
+    _engine.dispose(close=False)
+
+
+# Последний статус задачи в Redis живёт неделю (дольше любого цикла)
+TASK_STATE_TTL_SEC = 7 * 24 * 3600
+
+
+# Журнал событий задачи (Redis Stream): приблизительный лимит записей
+TASK_EVENTS_MAXLEN = 10000
+
+
+def task_state_key(task_id: int) -> str:
+    """Ключ hash с последним статусом задачи (status, step, error) и проекцией строки tasks."""
+    return f"task:{task_id}:state"
+
+
+def task_state_fields(row) -> dict[str, str]:
+    """
+    Строка tasks (rag_id, cycle_id, type, status, error, created_at, updated_at) → поля проекции
+    в task:{id}:state, по которой backend отвечает на GET /tasks/{id} (app.task_events.task_state_fields).
+    """
+    rag_id, cycle_id, task_type, status, error, created_at, updated_at = row
+    return {
+        "rag_id": str(rag_id),
+        "cycle_id": "" if cycle_id is None else str(cycle_id),
+        "type": task_type,
+        "task_status": status,
+        "task_error": error or "",
+        "created_at": created_at.isoformat(),
+        "updated_at": updated_at.isoformat(),
+    }
+
+
+# Столбцы для task_state_fields (RETURNING в UPDATE tasks)
+TASK_STATE_COLUMNS = "rag_id, cycle_id, type, status, error, created_at, updated_at"
+
+
+def store_task_state(task_id: int, row) -> None:
+    """
+    Записать проекцию задачи в Redis после commit в БД. Ошибка Redis не валит задачу (источник истины —
+    PostgreSQL): проекция отстанет до следующего update_task или истечения TTL.
+    """
+    key = task_state_key(task_id)
+    try:
+        pipe = get_redis().pipeline()
+        pipe.hset(key, mapping=task_state_fields(row))
+        pipe.expire(key, TASK_STATE_TTL_SEC)
+        pipe.execute()
+    except Exception:
+        logger.warning("task state write failed for task %s", task_id, exc_info=True)
+
+
+def task_events_key(task_id: int) -> str:
+    """Ключ Redis Stream с журналом событий задачи (статусы и прогресс)."""
+    return f"task:{task_id}:events"
+
+
 def get_redis() -> redis.Redis:
     """Клиент Redis по CELERY_BROKER_URL (для pub/sub статусов)."""
     return redis.Redis.from_url(_settings.celery_broker_url, decode_responses=True)
@@ -31,10 +107,52 @@ def publish_status(
     step: str,
     error: Optional[str] = None,
 ) -> None:
-    """Опубликовать статус в Redis channel task:{task_id} для WebSocket."""
+    """
+    Опубликовать статус в Redis channel task:{task_id} для WebSocket и сохранить его как последний
+    известный в hash task:{task_id}:state (WebSocket, подключившийся позже, получает его сразу).
+    """
     channel = f"task:{task_id}"
     payload = {"status": status, "step": step, "error": error}
-    r.publish(channel, json.dumps(payload))
+    state_key = task_state_key(task_id)
+    pipe = r.pipeline()
+    pipe.hset(state_key, mapping={"status": status, "step": step, "error": error or ""})
+    pipe.expire(state_key, TASK_STATE_TTL_SEC)
+    pipe.publish(channel, json.dumps(payload))
+    if status == "running":
+        percent = step_percent(step, 0.0)
+    elif status == "done":
+        percent = step_percent(step, 1.0)
+    else:
+        percent = None
+    _add_event(pipe, task_id, "status", step, percent, {"status": status, "error": error})
+    pipe.execute()
+
+
+def publish_progress(
+    r: redis.Redis,
+    task_id: int,
+    step: str,
+    fraction: Optional[float] = None,
+    **data: Any,
+) -> None:
+    """
+    Записать событие прогресса шага в журнал task:{task_id}:events (без pub/sub — WebSocket не засоряется).
+    fraction — доля выполнения шага 0..1 (переводится в общий процент цикла), data — детали:
+    workflow, items_done/items_total, llm_calls, tokens, bytes и т.п.
+    """
+    percent = step_percent(step, fraction) if fraction is not None else None
+    pipe = r.pipeline()
+    _add_event(pipe, task_id, "progress", step, percent, data)
+    pipe.execute()
+
+
+def _add_event(pipe, task_id: int, kind: str, step: str, percent: Optional[float], data: dict) -> None:
+    key = task_events_key(task_id)
+    fields = {"kind": kind, "step": step, "data": json.dumps(data, ensure_ascii=False)}
+    if percent is not None:
+        fields["percent"] = f"{percent:.2f}"
+    pipe.xadd(key, fields, maxlen=TASK_EVENTS_MAXLEN, approximate=True)
+    pipe.expire(key, TASK_STATE_TTL_SEC)
 
 
 def update_task(
@@ -43,14 +161,17 @@ def update_task(
     status: str,
     error: Optional[str] = None,
 ) -> None:
-    """Обновить запись Task в БД."""
-    db.execute(
+    """Обновить запись Task в БД и её проекцию в Redis (GET /tasks/{id} читает проекцию)."""
+    row = db.execute(
         text(
-            "UPDATE tasks SET status = :status, error = :error, updated_at = now() WHERE id = :id"
+            "UPDATE tasks SET status = :status, error = :error, updated_at = now() WHERE id = :id "
+            f"RETURNING {TASK_STATE_COLUMNS}"
         ),
         {"status": status, "error": error, "id": task_id},
-    )
+    ).fetchone()
     db.commit()
+    if row is not None:
+        store_task_state(task_id, row)
 
 
 def update_upload_cycle_status(db: Session, cycle_id: int, status: str) -> None:
@@ -75,15 +196,35 @@ def get_cycle_n(db: Session, cycle_id: int) -> int:
     return int(row[0])
 
 
-def get_cycle_source_content(cycle_id: int) -> Optional[str]:
-    """Прочитать source_content из upload_cycles по id. Для кросс-машинного деплоя (файл не на диске worker)."""
+def cycle_document_name(seq: int) -> str:
+    """Имя файла документа в input/ цикла (как app.scheduler.cycle_document_name в backend)."""
+    return f"doc_{seq:04d}.txt"
+
+
+def get_cycle_documents(cycle_id: int) -> list[Tuple[int, str, int]]:
+    """Документы цикла [(seq, source_sha256, source_size)] по порядку; пусто — цикл до cycle_documents."""
+    db = get_db_session()
+    try:
+        rows = db.execute(
+            text("SELECT seq, source_sha256, source_size FROM cycle_documents WHERE cycle_id = :id ORDER BY seq"),
+            {"id": cycle_id},
+        ).fetchall()
+        return [(int(seq), sha, int(size)) for seq, sha, size in rows]
+    finally:
+        db.close()
+
+
+def get_cycle_source_meta(cycle_id: int) -> Tuple[Optional[str], Optional[int]]:
+    """(source_sha256, source_size) цикла, посчитанные backend при потоковой загрузке; (None, None) для старых записей."""
     db = get_db_session()
     try:
         row = db.execute(
-            text("SELECT source_content FROM upload_cycles WHERE id = :id"),
+            text("SELECT source_sha256, source_size FROM upload_cycles WHERE id = :id"),
             {"id": cycle_id},
         ).fetchone()
-        return row[0] if row and row[0] is not None else None
+        if not row:
+            return None, None
+        return row[0], (int(row[1]) if row[1] is not None else None)
     finally:
         db.close()
 
@@ -95,18 +236,24 @@ def on_chain_failure(
     traceback: Any,
 ) -> None:
     """
-    Callback при падении любого шага цепочки: Task.status='failed', publish в Redis.
+    Callback при падении любого шага цепочки: Task.status='failed', UploadCycle.status='failed',
+    publish в Redis, запуск следующего ожидающего цикла RAG.
     Вызывается через link_error с аргументами (request, exc, traceback).
     request.args у всех шагов: (rag_id, cycle_id, task_id[, input_file]).
     """
     if not request or not getattr(request, "args", None) or len(request.args) < 3:
         return
-    task_id = request.args[2]
+    rag_id, cycle_id, task_id = request.args[:3]
     err_msg = str(exc) if exc else "Unknown error"
     db = get_db_session()
     try:
         update_task(db, task_id, "failed", err_msg)
+        update_upload_cycle_status(db, cycle_id, "failed")
         r = get_redis()
         publish_status(r, task_id, "failed", step="", error=err_msg)
     finally:
         db.close()
+    # RAG освободился: запустить ожидающий цикл (импорт здесь — scheduler_task импортирует base)
+    from worker.tasks.scheduler_task import start_next_cycle
+
+    start_next_cycle(rag_id)
@@ -1,34 +1,102 @@
-"""Celery-задача: GraphRAG index и конвертация в RDF (graphrag_output.ttl)."""
+"""
+Celery-задача: GraphRAG index и конвертация в RDF (graphrag_output.ttl).
+Индексация — graphrag.api.build_index в процессе worker (graphrag, pandas, lancedb, pyarrow
+импортируются один раз на процесс, прогресс — через WorkflowCallbacks) или, при graphrag_index_mode=subprocess
+и без graphrag API, — подпроцессом `graphrag index` с разбором stdout.
+"""
+import asyncio
+import contextlib
+import hashlib
+import logging
+import os
 import shutil
 import subprocess
 import sys
+import threading
+from functools import lru_cache
 from pathlib import Path
+from typing import Any, Callable, Optional
 
 import yaml
 
 from worker.celery_app import celery
 from worker.config import get_settings
-from worker.tasks.base import get_db_session, get_redis, get_cycle_source_content, publish_status, update_task
+from worker.instrumentation import record_llm_usage
+from worker.preload import ensure_graphrag_test_path
+from worker.progress import GraphragProgress
+from worker.source_store import stream_source_blob
+from worker.tasks.base import (
+    cycle_document_name,
+    get_cycle_documents,
+    get_cycle_source_meta,
+    get_db_session,
+    get_redis,
+    publish_progress,
+    publish_status,
+    update_task,
+)
+
+logger = logging.getLogger(__name__)
+
+
+def _file_sha256(path: Path, chunk_size: int = 1024 * 1024) -> str:
+    """SHA-256 файла, чтение чанками."""
+    digest = hashlib.sha256()
+    with Path(path).open("rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _verify_source(dest: Path, expected_sha: Optional[str], expected_size: Optional[int], cycle_id: int) -> None:
+    """Сверка файла input/ с размером и SHA-256, записанными backend при загрузке."""
+    name = f"input/{dest.name}"
+    if not dest.exists() or dest.stat().st_size == 0:
+        raise RuntimeError(f"{name} missing or empty after prepare (cycle {cycle_id})")
+    if expected_size is not None and dest.stat().st_size != expected_size:
+        raise RuntimeError(f"{name} size {dest.stat().st_size} != uploaded {expected_size} (cycle {cycle_id})")
+    if expected_sha and _file_sha256(dest) != expected_sha:
+        raise RuntimeError(f"{name} SHA-256 mismatch with upload (cycle {cycle_id})")
 
 
 def _prepare_work_dir(work_dir: Path, input_file: str, cycle_id: int) -> None:
-    """Создаёт work_dir/input, заполняет input/source.txt: копией с диска или из БД (source_content)."""
+    """
+    Создаёт work_dir/input и заполняет его документами цикла (cycle_documents: input/doc_NNNN.txt; прочие
+    файлы input/ удаляются) или, для циклов до них, input/source.txt. Файлы берутся с диска (общий work_dir с backend)
+    или потоково из БД (source_blobs) и сверяются с размером и SHA-256 из загрузки.
+    """
     work_dir = Path(work_dir)
     input_dir = work_dir / "input"
     input_dir.mkdir(parents=True, exist_ok=True)
+    documents = get_cycle_documents(cycle_id)
+    if documents:
+        # graphrag индексирует весь input/: файл без строки cycle_documents (сбой commit загрузки) — удалить
+        listed = {cycle_document_name(seq) for seq, _, _ in documents}
+        for path in input_dir.iterdir():
+            if path.is_file() and path.name not in listed:
+                logger.warning("cycle %s: removing unlisted input file %s", cycle_id, path.name)
+                path.unlink()
+        for seq, sha, size in documents:
+            dest = input_dir / cycle_document_name(seq)
+            if not dest.exists() or dest.stat().st_size != size:
+                stream_source_blob(sha, dest)
+            _verify_source(dest, sha, size, cycle_id)
+        return
+
     dest = input_dir / "source.txt"
     src = Path(input_file)
-    if src.exists() and src.resolve() != dest.resolve():
+    expected_sha, expected_size = get_cycle_source_meta(cycle_id)
+    if src.is_file() and src.resolve() != dest.resolve():
         shutil.copy2(input_file, dest)
+    elif src.is_file() and src.stat().st_size > 0:
+        pass  # backend и worker делят work_dir: файл уже на месте
     else:
-        content = get_cycle_source_content(cycle_id)
-        if not content or not content.strip():
+        if not expected_sha:
             raise FileNotFoundError(
-                f"source not found or empty for cycle {cycle_id} (backend must save source_content to DB)"
+                f"source not found for cycle {cycle_id} (no file on disk and no source blob in DB)"
             )
-        dest.write_text(content, encoding="utf-8")
-    if not dest.exists() or dest.stat().st_size == 0:
-        raise RuntimeError(f"input/source.txt missing or empty after prepare (cycle {cycle_id})")
+        stream_source_blob(expected_sha, dest)
+    _verify_source(dest, expected_sha, expected_size, cycle_id)
 
 
 def _write_settings_yaml(work_dir: Path, settings_content: str, llm_api_url: str, llm_model: str) -> None:
@@ -54,6 +122,123 @@ def _write_settings_yaml(work_dir: Path, settings_content: str, llm_api_url: str
     )
 
 
+def _run_graphrag_index(work_dir: Path, progress: GraphragProgress, timeout: int) -> None:
+    """
+    `graphrag index --root work_dir` с построчным разбором stdout в progress (workflow, счётчики элементов).
+    Вывод дублируется в stdout worker. Ненулевой код → CalledProcessError, превышение timeout → TimeoutExpired.
+    """
+    cmd = ["graphrag", "index", "--root", str(work_dir), "--skip-validation"]
+    proc = subprocess.Popen(
+        cmd,
+        cwd=str(work_dir),
+        env={**os.environ, "PYTHONPATH": ":".join(sys.path)},
+        stdout=subprocess.PIPE,
+        stderr=subprocess.STDOUT,
+        text=True,  # universal newlines: строки прогресса с \r читаются как отдельные
+        bufsize=1,
+    )
+    timed_out = threading.Event()
+
+    def _kill() -> None:
+        timed_out.set()
+        proc.kill()
+
+    killer = threading.Timer(timeout, _kill)
+    killer.start()
+    try:
+        for line in proc.stdout:
+            sys.stdout.write(line)
+            progress.feed_line(line)
+        returncode = proc.wait()
+    finally:
+        killer.cancel()
+    if timed_out.is_set():
+        raise subprocess.TimeoutExpired(cmd, timeout)
+    if returncode != 0:
+        raise subprocess.CalledProcessError(returncode, cmd)
+
+
+class _IndexCallbacks:
+    """
+    WorkflowCallbacks graphrag для build_index в процессе: события pipeline → GraphragProgress
+    (то же, что разбор stdout подпроцесса, но без регулярных выражений). Методы протокола,
+    которых здесь нет (другие версии graphrag), — no-op.
+    """
+
+    def __init__(self, progress: GraphragProgress) -> None:
+        self._progress = progress
+
+    def pipeline_start(self, names: list[str]) -> None:
+        logger.info("graphrag pipeline: %s", ", ".join(names))
+        self._progress.pipeline_start(list(names))
+
+    def workflow_start(self, name: str, instance: Any = None) -> None:
+        logger.info("graphrag workflow start: %s", name)
+        self._progress.workflow_start(name)
+
+    def workflow_end(self, name: str, instance: Any = None) -> None:
+        logger.info("graphrag workflow complete: %s", name)
+        self._progress.workflow_end(name)
+
+    def progress(self, progress: Any) -> None:
+        done = getattr(progress, "completed_items", None)
+        total = getattr(progress, "total_items", None)
+        if done is not None and total:
+            self._progress.items(int(done), int(total))
+
+    def __getattr__(self, name: str) -> Callable[..., None]:
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return lambda *args, **kwargs: None
+
+
+@lru_cache(maxsize=1)
+def _graphrag_index_api() -> Optional[tuple[Callable, Callable]]:
+    """
+    (build_index, load_config) установленного graphrag или None (нет пакета / другой API — тогда подпроцесс).
+    Импорт — один раз на процесс worker: следующие циклы не платят за graphrag, pandas, lancedb, pyarrow.
+    """
+    try:
+        from graphrag.api import build_index
+        from graphrag.config.load_config import load_config
+    except ImportError:
+        logger.warning("graphrag API not importable, falling back to `graphrag index` subprocess", exc_info=True)
+        return None
+    return build_index, load_config
+
+
+def _run_graphrag_index_inprocess(
+    work_dir: Path,
+    progress: GraphragProgress,
+    timeout: int,
+    api: tuple[Callable, Callable],
+) -> None:
+    """
+    graphrag.api.build_index по work_dir/settings.yaml в процессе worker (как `graphrag index --root
+    --skip-validation`: проверка LLM не выполняется). Ошибка workflow → RuntimeError, timeout → TimeoutError.
+    cwd — work_dir на время индексации (относительные пути конфига); процесс prefork выполняет одну задачу.
+    """
+    build_index, load_config = api
+    with contextlib.chdir(work_dir):
+        config = load_config(work_dir)
+        results = asyncio.run(
+            asyncio.wait_for(build_index(config=config, callbacks=[_IndexCallbacks(progress)]), timeout)
+        )
+    for result in results or ():
+        errors = getattr(result, "errors", None)
+        if errors:
+            raise RuntimeError(f"graphrag workflow {getattr(result, 'workflow', '?')} failed: {errors[0]}")
+
+
+def _index(work_dir: Path, progress: GraphragProgress, timeout: int) -> None:
+    """Индексация work_dir: в процессе (graphrag_index_mode=inprocess и есть graphrag API) или подпроцессом."""
+    api = _graphrag_index_api() if get_settings().graphrag_index_mode == "inprocess" else None
+    if api is not None:
+        _run_graphrag_index_inprocess(work_dir, progress, timeout, api)
+    else:
+        _run_graphrag_index(work_dir, progress, timeout)
+
+
 @celery.task(
     bind=True,
     name="worker.tasks.graphrag_task.run_graphrag",
@@ -68,9 +253,10 @@ def run_graphrag(
     input_file: str,
 ):
     """
-    1. Подготовить work_dir/input/source.txt
-    2. Создать settings.yaml (шаблон из graphrag-test, с подменой api_base/model)
-    3. graphrag index --root work_dir
+    1. Подготовить work_dir/input (документы цикла)
+    2. Создать settings.yaml (шаблон из graphrag-test, с подменой api_base/model;
+       api_base — локальный прокси llm_router: балансировка по llm_endpoints, учёт вызовов и токенов LLM)
+    3. graphrag index по work_dir — в процессе или подпроцессом (этапы pipeline → журнал событий задачи)
     4. graphrag_lib.run_graphrag_pipeline(work_dir) → graphrag_output.ttl
     5. publish_status (при ошибке — update_task failed, publish_status, raise)
     """
@@ -86,24 +272,32 @@ def run_graphrag(
         work_dir.mkdir(parents=True, exist_ok=True)
         _prepare_work_dir(work_dir, input_file, cycle_id)
 
-        template_settings = (graphrag_test_dir / "settings.yaml").read_text(encoding="utf-8")
-        _write_settings_yaml(work_dir, template_settings, settings.llm_api_url, settings.llm_model)
+        ensure_graphrag_test_path()
 
-        prompts_src = graphrag_test_dir / "prompts"
-        prompts_dst = work_dir / "prompts"
-        if prompts_src.exists() and not prompts_dst.exists():
-            shutil.copytree(prompts_src, prompts_dst)
+        with contextlib.ExitStack() as stack:
+            # graphrag index знает один api_base и не сообщает вызовы LLM: на время индексации поднимаем
+            # локальный прокси llm_router (балансировка по llm_endpoints) — он же считает вызовы и токены шага
+            from llm_router import LLMProxy, get_router
 
-        subprocess.run(
-            ["graphrag", "index", "--root", str(work_dir), "--skip-validation"],
-            check=True,
-            cwd=str(work_dir),
-            timeout=3600,
-            env={**__import__("os").environ, "PYTHONPATH": ":".join(sys.path)},
-        )
+            proxy = LLMProxy(
+                get_router(settings.llm_endpoints or settings.llm_api_url),
+                on_usage=lambda usage: record_llm_usage(1, (usage or {}).get("completion_tokens")),
+            )
+            llm_api_url = stack.enter_context(proxy).base_url
+
+            template_settings = (graphrag_test_dir / "settings.yaml").read_text(encoding="utf-8")
+            _write_settings_yaml(work_dir, template_settings, llm_api_url, settings.llm_model)
+
+            prompts_src = graphrag_test_dir / "prompts"
+            prompts_dst = work_dir / "prompts"
+            if prompts_src.exists() and not prompts_dst.exists():
+                shutil.copytree(prompts_src, prompts_dst)
+
+            progress = GraphragProgress(
+                lambda fraction, data: publish_progress(r, task_id, "graphrag", fraction, **data)
+            )
+            _index(work_dir, progress, timeout=3600)
 
-        if str(graphrag_test_dir) not in sys.path:
-            sys.path.insert(0, str(graphrag_test_dir))
         from graphrag_lib import run_graphrag_pipeline
 
         run_graphrag_pipeline(work_dir)
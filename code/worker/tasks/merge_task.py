@@ -1,11 +1,19 @@
 """Celery-задача: merge_ontologies + merge_triples → integrated_*.ttl."""
-import sys
 from pathlib import Path
 
 from worker.celery_app import celery
 from worker.config import get_settings
 from worker.fuseki_client import export_dataset_to_ttl, rag_prod_dataset
-from worker.tasks.base import get_db_session, get_redis, publish_status, update_task
+from worker.preload import ensure_graphrag_test_path
+from worker.tasks.base import (
+    get_cycle_n,
+    get_db_session,
+    get_redis,
+    publish_progress,
+    publish_status,
+    update_task,
+)
+from worker.workdir import materialize_prod_export
 
 
 @celery.task(
@@ -21,30 +29,40 @@ def do_merge(
     task_id: int,
 ):
     """
-    Скачать prod-данные из Fuseki, merge_ontologies(extracted, prod) → integrated_ontology.ttl,
+    Скачать prod-данные из Fuseki (или взять снимок prod предыдущего цикла из cas, worker.workdir),
+    merge_ontologies(extracted, prod) → integrated_ontology.ttl,
     merge_triples(graphrag_output, prod) → integrated_triples.ttl.
     При ошибке — update_task(failed), publish_status(failed), raise.
     """
     settings = get_settings()
     work_dir = Path(settings.work_dir) / f"rag_{rag_id}" / f"cycle_{cycle_id}"
-    graphrag_test_dir = Path(settings.graphrag_test_dir)
     r = get_redis()
     db = get_db_session()
 
     try:
         publish_status(r, task_id, "running", "merge", None)
 
-        prod_ds = rag_prod_dataset(rag_id)
         prod_export = work_dir / "prod_export.ttl"
-        export_dataset_to_ttl(prod_ds, prod_export)
+        # prod после предыдущего цикла = его integrated_*.ttl (layout=datasets): снимок из cas вместо выгрузки
+        if (
+            settings.workdir_reuse_prod_snapshot
+            and settings.fuseki_layout == "datasets"
+            and materialize_prod_export(
+                Path(settings.work_dir), rag_id, get_cycle_n(db, cycle_id) - 1, prod_export
+            )
+        ):
+            publish_progress(r, task_id, "merge", 0.3, prod_snapshot_bytes=prod_export.stat().st_size)
+        else:
+            export_dataset_to_ttl(rag_prod_dataset(rag_id), prod_export)
+            publish_progress(r, task_id, "merge", 0.3, fuseki_bytes_read=prod_export.stat().st_size)
 
-        if str(graphrag_test_dir) not in sys.path:
-            sys.path.insert(0, str(graphrag_test_dir))
+        ensure_graphrag_test_path()
         from graphrag_lib import merge_ontologies, merge_triples
 
         extracted = work_dir / "extracted_ontology.ttl"
         graphrag_output = work_dir / "graphrag_output.ttl"
         merge_ontologies(extracted, prod_export, work_dir / "integrated_ontology.ttl")
+        publish_progress(r, task_id, "merge", 0.5, merged="ontology")
         merge_triples(graphrag_output, prod_export, work_dir / "integrated_triples.ttl")
 
         publish_status(r, task_id, "done", "merge", None)
@@ -0,0 +1,94 @@
+"""
+Celery-задача: запуск ожидающего цикла RAG (очередь циклов — см. backend app.scheduler).
+На RAG не более одного активного цикла (running | review); ожидающий (queued, один или несколько
+документов) стартует, когда активного нет. cycle_n присваивается здесь, при старте — под advisory lock RAG.
+"""
+import logging
+from pathlib import Path
+from typing import Optional
+
+from sqlalchemy import text
+
+from worker.celery_app import celery
+from worker.config import get_settings
+from worker.tasks.base import (
+    TASK_STATE_COLUMNS,
+    get_db_session,
+    store_task_state,
+    update_task,
+    update_upload_cycle_status,
+)
+
+logger = logging.getLogger(__name__)
+
+# Как app.scheduler.RAG_LOCK_NAMESPACE в backend
+RAG_LOCK_NAMESPACE = 0x46524147
+
+
+def start_next_cycle(rag_id: int) -> Optional[int]:
+    """
+    Если у RAG нет активного цикла — перевести самый старый ожидающий в running с cycle_n = cycle_count + 1
+    и запустить цепочку. Возвращает id запущенного цикла или None.
+    """
+    db = get_db_session()
+    try:
+        db.execute(
+            text("SELECT pg_advisory_xact_lock(:ns, :rag_id)"),
+            {"ns": RAG_LOCK_NAMESPACE, "rag_id": rag_id},
+        )
+        active = db.execute(
+            text("SELECT 1 FROM upload_cycles WHERE rag_id = :rag_id AND status IN ('running', 'review') LIMIT 1"),
+            {"rag_id": rag_id},
+        ).fetchone()
+        row = None if active else db.execute(
+            text(
+                "SELECT c.id, t.id FROM upload_cycles c JOIN tasks t ON t.cycle_id = c.id "
+                "WHERE c.rag_id = :rag_id AND c.status = 'queued' ORDER BY c.id LIMIT 1"
+            ),
+            {"rag_id": rag_id},
+        ).fetchone()
+        if not row:
+            db.rollback()
+            return None
+        cycle_id, task_id = int(row[0]), int(row[1])
+        db.execute(
+            text(
+                "UPDATE upload_cycles SET status = 'running', "
+                "cycle_n = (SELECT cycle_count + 1 FROM rag_instances WHERE id = :rag_id) WHERE id = :id"
+            ),
+            {"rag_id": rag_id, "id": cycle_id},
+        )
+        task_row = db.execute(
+            text(
+                "UPDATE tasks SET status = 'running', updated_at = now() WHERE id = :id "
+                f"RETURNING {TASK_STATE_COLUMNS}"
+            ),
+            {"id": task_id},
+        ).fetchone()
+        db.commit()
+    finally:
+        db.close()
+    store_task_state(task_id, task_row)
+
+    from worker.tasks import start_update_chain  # worker.tasks импортирует этот модуль
+
+    input_dir = Path(get_settings().work_dir) / f"rag_{rag_id}" / f"cycle_{cycle_id}" / "input"
+    try:
+        start_update_chain(rag_id, cycle_id, task_id, str(input_dir))
+    except Exception as e:
+        # Цепочка не ушла в брокер — не держать RAG занятым
+        db = get_db_session()
+        try:
+            update_task(db, task_id, "failed", f"Failed to start pipeline: {e}")
+            update_upload_cycle_status(db, cycle_id, "failed")
+        finally:
+            db.close()
+        raise
+    logger.info("RAG %s: started cycle %s (task %s)", rag_id, cycle_id, task_id)
+    return cycle_id
+
+
+@celery.task(name="worker.tasks.scheduler_task.schedule_cycles")
+def schedule_cycles(rag_id: int) -> Optional[int]:
+    """Запустить ожидающий цикл RAG, если RAG свободен (после загрузки, approve)."""
+    return start_next_cycle(rag_id)
@@ -1,10 +1,15 @@
 """Celery-задача: Schema Induction → extracted_ontology.ttl."""
-import sys
+import json
 from pathlib import Path
 
 from worker.celery_app import celery
 from worker.config import get_settings
-from worker.tasks.base import get_db_session, get_redis, publish_status, update_task
+from worker.instrumentation import record_llm_usage
+from worker.preload import ensure_graphrag_test_path
+from worker.tasks.base import get_db_session, get_redis, publish_progress, publish_status, update_task
+
+# Файл замеров, который пишет test_schema_induction.run_schema_induction в work_dir
+TIMING_FILE = "schema_induction_timing.json"
 
 
 @celery.task(
@@ -20,23 +25,40 @@ def run_schema_induction(
     task_id: int,
 ):
     """
-    graphrag_lib.run_schema_induction(work_dir, llm_api_url, llm_model) → extracted_ontology.ttl.
+    graphrag_lib.run_schema_induction(work_dir, llm_api_url, llm_model) → extracted_ontology.ttl
+    (endpoint LLM — через llm_router, если задан llm_endpoints).
     При ошибке — update_task(failed), publish_status(failed), raise.
     """
     settings = get_settings()
     work_dir = Path(settings.work_dir) / f"rag_{rag_id}" / f"cycle_{cycle_id}"
-    graphrag_test_dir = Path(settings.graphrag_test_dir)
     r = get_redis()
     db = get_db_session()
 
     try:
         publish_status(r, task_id, "running", "schema_induction", None)
 
-        if str(graphrag_test_dir) not in sys.path:
-            sys.path.insert(0, str(graphrag_test_dir))
+        ensure_graphrag_test_path()
         from graphrag_lib import run_schema_induction as _run_schema_induction
+        from llm_router import get_router
 
-        _run_schema_induction(work_dir, settings.llm_api_url, settings.llm_model)
+        # Один запрос к LLM: при сбое endpoint'а повторяется только он (на следующем endpoint'е)
+        _run_schema_induction(
+            work_dir,
+            settings.llm_api_url,
+            settings.llm_model,
+            router=get_router(settings.llm_endpoints or settings.llm_api_url),
+        )
+        timing_path = work_dir / TIMING_FILE
+        timing = json.loads(timing_path.read_text(encoding="utf-8")) if timing_path.exists() else {}
+        # llm_tokens шага — completion-токены (как у graphrag через прокси llm_router)
+        record_llm_usage(1, timing.get("completion_tokens"))
+        publish_progress(
+            r, task_id, "schema_induction", 1.0,
+            llm_calls=1,
+            tokens=timing.get("completion_tokens"),
+            llm_seconds=timing.get("wall_clock_seconds"),
+            prompt_chars=timing.get("prompt_chars"),
+        )
 
         publish_status(r, task_id, "done", "schema_induction", None)
     except Exception as e:
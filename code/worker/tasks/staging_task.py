@@ -6,7 +6,10 @@ from worker.config import get_settings
 from worker.fuseki_client import (
     create_dataset,
     load_ttl_into_dataset,
+    load_ttl_into_graph,
+    rag_cycle_graph,
     rag_ontology_dataset,
+    rag_prod_dataset,
     rag_staging_dataset,
     rag_triples_dataset,
 )
@@ -14,6 +17,7 @@ from worker.tasks.base import (
     get_cycle_n,
     get_db_session,
     get_redis,
+    publish_progress,
     publish_status,
     update_task,
     update_upload_cycle_status,
@@ -33,8 +37,11 @@ def load_to_staging(
     task_id: int,
 ):
     """
-    Создать датасеты -triples, -ontology, -staging; загрузить integrated_triples.ttl → -tri,
-    integrated_ontology.ttl → -ont; UploadCycle.status='review', Task.status='done', publish done.
+    layout=datasets: создать датасеты -triples, -ontology, -staging; загрузить integrated_triples.ttl → -tri,
+    integrated_ontology.ttl → -ont.
+    layout=graphs: загрузить их в named graphs urn:ferag:cycle:N:triples|ontology prod-датасета RAG
+    (default graph prod не меняется: TDB2 без unionDefaultGraph, чат и экспорт prod их не видят).
+    Затем UploadCycle.status='review', Task.status='done', publish done.
     При ошибке — update_task(failed), publish_status(failed), raise.
     """
     settings = get_settings()
@@ -46,16 +53,27 @@ def load_to_staging(
         publish_status(r, task_id, "running", "staging", None)
 
         cycle_n = get_cycle_n(db, cycle_id)
-        ds_tri = rag_triples_dataset(rag_id, cycle_n)
-        ds_ont = rag_ontology_dataset(rag_id, cycle_n)
-        ds_stg = rag_staging_dataset(rag_id, cycle_n)
+        triples_ttl = work_dir / "integrated_triples.ttl"
+        ontology_ttl = work_dir / "integrated_ontology.ttl"
+        if settings.fuseki_layout == "graphs":
+            prod_ds = rag_prod_dataset(rag_id)
+            create_dataset(prod_ds)
+            load_ttl_into_graph(prod_ds, rag_cycle_graph(cycle_n, "triples"), triples_ttl)
+            publish_progress(r, task_id, "staging", 0.5, fuseki_bytes_loaded=triples_ttl.stat().st_size)
+            load_ttl_into_graph(prod_ds, rag_cycle_graph(cycle_n, "ontology"), ontology_ttl)
+        else:
+            ds_tri = rag_triples_dataset(rag_id, cycle_n)
+            ds_ont = rag_ontology_dataset(rag_id, cycle_n)
+            ds_stg = rag_staging_dataset(rag_id, cycle_n)
 
-        create_dataset(ds_tri)
-        create_dataset(ds_ont)
-        create_dataset(ds_stg)
+            create_dataset(ds_tri)
+            create_dataset(ds_ont)
+            create_dataset(ds_stg)
 
-        load_ttl_into_dataset(ds_tri, work_dir / "integrated_triples.ttl")
-        load_ttl_into_dataset(ds_ont, work_dir / "integrated_ontology.ttl")
+            load_ttl_into_dataset(ds_tri, triples_ttl)
+            publish_progress(r, task_id, "staging", 0.5, fuseki_bytes_loaded=triples_ttl.stat().st_size)
+            load_ttl_into_dataset(ds_ont, ontology_ttl)
+        publish_progress(r, task_id, "staging", 0.9, fuseki_bytes_loaded=ontology_ttl.stat().st_size)
 
         update_upload_cycle_status(db, cycle_id, "review")
         update_task(db, task_id, "done", None)
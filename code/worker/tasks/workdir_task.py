@@ -0,0 +1,102 @@
+"""
+Celery-задачи обслуживания work_dir (worker.workdir): архивирование одобренного цикла
+(снимок prod в cas, удаление каталога) и очистка по квоте с публикацией объёма по RAG в Redis.
+"""
+import contextlib
+import logging
+from pathlib import Path
+from typing import Iterator, Optional
+
+from sqlalchemy import text
+
+from worker import workdir
+from worker.celery_app import celery
+from worker.config import get_settings
+from worker.tasks.base import get_db_session, get_redis
+
+logger = logging.getLogger(__name__)
+
+# Как app.scheduler.RAG_LOCK_NAMESPACE в backend
+RAG_LOCK_NAMESPACE = 0x46524147
+
+
+@celery.task(name="worker.tasks.workdir_task.archive_cycle")
+def archive_cycle(rag_id: int, cycle_id: int) -> int:
+    """После approve: снимок prod цикла в cas, каталог цикла удаляется; затем очистка по квоте."""
+    settings = get_settings()
+    db = get_db_session()
+    try:
+        row = db.execute(
+            text("SELECT cycle_n, status FROM upload_cycles WHERE id = :id AND rag_id = :rag_id"),
+            {"id": cycle_id, "rag_id": rag_id},
+        ).fetchone()
+    finally:
+        db.close()
+    if not row or row[1] != "merged":
+        logger.warning("RAG %s: cycle %s is not merged, not archiving", rag_id, cycle_id)
+        return 0
+    freed = workdir.archive_cycle(
+        Path(settings.work_dir),
+        rag_id,
+        cycle_id,
+        int(row[0]),
+        level=settings.workdir_zstd_level,
+        keep_snapshots=settings.workdir_keep_snapshots,
+    )
+    cleanup_work_dir()
+    return freed
+
+
+@celery.task(name="worker.tasks.workdir_task.cleanup_work_dir")
+def cleanup_work_dir() -> dict[str, int]:
+    """
+    Каталоги удалённых RAG и объекты cas без ссылок — удалить; при превышении workdir_quota_bytes —
+    LRU-вытеснение неактивных циклов и cas. Объём по RAG — в Redis (workdir:usage).
+    """
+    settings = get_settings()
+    db = get_db_session()
+    try:
+        # Каталоги этих циклов нужны: input/ ожидающего, работа цепочки, review до approve
+        active = {
+            int(cycle_id)
+            for (cycle_id,) in db.execute(
+                text("SELECT id FROM upload_cycles WHERE status IN ('queued', 'running', 'review')")
+            )
+        }
+        rag_ids = {int(rag_id) for (rag_id,) in db.execute(text("SELECT id FROM rag_instances"))}
+    finally:
+        db.close()
+    usage = workdir.enforce_quota(
+        Path(settings.work_dir), settings.workdir_quota_bytes, active, rag_ids, removal_guard=_removal_guard
+    )
+    try:
+        workdir.publish_usage(get_redis(), usage)
+    except Exception:
+        logger.warning("failed to publish work dir usage", exc_info=True)
+    return usage
+
+
+@contextlib.contextmanager
+def _removal_guard(rag_id: int, cycle_id: Optional[int]) -> Iterator[bool]:
+    """
+    Под advisory lock RAG (как app.scheduler и scheduler_task): каталог RAG можно удалить, если RAG нет
+    в БД; каталог цикла — если цикл не queued / running / review. Lock держится, пока каталог удаляется:
+    загрузка не положит документы в цикл, а scheduler не запустит его посреди удаления.
+    """
+    db = get_db_session()
+    try:
+        db.execute(
+            text("SELECT pg_advisory_xact_lock(:ns, :rag_id)"),
+            {"ns": RAG_LOCK_NAMESPACE, "rag_id": rag_id},
+        )
+        if cycle_id is None:
+            row = db.execute(text("SELECT 1 FROM rag_instances WHERE id = :id"), {"id": rag_id}).fetchone()
+        else:
+            row = db.execute(
+                text("SELECT 1 FROM upload_cycles WHERE id = :id AND status IN ('queued', 'running', 'review')"),
+                {"id": cycle_id},
+            ).fetchone()
+        yield row is None
+    finally:
+        db.rollback()
+        db.close()
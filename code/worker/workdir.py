@@ -0,0 +1,301 @@
+"""
+Жизненный цикл work_dir (/tmp/ferag): rag_X/cycle_Y — рабочие каталоги циклов (input/, output/ graphrag,
+логи, prod_export.ttl, integrated_*.ttl), cas/ — content-addressed хранилище артефактов (zstd, имя —
+SHA-256 исходного файла), rag_X/snapshots.json — манифест снимков prod: cycle_n → {артефакт: sha256}.
+
+После approve (archive_cycle) integrated_triples.ttl + integrated_ontology.ttl цикла — ровно то, что
+approve кладёт в prod (layout=datasets), — сохраняются в cas как снимок prod, каталог цикла удаляется.
+merge следующего цикла берёт prod_export.ttl из снимка вместо выгрузки prod из Fuseki (materialize_prod_export).
+Исходники документов не теряются: они в source_blobs (БД), worker восстанавливает input/ оттуда.
+
+Квота (enforce_quota): сначала удаляются каталоги удалённых RAG и объекты cas без ссылок из манифестов,
+затем — по LRU (mtime) каталоги неактивных циклов (merged, failed) и объекты cas, пока объём не уложится
+в квоту. Каталоги ожидающих, идущих и ожидающих approve циклов не трогаются. Объём по RAG — в Redis
+hash workdir:usage (backend /metrics: ferag_workdir_bytes).
+"""
+import contextlib
+import fcntl
+import hashlib
+import json
+import logging
+import os
+import shutil
+import time
+from pathlib import Path
+from typing import Callable, ContextManager, Iterator, Optional
+
+import zstandard
+
+logger = logging.getLogger(__name__)
+
+CAS_DIR = "cas"
+MANIFEST_NAME = "snapshots.json"
+LOCK_NAME = ".workdir.lock"
+# Снимок prod после цикла (в этом порядке склеивается в prod_export.ttl)
+SNAPSHOT_ARTIFACTS = ("integrated_triples.ttl", "integrated_ontology.ttl")
+# Redis hash: rag_<id> | cas | total → байт на диске (как app.metrics.WORKDIR_USAGE_KEY в backend)
+WORKDIR_USAGE_KEY = "workdir:usage"
+READ_CHUNK_BYTES = 1024 * 1024
+
+# guard(rag_id, cycle_id | None) → контекст с bool: удалить каталог RAG (cycle_id None) или цикла можно —
+# проверка по БД на момент удаления; контекст держится, пока каталог удаляется
+RemovalGuard = Callable[[int, Optional[int]], ContextManager[bool]]
+
+
+@contextlib.contextmanager
+def workdir_lock(work_dir: Path) -> Iterator[None]:
+    """Эксклюзивная блокировка манифестов и квоты между процессами worker (flock на work_dir/.workdir.lock)."""
+    work_dir = Path(work_dir)
+    work_dir.mkdir(parents=True, exist_ok=True)
+    with (work_dir / LOCK_NAME).open("a") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def _file_sha256(path: Path) -> str:
+    digest = hashlib.sha256()
+    with Path(path).open("rb") as f:
+        for chunk in iter(lambda: f.read(READ_CHUNK_BYTES), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def cas_path(work_dir: Path, sha256: str) -> Path:
+    return Path(work_dir) / CAS_DIR / sha256[:2] / f"{sha256}.zst"
+
+
+def cas_put(work_dir: Path, path: Path, level: int = 10) -> str:
+    """
+    Сохранить файл в cas (zstd, потоково); одинаковое содержимое хранится один раз — повторный put
+    только обновляет mtime (LRU). Возвращает SHA-256 исходного файла.
+    """
+    sha = _file_sha256(path)
+    dest = cas_path(work_dir, sha)
+    if dest.exists():
+        os.utime(dest)
+        return sha
+    dest.parent.mkdir(parents=True, exist_ok=True)
+    tmp = dest.with_name(f"{dest.name}.{os.getpid()}.tmp")
+    try:
+        with Path(path).open("rb") as src, tmp.open("wb") as out:
+            zstandard.ZstdCompressor(level=level).copy_stream(src, out)
+        os.replace(tmp, dest)
+    finally:
+        tmp.unlink(missing_ok=True)
+    return sha
+
+
+def cas_open(work_dir: Path, sha256: str):
+    """Поток распаковки объекта cas (FileNotFoundError, если объекта нет); mtime обновляется (LRU)."""
+    path = cas_path(work_dir, sha256)
+    f = path.open("rb")
+    os.utime(path)
+    return zstandard.ZstdDecompressor().stream_reader(f, closefd=True)
+
+
+def _manifest_path(work_dir: Path, rag_id: int) -> Path:
+    return Path(work_dir) / f"rag_{rag_id}" / MANIFEST_NAME
+
+
+def load_manifest(work_dir: Path, rag_id: int) -> dict[str, dict[str, str]]:
+    """Снимки prod RAG: {"<cycle_n>": {артефакт: sha256}}; нет манифеста или он битый — пусто."""
+    try:
+        data = json.loads(_manifest_path(work_dir, rag_id).read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {}
+    return data.get("snapshots", {}) if isinstance(data, dict) else {}
+
+
+def _save_manifest(work_dir: Path, rag_id: int, snapshots: dict[str, dict[str, str]]) -> None:
+    path = _manifest_path(work_dir, rag_id)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f"{path.name}.tmp")
+    tmp.write_text(json.dumps({"snapshots": snapshots}, indent=2), encoding="utf-8")
+    os.replace(tmp, path)
+
+
+def archive_cycle(
+    work_dir: Path,
+    rag_id: int,
+    cycle_id: int,
+    cycle_n: int,
+    level: int = 10,
+    keep_snapshots: int = 2,
+) -> int:
+    """
+    Одобренный цикл: снимок prod (SNAPSHOT_ARTIFACTS) — в cas и манифест RAG (последние keep_snapshots
+    снимков), каталог цикла удаляется. Без артефактов (старый или уже архивированный цикл) — только удаление.
+    Возвращает освобождённые байты (до сжатия снимка).
+    """
+    cycle_dir = Path(work_dir) / f"rag_{rag_id}" / f"cycle_{cycle_id}"
+    if not cycle_dir.exists():
+        return 0
+    artifacts = {name: cycle_dir / name for name in SNAPSHOT_ARTIFACTS}
+    with workdir_lock(work_dir):
+        if all(p.is_file() for p in artifacts.values()):
+            snapshot = {name: cas_put(work_dir, p, level) for name, p in artifacts.items()}
+            snapshots = load_manifest(work_dir, rag_id)
+            snapshots[str(cycle_n)] = snapshot
+            for key in sorted(snapshots, key=int)[: -max(keep_snapshots, 1)]:
+                del snapshots[key]
+            _save_manifest(work_dir, rag_id, snapshots)
+        freed = _tree_size(cycle_dir)
+        shutil.rmtree(cycle_dir, ignore_errors=True)
+    logger.info("RAG %s: archived cycle %s (cycle_n %s), freed %d bytes", rag_id, cycle_id, cycle_n, freed)
+    return freed
+
+
+def materialize_prod_export(work_dir: Path, rag_id: int, cycle_n: int, dest: Path) -> bool:
+    """
+    Записать в dest снимок prod после цикла cycle_n (triples + ontology одним TTL: в Turtle префиксы
+    можно объявлять повторно). False — снимка нет (или объект cas вытеснен): выгружать prod из Fuseki.
+    """
+    snapshot = load_manifest(work_dir, rag_id).get(str(cycle_n))
+    if not snapshot or any(name not in snapshot for name in SNAPSHOT_ARTIFACTS):
+        return False
+    dest = Path(dest)
+    dest.parent.mkdir(parents=True, exist_ok=True)
+    try:
+        with dest.open("wb") as out:
+            for name in SNAPSHOT_ARTIFACTS:
+                with cas_open(work_dir, snapshot[name]) as src:
+                    shutil.copyfileobj(src, out, READ_CHUNK_BYTES)
+                out.write(b"\n")
+    except (FileNotFoundError, zstandard.ZstdError):
+        logger.warning("RAG %s: prod snapshot of cycle %s unreadable", rag_id, cycle_n, exc_info=True)
+        dest.unlink(missing_ok=True)
+        return False
+    return True
+
+
+def _tree_size(path: Path) -> int:
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            with contextlib.suppress(OSError):
+                total += os.lstat(os.path.join(root, name)).st_size
+    return total
+
+
+def disk_usage(work_dir: Path) -> dict[str, int]:
+    """Байт на диске: rag_<id> (каталоги циклов, загрузки, манифест), cas, total."""
+    work_dir = Path(work_dir)
+    usage: dict[str, int] = {}
+    if work_dir.exists():
+        for entry in work_dir.iterdir():
+            if entry.is_dir() and (entry.name.startswith("rag_") or entry.name == CAS_DIR):
+                usage[entry.name] = _tree_size(entry)
+    usage["total"] = sum(usage.values())
+    return usage
+
+
+def _rag_id(entry: Path) -> Optional[int]:
+    try:
+        return int(entry.name.removeprefix("rag_"))
+    except ValueError:
+        return None
+
+
+def _referenced_shas(work_dir: Path) -> set[str]:
+    shas: set[str] = set()
+    for manifest in Path(work_dir).glob(f"rag_*/{MANIFEST_NAME}"):
+        rag_id = _rag_id(manifest.parent)
+        if rag_id is not None:
+            for snapshot in load_manifest(work_dir, rag_id).values():
+                shas.update(snapshot.values())
+    return shas
+
+
+def _remove_dir(path: Path, guard: Optional[RemovalGuard], rag_id: int, cycle_id: Optional[int]) -> bool:
+    """Удалить каталог, если guard подтверждает (None — без проверки). True — удалён."""
+    if guard is None:
+        shutil.rmtree(path, ignore_errors=True)
+        return True
+    with guard(rag_id, cycle_id) as allowed:
+        if allowed:
+            shutil.rmtree(path, ignore_errors=True)
+        return allowed
+
+
+def enforce_quota(
+    work_dir: Path,
+    quota_bytes: int,
+    active_cycle_ids: set[int],
+    existing_rag_ids: Optional[set[int]] = None,
+    removal_guard: Optional[RemovalGuard] = None,
+) -> dict[str, int]:
+    """
+    Освободить место: каталоги RAG не из existing_rag_ids (None — не проверять) и объекты cas без ссылок —
+    всегда; затем, если объём больше quota_bytes (0 — без квоты), по LRU каталоги циклов не из
+    active_cycle_ids и объекты cas. Множества — снимок на момент запроса к БД: RAG или цикл, созданный
+    после него, в них не попал, поэтому каждый каталог перед удалением подтверждает removal_guard.
+    Возвращает disk_usage после очистки.
+    """
+    work_dir = Path(work_dir)
+    with workdir_lock(work_dir):
+        if existing_rag_ids is not None:
+            for entry in work_dir.glob("rag_*"):
+                rag_id = _rag_id(entry)
+                if rag_id is not None and rag_id not in existing_rag_ids:
+                    if _remove_dir(entry, removal_guard, rag_id, None):
+                        logger.info("removed work dir of deleted RAG %s", rag_id)
+        referenced = _referenced_shas(work_dir)
+        # (mtime, размер, путь, (rag_id, cycle_id) каталога цикла); объекты cas со ссылками — тоже кэш:
+        # без них merge выгрузит prod из Fuseki
+        candidates: list[tuple[float, int, Path, Optional[tuple[int, int]]]] = []
+        for obj in (work_dir / CAS_DIR).glob("*/*.zst"):
+            if obj.name.removesuffix(".zst") not in referenced:
+                obj.unlink(missing_ok=True)
+                continue
+            with contextlib.suppress(OSError):
+                st = obj.stat()
+                candidates.append((st.st_mtime, st.st_size, obj, None))
+        total = disk_usage(work_dir)["total"]
+        if quota_bytes > 0 and total > quota_bytes:
+            for cycle_dir in work_dir.glob("rag_*/cycle_*"):
+                rag_id = _rag_id(cycle_dir.parent)
+                try:
+                    cycle_id = int(cycle_dir.name.removeprefix("cycle_"))
+                except ValueError:
+                    continue
+                if rag_id is not None and cycle_id not in active_cycle_ids:
+                    candidates.append((_last_used(cycle_dir), _tree_size(cycle_dir), cycle_dir, (rag_id, cycle_id)))
+            for _, size, path, cycle in sorted(candidates, key=lambda c: c[0]):
+                if total <= quota_bytes:
+                    break
+                if cycle is None:
+                    path.unlink(missing_ok=True)
+                elif not _remove_dir(path, removal_guard, *cycle):
+                    # Цикл стал активным после снимка
+                    continue
+                logger.info("work dir quota: evicted %s (%d bytes)", path, size)
+                total -= size
+        return disk_usage(work_dir)
+
+
+def _last_used(path: Path) -> float:
+    """Последнее изменение каталога цикла: mtime самого каталога и его прямых потомков."""
+    latest = path.stat().st_mtime
+    for child in path.iterdir():
+        with contextlib.suppress(OSError):
+            latest = max(latest, child.stat().st_mtime)
+    return latest
+
+
+def publish_usage(r, usage: dict[str, int]) -> None:
+    """Объём work_dir по RAG в Redis hash workdir:usage (заменяет прежний: удалённые RAG исчезают)."""
+    pipe = r.pipeline()
+    pipe.delete(WORKDIR_USAGE_KEY)
+    if usage:
+        pipe.hset(WORKDIR_USAGE_KEY, mapping={**usage, "updated_at": int(time.time())})
+    pipe.execute()
+
+
+if __name__ == "__main__":
+    # Отчёт об использовании диска: python -m worker.workdir
+    from worker.config import get_settings
+
+    print(json.dumps(disk_usage(get_settings().work_dir), indent=2))
@@ -0,0 +1,350 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк горячих путей цикла без LLM и Fuseki: graphrag_to_rdf, merge_triples, merge_ontologies, extract_keywords.
+
+Синтетические данные (детерминированные, seed) на 10k / 100k / 1M триплетов:
+  output/entities.parquet, output/relationships.parquet — как у graphrag index;
+  prod_triples.ttl — выгрузка prod (половина сущностей пересекается с циклом, часть описаний отличается);
+  extracted_ontology.ttl, prod_ontology.ttl — онтологии цикла и prod;
+  questions.txt — вопросы для extract_keywords.
+Каждый шаг запускается в отдельном процессе: время (лучшее из --repeat) и пиковый прирост RSS.
+Результаты сравниваются с baseline (JSON); регрессия сверх --threshold → код выхода 1,
+нет baseline для замера → код выхода 2 (без --save-baseline сравнивать не с чем — это не «регрессий нет»).
+bench_baseline.json записан на 1 vCPU Intel Xeon, 6 ГБ RAM, Python 3.11.7, rdflib 7.6.0, pandas 3.0.6,
+pyarrow 26.0.0; на другой машине сначала запишите свой: --save-baseline.
+
+Использование:
+  python bench_pipeline.py                      # 10k,100k,1m, сравнение с bench_baseline.json
+  python bench_pipeline.py --sizes 10k,100k --repeat 3
+  python bench_pipeline.py --save-baseline      # записать текущие замеры как baseline
+  python bench_pipeline.py --steps merge_triples --sizes 100k
+"""
+
+import argparse
+import json
+import random
+import resource
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+SIZES = {"10k": 10_000, "100k": 100_000, "1m": 1_000_000}
+STEPS = ("graphrag_to_rdf", "merge_triples", "merge_ontologies", "extract_keywords")
+DEFAULT_BASELINE = ROOT / "bench_baseline.json"
+DEFAULT_DATA_DIR = Path("/tmp/ferag-bench")
+# Ниже этих значений разница — шум таймера и аллокатора, регрессией не считается
+MIN_SECONDS = 0.05
+MIN_PEAK_MB = 5.0
+
+ENTITY_TYPES = ("PERSON", "ORGANIZATION", "EVENT", "GEO", "TECHNOLOGY")
+WORDS = (
+    "компания", "проект", "исследование", "платформа", "данные", "граф", "система", "команда",
+    "research", "platform", "graph", "engine", "market", "network", "product", "service",
+)
+QUESTION_TEMPLATES = (
+    "Кто такой {a}?",
+    "Где работает {a}?",
+    "Как связаны {a} и {b}?",
+    "Что такое {a} и чем занимается {b}?",
+    "What is the relationship between {a} and {b}?",
+)
+
+
+# --- Синтетические данные ---
+
+def _entity_name(i: int) -> str:
+    return f"ENTITY_{i:07d}"
+
+
+def _description(rng: random.Random, n_words: int = 12) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(n_words))
+
+
+def _shape(n_triples: int) -> tuple[int, int]:
+    """(сущностей, связей): сущность даёт 2 триплета (type, description), связь — 5."""
+    n_entities = max(n_triples // 6, 2)
+    n_rels = max((n_triples - 2 * n_entities) // 5, 1)
+    return n_entities, n_rels
+
+
+def generate_cycle_output(work_dir: Path, n_triples: int, seed: int = 1) -> None:
+    """output/entities.parquet и output/relationships.parquet в формате graphrag index."""
+    import pandas as pd
+
+    rng = random.Random(seed)
+    n_entities, n_rels = _shape(n_triples)
+    out = work_dir / "output"
+    out.mkdir(parents=True, exist_ok=True)
+    pd.DataFrame({
+        "title": [_entity_name(i) for i in range(n_entities)],
+        "type": [rng.choice(ENTITY_TYPES) for _ in range(n_entities)],
+        "description": [_description(rng) for _ in range(n_entities)],
+    }).to_parquet(out / "entities.parquet", index=False)
+    sources = [rng.randrange(n_entities) for _ in range(n_rels)]
+    pd.DataFrame({
+        "source": [_entity_name(i) for i in sources],
+        "target": [_entity_name((i + 1 + rng.randrange(n_entities - 1)) % n_entities) for i in sources],
+        "description": [_description(rng, 8) for _ in range(n_rels)],
+        "weight": [float(rng.randint(1, 10)) for _ in range(n_rels)],
+    }).to_parquet(out / "relationships.parquet", index=False)
+
+
+def _ttl_literal(s: str) -> str:
+    return '"' + s.replace("\\", "\\\\").replace('"', '\\"') + '"'
+
+
+def generate_prod_ttl(path: Path, n_triples: int, seed: int = 2) -> None:
+    """
+    Prod-граф той же формы, что пишет graphrag_to_rdf: сущности со сдвигом на половину
+    (пересечение с циклом — коллизии description), связи — blank nodes ferag:Relationship.
+    """
+    rng = random.Random(seed)
+    n_entities, n_rels = _shape(n_triples)
+    offset = n_entities // 2
+    types = {"PERSON": "Person", "ORGANIZATION": "Organization", "EVENT": "Event", "GEO": "Location"}
+    with path.open("w", encoding="utf-8") as f:
+        f.write("@prefix ferag: <http://example.org/ferag#> .\n")
+        f.write("@prefix xsd: <http://www.w3.org/2001/XMLSchema#> .\n\n")
+        for i in range(offset, offset + n_entities):
+            t = types.get(rng.choice(ENTITY_TYPES), "Thing")
+            f.write(f"ferag:{_entity_name(i)} a ferag:{t} ;\n")
+            f.write(f"    ferag:description {_ttl_literal(_description(rng))} .\n")
+        for _ in range(n_rels):
+            a = offset + rng.randrange(n_entities)
+            b = offset + rng.randrange(n_entities)
+            f.write(
+                f"[] a ferag:Relationship ; ferag:from ferag:{_entity_name(a)} ; "
+                f"ferag:to ferag:{_entity_name(b)} ; "
+                f"ferag:description {_ttl_literal(_description(rng, 8))} ; "
+                f'ferag:weight "{float(rng.randint(1, 10))}"^^xsd:double .\n'
+            )
+
+
+def generate_ontology_ttl(path: Path, n_triples: int, seed: int) -> None:
+    """OWL-онтология: классы с иерархией, объектные свойства с domain/range (~n_triples триплетов)."""
+    rng = random.Random(seed)
+    n_classes = max(n_triples // 4, 4)
+    n_props = max(n_triples // 8, 2)
+    # Пересечение онтологий цикла и prod — около половины имён
+    start = rng.randrange(n_classes // 2 + 1)
+    with path.open("w", encoding="utf-8") as f:
+        f.write("@prefix : <http://example.org/ferag/schema#> .\n")
+        f.write("@prefix owl: <http://www.w3.org/2002/07/owl#> .\n")
+        f.write("@prefix rdfs: <http://www.w3.org/2000/01/rdf-schema#> .\n\n")
+        for i in range(start, start + n_classes):
+            f.write(f":Class{i} a owl:Class .\n")
+            if i > start:
+                f.write(f":Class{i} rdfs:subClassOf :Class{start + rng.randrange(i - start)} .\n")
+        for i in range(start, start + n_props):
+            d = start + rng.randrange(n_classes)
+            r = start + rng.randrange(n_classes)
+            f.write(f":prop{i} a owl:ObjectProperty ; rdfs:domain :Class{d} ; rdfs:range :Class{r} .\n")
+
+
+def generate_questions(path: Path, n: int, seed: int = 3) -> None:
+    rng = random.Random(seed)
+    lines = []
+    for _ in range(n):
+        a = " ".join(rng.choice(WORDS) for _ in range(2)).title()
+        b = " ".join(rng.choice(WORDS) for _ in range(2)).title()
+        lines.append(rng.choice(QUESTION_TEMPLATES).format(a=a, b=b))
+    path.write_text("\n".join(lines), encoding="utf-8")
+
+
+def prepare_data(data_dir: Path, size_label: str) -> Path:
+    """Сгенерировать (один раз) данные размера size_label; возвращает каталог."""
+    n = SIZES[size_label]
+    d = data_dir / size_label
+    marker = d / ".complete"
+    if marker.exists():
+        return d
+    d.mkdir(parents=True, exist_ok=True)
+    print(f"  генерация данных {size_label} → {d}", flush=True)
+    generate_cycle_output(d, n)
+    generate_prod_ttl(d / "prod_triples.ttl", n)
+    # Онтологии на порядки меньше графа; масштабируются вместе с ним
+    generate_ontology_ttl(d / "extracted_ontology.ttl", max(n // 20, 40), seed=4)
+    generate_ontology_ttl(d / "prod_ontology.ttl", max(n // 20, 40), seed=5)
+    generate_questions(d / "questions.txt", max(n // 10, 100))
+    marker.write_text("ok", encoding="utf-8")
+    return d
+
+
+# --- Шаги (выполняются в отдельном процессе) ---
+
+def _rss_bytes() -> int:
+    """Текущий RSS (Linux: /proc/self/statm), иначе пиковый ru_maxrss."""
+    try:
+        with open("/proc/self/statm", encoding="ascii") as f:
+            return int(f.read().split()[1]) * resource.getpagesize()
+    except (OSError, ValueError, IndexError):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def _peak_rss_bytes() -> int:
+    """Пиковый RSS процесса: VmHWM (сбрасывается через clear_refs), иначе ru_maxrss."""
+    try:
+        with open("/proc/self/status", encoding="ascii") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError, IndexError):
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def _reset_peak_rss() -> None:
+    """Сбросить VmHWM к текущему RSS (Linux ≥ 4.0); иначе пик считается от старта процесса."""
+    try:
+        with open("/proc/self/clear_refs", "w", encoding="ascii") as f:
+            f.write("5")
+    except OSError:
+        pass
+
+
+def _run_step(step: str, data_dir: str) -> dict:
+    """Выполнить шаг на данных data_dir; импорты модулей — до замера."""
+    d = Path(data_dir)
+    out_dir = d / "bench_out"
+    out_dir.mkdir(exist_ok=True)
+    if step == "graphrag_to_rdf":
+        from test_graphrag_to_rdf import graphrag_to_rdf
+        import pandas  # noqa: F401 — загрузка библиотеки не в замере
+        import rdflib  # noqa: F401
+
+        def fn():
+            graphrag_to_rdf(d, out_dir / "graphrag_output.ttl")
+    elif step == "merge_triples":
+        from merge_triples import merge_triples
+
+        cycle_ttl = out_dir / "graphrag_output.ttl"
+        if not cycle_ttl.exists():
+            from test_graphrag_to_rdf import graphrag_to_rdf
+            graphrag_to_rdf(d, cycle_ttl)
+
+        def fn():
+            merge_triples(cycle_ttl, d / "prod_triples.ttl", out_dir / "integrated_triples.ttl")
+    elif step == "merge_ontologies":
+        from merge_ontologies import merge_ontologies
+
+        def fn():
+            merge_ontologies(
+                d / "extracted_ontology.ttl", d / "prod_ontology.ttl", out_dir / "integrated_ontology.ttl"
+            )
+    elif step == "extract_keywords":
+        from rag_context import extract_keywords
+
+        questions = (d / "questions.txt").read_text(encoding="utf-8").splitlines()
+
+        def fn():
+            for q in questions:
+                extract_keywords(q)
+    else:
+        raise ValueError(f"unknown step {step}")
+
+    _reset_peak_rss()
+    rss_before = _rss_bytes()
+    started = time.perf_counter()
+    fn()
+    seconds = time.perf_counter() - started
+    peak_delta = max(_peak_rss_bytes() - rss_before, 0)
+    return {"seconds": seconds, "peak_mb": peak_delta / 2**20}
+
+
+def measure(step: str, data_dir: Path, repeat: int) -> dict:
+    """Лучшее время и максимальный прирост RSS по repeat запускам в свежих процессах."""
+    runs = []
+    for _ in range(repeat):
+        with ProcessPoolExecutor(max_workers=1, mp_context=get_context("spawn")) as pool:
+            runs.append(pool.submit(_run_step, step, str(data_dir)).result())
+    return {
+        "seconds": round(min(r["seconds"] for r in runs), 4),
+        "peak_mb": round(max(r["peak_mb"] for r in runs), 1),
+    }
+
+
+# --- Baseline ---
+
+def compare(results: dict, baseline: dict, threshold: float) -> list[str]:
+    """Ключи step@size, где время или память выросли больше чем в threshold раз."""
+    regressions = []
+    for key, cur in results.items():
+        base = baseline.get(key)
+        if not base:
+            continue
+        if base["seconds"] >= MIN_SECONDS and cur["seconds"] > base["seconds"] * threshold:
+            regressions.append(f"{key}: время {base['seconds']:.3f} → {cur['seconds']:.3f} с")
+        if base["peak_mb"] >= MIN_PEAK_MB and cur["peak_mb"] > base["peak_mb"] * threshold:
+            regressions.append(f"{key}: память {base['peak_mb']:.1f} → {cur['peak_mb']:.1f} МБ")
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Бенчмарк graphrag_to_rdf / merge / extract_keywords")
+    parser.add_argument("--sizes", default=",".join(SIZES), help=f"Размеры через запятую: {', '.join(SIZES)}")
+    parser.add_argument("--steps", default=",".join(STEPS), help="Шаги через запятую")
+    parser.add_argument("--repeat", type=int, default=1, help="Запусков на шаг (берётся лучшее время)")
+    parser.add_argument("--data-dir", type=Path, default=DEFAULT_DATA_DIR, help="Кэш синтетических данных")
+    parser.add_argument("--baseline", type=Path, default=DEFAULT_BASELINE, help="JSON с baseline")
+    parser.add_argument("--save-baseline", action="store_true", help="Записать результаты в baseline")
+    parser.add_argument("--threshold", type=float, default=1.25, help="Допустимый рост (×) до регрессии")
+    parser.add_argument("--json", type=Path, help="Сохранить результаты прогона в JSON")
+    args = parser.parse_args()
+
+    sizes = [s.strip().lower() for s in args.sizes.split(",") if s.strip()]
+    steps = [s.strip() for s in args.steps.split(",") if s.strip()]
+    for s in sizes:
+        if s not in SIZES:
+            parser.error(f"неизвестный размер {s}")
+    for s in steps:
+        if s not in STEPS:
+            parser.error(f"неизвестный шаг {s}")
+
+    baseline = json.loads(args.baseline.read_text(encoding="utf-8")) if args.baseline.exists() else {}
+    if not baseline and not args.save_baseline:
+        print(f"ВНИМАНИЕ: baseline {args.baseline} не найден — регрессии не проверяются", file=sys.stderr)
+    results: dict[str, dict] = {}
+    print(f"{'шаг@размер':<28} {'время, с':>10} {'память, МБ':>11} {'baseline, с':>12} {'Δ':>7}")
+    for size in sizes:
+        data_dir = prepare_data(args.data_dir, size)
+        for step in steps:
+            key = f"{step}@{size}"
+            res = measure(step, data_dir, args.repeat)
+            results[key] = res
+            base = baseline.get(key)
+            base_s = f"{base['seconds']:.3f}" if base else "—"
+            delta = f"{res['seconds'] / base['seconds']:.2f}×" if base and base["seconds"] > 0 else ""
+            print(f"{key:<28} {res['seconds']:>10.3f} {res['peak_mb']:>11.1f} {base_s:>12} {delta:>7}", flush=True)
+
+    if args.json:
+        args.json.write_text(json.dumps(results, indent=2, ensure_ascii=False), encoding="utf-8")
+    if args.save_baseline:
+        baseline.update(results)
+        args.baseline.write_text(json.dumps(baseline, indent=2, ensure_ascii=False), encoding="utf-8")
+        print(f"\nBaseline записан: {args.baseline}")
+        return
+    regressions = compare(results, baseline, args.threshold)
+    if regressions:
+        print(f"\nРегрессии (порог {args.threshold}×):")
+        for line in regressions:
+            print(f"  {line}")
+        sys.exit(1)
+    missing = [key for key in results if key not in baseline]
+    if missing:
+        print(
+            f"\nНет baseline для {', '.join(missing)} в {args.baseline} — сравнение не выполнено; "
+            "запишите его: --save-baseline",
+            file=sys.stderr,
+        )
+        sys.exit(2)
+    print("\nРегрессий нет.")
+
+
+if __name__ == "__main__":
+    main()
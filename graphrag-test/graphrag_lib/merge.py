@@ -0,0 +1,16 @@
+"""Слияние онтологий и триплетов (TTL) — merge_ontologies, merge_triples (rdflib)."""
+from pathlib import Path
+from typing import Optional
+
+from merge_ontologies import merge_ontologies as _merge_ontologies
+from merge_triples import merge_triples as _merge_triples
+
+
+def merge_ontologies(onto1: Path, onto2: Path, out_path: Path, report_path: Optional[Path] = None) -> Path:
+    """Слияние двух онтологий (TTL) в одну. Возвращает out_path."""
+    return _merge_ontologies(Path(onto1), Path(onto2), Path(out_path), report_path=report_path)
+
+
+def merge_triples(triples1: Path, triples2: Path, out_path: Path, report_path: Optional[Path] = None) -> Path:
+    """Слияние двух файлов триплетов (TTL) в один. Возвращает out_path."""
+    return _merge_triples(Path(triples1), Path(triples2), Path(out_path), report_path=report_path)
@@ -0,0 +1,14 @@
+"""Конвертация output/ graphrag (parquet) в RDF — test_graphrag_to_rdf (pandas, rdflib)."""
+from pathlib import Path
+
+from test_graphrag_to_rdf import graphrag_to_rdf as _graphrag_to_rdf
+
+
+def run_graphrag_pipeline(work_dir: Path) -> Path:
+    """
+    Конвертация output/ (parquet) в RDF. Возвращает путь к graphrag_output.ttl.
+    work_dir — каталог цикла (содержит output/).
+    """
+    work_dir = Path(work_dir)
+    out_path = work_dir / "graphrag_output.ttl"
+    return _graphrag_to_rdf(work_dir, out_path)
@@ -0,0 +1,14 @@
+"""Schema Induction по output/ graphrag — test_schema_induction."""
+from pathlib import Path
+
+from test_schema_induction import run_schema_induction as _run_schema_induction
+
+
+def run_schema_induction(work_dir: Path, llm_base_url: str, model: str, router=None) -> Path:
+    """
+    Schema Induction: LLM по output/ → онтология. Возвращает путь к extracted_ontology.ttl.
+    router (llm_router.LLMRouter) — failover только HTTP-запроса к LLM, а не всей индукции.
+    """
+    work_dir = Path(work_dir)
+    out_path = work_dir / "extracted_ontology.ttl"
+    return _run_schema_induction(work_dir, out_path, llm_base_url=llm_base_url, model=model, router=router)
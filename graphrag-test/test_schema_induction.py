@@ -93,15 +93,28 @@ def extract_turtle(text: str) -> str:
     return text
 
 
+def request_completion(llm_base_url: str, model: str, prompt: str, request_timeout: int = REQUEST_TIMEOUT_SEC):
+    """Один запрос chat.completions к OpenAI-совместимому endpoint'у (LM Studio)."""
+    client = OpenAI(base_url=llm_base_url, api_key="lm-studio", timeout=request_timeout)
+    return client.chat.completions.create(
+        model=model,
+        messages=[{"role": "user", "content": prompt}],
+        max_tokens=MAX_RESPONSE_TOKENS,
+        temperature=0.0,
+    )
+
+
 def run_schema_induction(
     root_dir: Path,
     output_path: Path,
     llm_base_url: str = LM_STUDIO_BASE,
     model: str = MODEL,
     request_timeout: int = REQUEST_TIMEOUT_SEC,
+    router=None,
 ) -> Path:
     """
     Строит промпт из output/ в root_dir, вызывает LLM, сохраняет онтологию в output_path.
+    router (llm_router.LLMRouter) — запрос к LLM через его endpoint'ы с failover (llm_base_url не используется).
     Возвращает output_path. При ошибке бросает исключение.
     """
     root_dir = Path(root_dir)
@@ -115,13 +128,11 @@ def run_schema_induction(
     prompt_chars = len(prompt)
 
     t0 = time.perf_counter()
-    client = OpenAI(base_url=llm_base_url, api_key="lm-studio", timeout=request_timeout)
-    resp = client.chat.completions.create(
-        model=model,
-        messages=[{"role": "user", "content": prompt}],
-        max_tokens=MAX_RESPONSE_TOKENS,
-        temperature=0.0,
-    )
+    if router is None:
+        resp = request_completion(llm_base_url, model, prompt, request_timeout)
+    else:
+        # Failover только запроса: промпт уже построен, повтор на другом endpoint'е не перечитывает output/
+        resp = router.call(lambda ep: request_completion(ep.url, ep.model or model, prompt, request_timeout))
     t1 = time.perf_counter()
     raw = (resp.choices[0].message.content or "").strip()
     if not raw:
@@ -136,11 +147,11 @@ def run_schema_induction(
         owl_path.write_text(turtle, encoding="utf-8")
 
     usage = getattr(resp, "usage", None)
-    total_tokens = None
+    total_tokens = prompt_tokens = completion_tokens = None
     if usage is not None:
-        total_tokens = getattr(usage, "total_tokens", None) or (
-            (getattr(usage, "prompt_tokens", 0) or 0) + (getattr(usage, "completion_tokens", 0) or 0)
-        )
+        prompt_tokens = getattr(usage, "prompt_tokens", None)
+        completion_tokens = getattr(usage, "completion_tokens", None)
+        total_tokens = getattr(usage, "total_tokens", None) or ((prompt_tokens or 0) + (completion_tokens or 0))
     timing = {
         "wall_clock_seconds": round(t1 - t0, 2),
         "entities_count": len(entities),
@@ -148,7 +159,10 @@ def run_schema_induction(
         "communities_count": len(reports),
         "prompt_chars": prompt_chars,
         "output_chars": len(turtle),
+        # output_tokens — всего (prompt + completion), как раньше; completion — ответ модели
         "output_tokens": total_tokens,
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": completion_tokens,
     }
     timing_path = root_dir / TIMING_FILE
     timing_path.write_text(json.dumps(timing, indent=2), encoding="utf-8")
@@ -0,0 +1,264 @@
+#!/usr/bin/env python3
+"""
+Нагрузочный прогон RAG-чата: p50/p95/p99 сборки контекста (и ответа целиком).
+
+Режимы:
+  context — build_context_by_question напрямую против Fuseki (или scripts/fuseki_standin.py):
+            латентность контекста и каждого SPARQL-подзапроса, без backend и LLM;
+  api     — POST /rags/{id}/chat backend (LLM — scripts/mock_llm.py): латентность ответа целиком,
+            контекст — из гистограммы ferag_span_seconds{span="chat.context"} (/metrics до и после прогона).
+Вопросы — из файла (--questions, по одному в строке) или по шаблонам из имён сущностей датасета.
+
+Пример (ноутбук, без Fuseki и LLM):
+  python scripts/fuseki_standin.py --load ferag-00001=/tmp/ferag-bench/100k/prod_triples.ttl &
+  python scripts/chat_load.py context --dataset ferag-00001 --requests 500 --concurrency 8
+  python scripts/mock_llm.py --ttft 0.3 --tokens-per-sec 40 &
+  python scripts/chat_load.py api --api-url http://127.0.0.1:47821/ferag/api --rag-id 1 \\
+      --email load@example.com --password test123456 --requests 200 --concurrency 8
+"""
+
+import argparse
+import random
+import re
+import sys
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import requests
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / "graphrag-test"))
+
+QUESTION_TEMPLATES = (
+    "Кто такой {a}?",
+    "Что такое {a}?",
+    "Где работает {a}?",
+    "Как связаны {a} и {b}?",
+    "Расскажи про {a} и {b}.",
+    "What do you know about {a}?",
+)
+# Вопросы без совпадений в графе — путь fallback (build_context_fixed)
+NO_MATCH_SHARE = 0.1
+
+
+def percentile(values: list[float], p: float) -> float:
+    """Перцентиль (nearest-rank) по непустому списку."""
+    ordered = sorted(values)
+    k = max(0, min(len(ordered) - 1, int(round(p / 100.0 * len(ordered) + 0.5)) - 1))
+    return ordered[k]
+
+
+def summarize(name: str, values: list[float]) -> str:
+    if not values:
+        return f"{name:<40} —"
+    ms = [v * 1000 for v in values]
+    return (
+        f"{name:<40} n={len(ms):<6} p50={percentile(ms, 50):8.1f}  p95={percentile(ms, 95):8.1f}  "
+        f"p99={percentile(ms, 99):8.1f}  max={max(ms):8.1f} мс"
+    )
+
+
+def make_questions(n: int, entity_names: list[str], seed: int = 7) -> list[str]:
+    """n вопросов по шаблонам: имена сущностей (в виде, как их пишет пользователь) и доля «мимо графа»."""
+    rng = random.Random(seed)
+    human = [name.replace("_", " ").title() for name in entity_names] or ["Alice Smith", "DataCorp"]
+    out = []
+    for _ in range(n):
+        if rng.random() < NO_MATCH_SHARE:
+            out.append("абракадабра " + str(rng.randrange(10**6)))
+            continue
+        out.append(rng.choice(QUESTION_TEMPLATES).format(a=rng.choice(human), b=rng.choice(human)))
+    return out
+
+
+def load_questions(args, sparql_kw: dict | None) -> list[str]:
+    if args.questions:
+        lines = [q.strip() for q in Path(args.questions).read_text(encoding="utf-8").splitlines() if q.strip()]
+        return [lines[i % len(lines)] for i in range(args.requests)]
+    names: list[str] = []
+    if sparql_kw is not None:
+        from rag_context import fetch_entities
+
+        names = [e["name"] for e in fetch_entities(limit=args.entity_pool, **sparql_kw)]
+    return make_questions(args.requests, names)
+
+
+def run_parallel(fn, items: list, concurrency: int) -> float:
+    """Выполнить fn(item) для всех items в concurrency потоках; вернуть общее время."""
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(fn, items))
+    return time.perf_counter() - started
+
+
+# --- context ---
+
+def run_context(args) -> None:
+    from rag_context import build_context_by_question
+
+    sub_times: dict[str, list[float]] = defaultdict(list)
+    lock = threading.Lock()
+
+    def observe(name: str, seconds: float) -> None:
+        with lock:
+            sub_times[name].append(seconds)
+
+    sparql_kw = {"url": args.fuseki_url, "auth": (args.fuseki_user, args.fuseki_password), "ds": args.dataset}
+    questions = load_questions(args, sparql_kw)
+    for q in questions[: args.warmup]:
+        build_context_by_question(q, **sparql_kw)
+    sub_times.clear()
+
+    totals: list[float] = []
+    errors = 0
+
+    def one(question: str) -> None:
+        nonlocal errors
+        started = time.perf_counter()
+        try:
+            build_context_by_question(question, observe=observe, **sparql_kw)
+        except Exception:
+            with lock:
+                errors += 1
+            return
+        with lock:
+            totals.append(time.perf_counter() - started)
+
+    elapsed = run_parallel(one, questions, args.concurrency)
+    print(f"\nКонтекст: {len(questions)} вопросов, concurrency={args.concurrency}, "
+          f"{len(totals) / elapsed:.1f} req/s, ошибок: {errors}\n")
+    print(summarize("build_context_by_question", totals))
+    for name in sorted(sub_times):
+        print(summarize(f"  sparql.{name}", sub_times[name]))
+
+
+# --- api ---
+
+_BUCKET_RE = re.compile(r'^ferag_span_seconds_bucket\{(?P<labels>[^}]*)\}\s+(?P<value>\S+)$')
+
+
+def scrape_span_buckets(api_url: str, span: str) -> dict[float, float] | None:
+    """Кумулятивные бакеты гистограммы ferag_span_seconds{span=...} из /metrics; None — метрики недоступны."""
+    try:
+        r = requests.get(f"{api_url.rstrip('/')}/metrics", timeout=10)
+        r.raise_for_status()
+    except requests.RequestException:
+        return None
+    buckets: dict[float, float] = {}
+    for line in r.text.splitlines():
+        m = _BUCKET_RE.match(line)
+        if not m or f'span="{span}"' not in m.group("labels"):
+            continue
+        le = re.search(r'le="([^"]+)"', m.group("labels")).group(1)
+        buckets[float("inf") if le == "+Inf" else float(le)] = float(m.group("value"))
+    return buckets
+
+
+def histogram_quantile(q: float, buckets: dict[float, float]) -> float | None:
+    """Квантиль по кумулятивным бакетам — линейная интерполяция внутри бакета, как histogram_quantile()."""
+    bounds = sorted(buckets)
+    if not bounds or buckets[bounds[-1]] <= 0:
+        return None
+    rank = q * buckets[bounds[-1]]
+    prev_bound, prev_count = 0.0, 0.0
+    for bound in bounds:
+        count = buckets[bound]
+        if count >= rank:
+            if bound == float("inf"):
+                return prev_bound
+            if count == prev_count:
+                return bound
+            return prev_bound + (bound - prev_bound) * (rank - prev_count) / (count - prev_count)
+        prev_bound, prev_count = bound, count
+    return prev_bound
+
+
+def run_api(args) -> None:
+    api = args.api_url.rstrip("/")
+    token = args.token
+    if not token:
+        r = requests.post(f"{api}/auth/login", json={"email": args.email, "password": args.password}, timeout=10)
+        r.raise_for_status()
+        token = r.json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+    sparql_kw = None
+    if args.fuseki_url and args.dataset:
+        sparql_kw = {"url": args.fuseki_url, "auth": (args.fuseki_user, args.fuseki_password), "ds": args.dataset}
+    questions = load_questions(args, sparql_kw)
+    session = requests.Session()
+
+    def post(question: str) -> requests.Response:
+        return session.post(
+            f"{api}/rags/{args.rag_id}/chat", headers=headers, json={"question": question}, timeout=args.timeout
+        )
+
+    for q in questions[: args.warmup]:
+        post(q)
+    before = scrape_span_buckets(api, "chat.context")
+
+    totals: list[float] = []
+    statuses: dict[int, int] = defaultdict(int)
+    lock = threading.Lock()
+
+    def one(question: str) -> None:
+        started = time.perf_counter()
+        try:
+            code = post(question).status_code
+        except requests.RequestException:
+            code = 0
+        with lock:
+            statuses[code] += 1
+            if code == 200:
+                totals.append(time.perf_counter() - started)
+
+    elapsed = run_parallel(one, questions, args.concurrency)
+    after = scrape_span_buckets(api, "chat.context")
+    print(f"\nAPI: {len(questions)} запросов, concurrency={args.concurrency}, "
+          f"{len(totals) / elapsed:.1f} req/s, коды ответов: {dict(statuses)}\n")
+    print(summarize("POST /rags/{id}/chat", totals))
+    if before is None or after is None:
+        print("  (контекст: /metrics backend недоступен)")
+        return
+    delta = {le: after.get(le, 0.0) - before.get(le, 0.0) for le in after}
+    parts = []
+    for q in (0.5, 0.95, 0.99):
+        v = histogram_quantile(q, delta)
+        parts.append(f"p{int(q * 100)}={v * 1000:8.1f}" if v is not None else f"p{int(q * 100)}=       —")
+    print(f"{'  chat.context (из /metrics)':<40} n={int(delta.get(float('inf'), 0)):<6} " + "  ".join(parts) + " мс")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Нагрузочный прогон RAG-чата (p50/p95/p99)")
+    parser.add_argument("mode", choices=("context", "api"))
+    parser.add_argument("--fuseki-url", default="http://127.0.0.1:3030")
+    parser.add_argument("--fuseki-user", default="admin")
+    parser.add_argument("--fuseki-password", default="ferag2026")
+    parser.add_argument("--dataset", help="Датасет prod (context — обязателен; api — для генерации вопросов)")
+    parser.add_argument("--api-url", default="http://127.0.0.1:47821/ferag/api")
+    parser.add_argument("--rag-id", type=int)
+    parser.add_argument("--token", help="JWT (вместо --email/--password)")
+    parser.add_argument("--email")
+    parser.add_argument("--password", help="Пароль для --email")
+    parser.add_argument("--questions", help="Файл вопросов, по одному в строке")
+    parser.add_argument("--entity-pool", type=int, default=200, help="Сколько сущностей брать для шаблонов")
+    parser.add_argument("--requests", "-n", type=int, default=200)
+    parser.add_argument("--concurrency", "-c", type=int, default=4)
+    parser.add_argument("--warmup", type=int, default=5)
+    parser.add_argument("--timeout", type=float, default=120.0)
+    args = parser.parse_args()
+
+    if args.mode == "context":
+        if not args.dataset:
+            parser.error("context: нужен --dataset")
+        run_context(args)
+    else:
+        if args.rag_id is None or not (args.token or (args.email and args.password)):
+            parser.error("api: нужны --rag-id и --token или --email/--password")
+        run_api(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,5 @@
 #!/usr/bin/env python3
-"""One-off: SELECT upload_cycles for rag_id=26 (source_content length)."""
+"""One-off: SELECT upload_cycles for rag_id=26 (source size, compressed blob size)."""
 import os
 from pathlib import Path
 
@@ -19,8 +19,9 @@ engine = create_engine(url)
 with engine.connect() as conn:
     r = conn.execute(
         text(
-            "SELECT id, rag_id, cycle_n, length(source_content) AS len "
-            "FROM upload_cycles WHERE rag_id = 26 ORDER BY id DESC LIMIT 5"
+            "SELECT c.id, c.rag_id, c.cycle_n, c.source_size AS len, b.stored_size AS stored "
+            "FROM upload_cycles c LEFT JOIN source_blobs b ON b.sha256 = c.source_sha256 "
+            "WHERE c.rag_id = 26 ORDER BY c.id DESC LIMIT 5"
         )
     )
     for row in r:
@@ -0,0 +1,492 @@
+#!/usr/bin/env python3
+"""
+Локальная замена Fuseki для нагрузочных тестов и отладки без Java (в памяти).
+Хранилище — pyoxigraph (если установлен: SPARQL на Rust, параллельные запросы) или rdflib
+(медленный SPARQL — годится для функциональных проверок, не для замеров латентности).
+
+Протокол — подмножество Fuseki, которое используют backend, worker, rag_context и verify_prod:
+  GET/POST      /$/datasets                 список / создание датасета (dbName, dbType; 409 — уже есть)
+  DELETE        /$/datasets/{name}          удаление
+  GET/POST      /{ds}/query  (/{ds}/sparql) SELECT/ASK → SPARQL JSON, CONSTRUCT/DESCRIBE → Turtle
+  POST          /{ds}/update                SPARQL Update (application/sparql-update или form update=)
+  GET/PUT/POST/DELETE /{ds}/data?default | ?graph=<iri>   Graph Store Protocol (Turtle, N-Triples)
+Запросы к default graph видят только его (как Fuseki без unionDefaultGraph).
+
+Использование:
+  python scripts/fuseki_standin.py --port 3030 --load ferag-00001=graphrag-test/graphrag_output.ttl
+  python scripts/fuseki_standin.py --user admin --password ferag2026 --dataset ferag-prod --backend rdflib
+"""
+
+import argparse
+import base64
+import json
+import re
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, unquote, urlsplit
+
+try:
+    import pyoxigraph as ox
+except ImportError:
+    ox = None
+try:
+    from rdflib import Dataset, Graph, URIRef
+    from rdflib.graph import DATASET_DEFAULT_GRAPH_ID
+except ImportError:
+    Dataset = None
+
+RDF_FORMATS = {
+    "text/turtle": "turtle",
+    "application/x-turtle": "turtle",
+    "application/n-triples": "nt",
+    "text/plain": "nt",
+    "application/rdf+xml": "xml",
+    "application/ld+json": "json-ld",
+}
+
+# Операции управления графами (SPARQL 1.1 Update, разд. 3.2). rdflib 7 выполняет ADD/MOVE/COPY ... TO DEFAULT
+# без записи в default graph, поэтому запрос, состоящий только из таких операций, выполняется здесь.
+_GRAPH_REF = r"(?:DEFAULT|NAMED|ALL|(?:GRAPH\s+)?<[^>]*>)"
+_MGMT_OP_RE = re.compile(
+    rf"^\s*(CLEAR|DROP|CREATE|ADD|MOVE|COPY)\s+(SILENT\s+)?({_GRAPH_REF})(?:\s+TO\s+({_GRAPH_REF}))?\s*$",
+    re.IGNORECASE,
+)
+
+
+class RWLock:
+    """Много читателей или один писатель: запросы параллельно, update/загрузка — эксклюзивно."""
+
+    def __init__(self) -> None:
+        self._cond = threading.Condition()
+        self._readers = 0
+        self._writer = False
+
+    def read(self):
+        return _LockCtx(self._acquire_read, self._release_read)
+
+    def write(self):
+        return _LockCtx(self._acquire_write, self._release_write)
+
+    def _acquire_read(self):
+        with self._cond:
+            while self._writer:
+                self._cond.wait()
+            self._readers += 1
+
+    def _release_read(self):
+        with self._cond:
+            self._readers -= 1
+            if not self._readers:
+                self._cond.notify_all()
+
+    def _acquire_write(self):
+        with self._cond:
+            while self._writer or self._readers:
+                self._cond.wait()
+            self._writer = True
+
+    def _release_write(self):
+        with self._cond:
+            self._writer = False
+            self._cond.notify_all()
+
+
+class _LockCtx:
+    def __init__(self, acquire, release):
+        self._acquire, self._release = acquire, release
+
+    def __enter__(self):
+        self._acquire()
+
+    def __exit__(self, *exc):
+        self._release()
+
+
+class RdflibDataset:
+    """Датасет на rdflib Dataset (default graph + named graphs) под RW-блокировкой."""
+
+    def __init__(self) -> None:
+        self.ds = Dataset(default_union=False)
+        self.lock = RWLock()
+
+    def graph(self, iri: str | None) -> Graph:
+        """Граф по IRI; None — default graph."""
+        return self.ds.default_graph if iri is None else self.ds.graph(URIRef(iri))
+
+    def named_iris(self) -> list[str]:
+        return [
+            str(g.identifier) for g in self.ds.graphs()
+            if g.identifier != DATASET_DEFAULT_GRAPH_ID and len(g)
+        ]
+
+    def query(self, query: str, accept: str) -> tuple[bytes, str]:
+        with self.lock.read():
+            result = self.ds.query(query)
+            if result.type in ("CONSTRUCT", "DESCRIBE"):
+                if "n-triples" in accept:
+                    return result.graph.serialize(format="nt", encoding="utf-8"), "application/n-triples"
+                return result.graph.serialize(format="turtle", encoding="utf-8"), "text/turtle; charset=utf-8"
+            return result.serialize(format="json"), "application/sparql-results+json"
+
+    def update(self, body: str) -> None:
+        ops = _split_management_ops(body)
+        with self.lock.write():
+            if ops is None:
+                self.ds.update(body)
+            else:
+                for op in ops:
+                    self._apply_management_op(*op)
+
+    def get_graph(self, iri: str | None) -> bytes:
+        with self.lock.read():
+            return self.graph(iri).serialize(format="turtle", encoding="utf-8")
+
+    def put_graph(self, iri: str | None, data: bytes, media_type: str, replace: bool) -> None:
+        parsed = Graph()
+        parsed.parse(data=data, format=RDF_FORMATS[media_type])
+        with self.lock.write():
+            target = self.graph(iri)
+            if replace:
+                target.remove((None, None, None))
+            for t in parsed:
+                target.add(t)
+
+    def delete_graph(self, iri: str | None) -> None:
+        with self.lock.write():
+            if iri is None:
+                self.ds.default_graph.remove((None, None, None))
+            else:
+                self.ds.remove_graph(URIRef(iri))
+
+    def load_file(self, path: Path) -> int:
+        self.ds.default_graph.parse(path, format="turtle")
+        return len(self.ds.default_graph)
+
+    def _targets(self, ref: str) -> list[str | None]:
+        ref_up = ref.upper()
+        if ref_up == "DEFAULT":
+            return [None]
+        if ref_up == "NAMED":
+            return self.named_iris()
+        if ref_up == "ALL":
+            return [None, *self.named_iris()]
+        return [ref[ref.index("<") + 1:-1]]
+
+    def _apply_management_op(self, op: str, ref: str, dst: str | None) -> None:
+        if op in ("CLEAR", "DROP"):
+            for iri in self._targets(ref):
+                if iri is None:
+                    self.ds.default_graph.remove((None, None, None))
+                else:
+                    self.ds.remove_graph(URIRef(iri))
+            return
+        if op == "CREATE":
+            return  # пустой граф в rdflib неотличим от отсутствующего
+        (src_iri,) = self._targets(ref)
+        (dst_iri,) = self._targets(dst)
+        if src_iri == dst_iri:
+            return
+        src, target = self.graph(src_iri), self.graph(dst_iri)
+        triples = list(src)
+        if op in ("MOVE", "COPY"):
+            target.remove((None, None, None))
+        for t in triples:
+            target.add(t)
+        if op == "MOVE":
+            if src_iri is None:
+                src.remove((None, None, None))
+            else:
+                self.ds.remove_graph(URIRef(src_iri))
+
+
+class OxigraphDataset:
+    """Датасет на pyoxigraph.Store (в памяти): транзакционный, читатели не блокируют друг друга."""
+
+    def __init__(self) -> None:
+        self.store = ox.Store()
+
+    @staticmethod
+    def _graph(iri: str | None):
+        return ox.DefaultGraph() if iri is None else ox.NamedNode(iri)
+
+    def query(self, query: str, accept: str) -> tuple[bytes, str]:
+        result = self.store.query(query)
+        if isinstance(result, ox.QueryTriples):
+            if "n-triples" in accept:
+                return result.serialize(format=ox.RdfFormat.N_TRIPLES), "application/n-triples"
+            return result.serialize(format=ox.RdfFormat.TURTLE), "text/turtle; charset=utf-8"
+        return result.serialize(format=ox.QueryResultsFormat.JSON), "application/sparql-results+json"
+
+    def update(self, body: str) -> None:
+        self.store.update(body)
+
+    def get_graph(self, iri: str | None) -> bytes:
+        return self.store.dump(format=ox.RdfFormat.TURTLE, from_graph=self._graph(iri))
+
+    def put_graph(self, iri: str | None, data: bytes, media_type: str, replace: bool) -> None:
+        graph = self._graph(iri)
+        fmt = ox.RdfFormat.from_media_type(media_type)
+        if replace:
+            # Разбор до очистки: невалидный Turtle не должен стирать граф
+            parsed = ox.Store()
+            parsed.load(input=data, format=fmt, to_graph=ox.DefaultGraph())
+            quads = [ox.Quad(q.subject, q.predicate, q.object, graph) for q in parsed]
+            self.store.clear_graph(graph)
+            self.store.extend(quads)
+        else:
+            self.store.load(input=data, format=fmt, to_graph=graph)
+
+    def delete_graph(self, iri: str | None) -> None:
+        if iri is None:
+            self.store.clear_graph(ox.DefaultGraph())
+        else:
+            self.store.remove_graph(ox.NamedNode(iri))
+
+    def load_file(self, path: Path) -> int:
+        self.store.bulk_load(path=str(path), format=ox.RdfFormat.TURTLE, to_graph=ox.DefaultGraph())
+        return sum(1 for _ in self.store.quads_for_pattern(None, None, None, ox.DefaultGraph()))
+
+
+def _split_management_ops(body: str):
+    """Список (op, ref, dst), если запрос состоит только из операций управления графами; иначе None."""
+    ops = []
+    for part in body.split(";"):
+        if not part.strip():
+            continue
+        m = _MGMT_OP_RE.match(part)
+        if not m:
+            return None
+        op, _, ref, dst = m.groups()
+        op = op.upper()
+        if (op in ("ADD", "MOVE", "COPY")) != (dst is not None):
+            return None
+        ops.append((op, ref, dst))
+    return ops or None
+
+
+class Standin:
+    """Набор датасетов сервера."""
+
+    def __init__(self, dataset_cls, auth: tuple[str, str] | None = None) -> None:
+        self.dataset_cls = dataset_cls
+        self.auth = auth
+        self.datasets: dict = {}
+        self.lock = threading.Lock()
+
+    def create(self, name: str) -> bool:
+        with self.lock:
+            if name in self.datasets:
+                return False
+            self.datasets[name] = self.dataset_cls()
+            return True
+
+    def delete(self, name: str) -> bool:
+        with self.lock:
+            return self.datasets.pop(name, None) is not None
+
+    def get(self, name: str):
+        with self.lock:
+            return self.datasets.get(name)
+
+
+class Handler(BaseHTTPRequestHandler):
+    server_version = "FusekiStandin/1.0"
+    standin: Standin
+    quiet = True
+
+    # --- утилиты ---
+
+    def log_message(self, fmt, *args):
+        if not self.quiet:
+            super().log_message(fmt, *args)
+
+    def _send(self, code: int, body: bytes | str = b"", content_type: str = "text/plain; charset=utf-8") -> None:
+        if isinstance(body, str):
+            body = body.encode("utf-8")
+        self.send_response(code)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if self.command != "HEAD":
+            self.wfile.write(body)
+
+    def _body(self) -> bytes:
+        length = int(self.headers.get("Content-Length") or 0)
+        return self.rfile.read(length) if length else b""
+
+    def _authorized(self) -> bool:
+        if self.standin.auth is None:
+            return True
+        header = self.headers.get("Authorization", "")
+        if not header.startswith("Basic "):
+            return False
+        try:
+            user, _, password = base64.b64decode(header[6:]).decode("utf-8").partition(":")
+        except ValueError:
+            return False
+        return (user, password) == self.standin.auth
+
+    def _route(self):
+        if not self._authorized():
+            self.send_response(401)
+            self.send_header("WWW-Authenticate", 'Basic realm="fuseki"')
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        parts = urlsplit(self.path)
+        path = unquote(parts.path).strip("/")
+        params = parse_qs(parts.query, keep_blank_values=True)
+        try:
+            if path == "$/ping":
+                self._send(200, "ok")
+            elif path == "$/datasets" or path.startswith("$/datasets/"):
+                self._admin(path[len("$/datasets"):].strip("/"))
+            else:
+                ds_name, _, service = path.partition("/")
+                ds = self.standin.get(ds_name)
+                if ds is None:
+                    self._send(404, f"No dataset: /{ds_name}")
+                elif service in ("query", "sparql", ""):
+                    self._query(ds, params)
+                elif service == "update":
+                    self._update(ds)
+                elif service == "data":
+                    self._graph_store(ds, params)
+                else:
+                    self._send(404, f"No service: {service}")
+        except Exception as e:  # noqa: BLE001 — ответ 400 с текстом ошибки, как у Fuseki
+            self._send(400, f"Error: {e}")
+
+    do_GET = do_POST = do_PUT = do_DELETE = do_HEAD = _route
+
+    # --- /$/datasets ---
+
+    def _admin(self, name: str) -> None:
+        if self.command == "GET" and not name:
+            with self.standin.lock:
+                names = sorted(self.standin.datasets)
+            body = {"datasets": [{"ds.name": f"/{n}", "ds.state": True} for n in names]}
+            self._send(200, json.dumps(body), "application/json")
+        elif self.command == "POST" and not name:
+            form = parse_qs(self._body().decode("utf-8"))
+            db_name = (form.get("dbName") or [""])[0].strip("/")
+            if not db_name:
+                self._send(400, "dbName required")
+            elif self.standin.create(db_name):
+                self._send(200)
+            else:
+                self._send(409, f"Name already registered /{db_name}")
+        elif self.command == "DELETE" and name:
+            self._send(200 if self.standin.delete(name) else 404)
+        else:
+            self._send(405)
+
+    # --- SPARQL ---
+
+    def _query(self, ds, params: dict) -> None:
+        if self.command == "POST":
+            ctype = self.headers.get("Content-Type", "")
+            body = self._body().decode("utf-8")
+            if ctype.startswith("application/sparql-query"):
+                query = body
+            else:
+                query = (parse_qs(body).get("query") or [""])[0]
+        else:
+            query = (params.get("query") or [""])[0]
+        if not query:
+            self._send(400, "No query")
+            return
+        body, ctype = ds.query(query, self.headers.get("Accept", ""))
+        self._send(200, body, ctype)
+
+    def _update(self, ds) -> None:
+        if self.command != "POST":
+            self._send(405)
+            return
+        ctype = self.headers.get("Content-Type", "")
+        body = self._body().decode("utf-8")
+        if not ctype.startswith("application/sparql-update"):
+            body = (parse_qs(body).get("update") or [""])[0]
+        ds.update(body)
+        self._send(200)
+
+    # --- Graph Store Protocol ---
+
+    def _graph_store(self, ds, params: dict) -> None:
+        if "graph" in params:
+            iri = params["graph"][0]
+        elif "default" in params:
+            iri = None
+        else:
+            self._send(400, "?default or ?graph= required")
+            return
+        if self.command == "GET":
+            self._send(200, ds.get_graph(iri), "text/turtle; charset=utf-8")
+        elif self.command == "DELETE":
+            ds.delete_graph(iri)
+            self._send(204)
+        elif self.command in ("PUT", "POST"):
+            media_type = self.headers.get("Content-Type", "text/turtle").split(";")[0].strip()
+            if media_type not in RDF_FORMATS:
+                self._send(415, f"Unsupported Content-Type {media_type}")
+                return
+            ds.put_graph(iri, self._body(), media_type, replace=self.command == "PUT")
+            self._send(201 if self.command == "PUT" else 200)
+        else:
+            self._send(405)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Fuseki stand-in (rdflib, в памяти)")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=3030)
+    parser.add_argument("--user", help="Basic auth: пользователь (без --user авторизация не проверяется)")
+    parser.add_argument("--password", default="")
+    parser.add_argument("--dataset", action="append", default=[], help="Создать пустой датасет (повторяемый)")
+    parser.add_argument(
+        "--load", action="append", default=[], metavar="DS=FILE.ttl",
+        help="Создать датасет и загрузить TTL в default graph (повторяемый)",
+    )
+    parser.add_argument(
+        "--backend", choices=("auto", "oxigraph", "rdflib"), default="auto",
+        help="Хранилище: auto — pyoxigraph, если установлен, иначе rdflib",
+    )
+    parser.add_argument("--verbose", "-v", action="store_true", help="Логировать запросы")
+    args = parser.parse_args()
+
+    backend = args.backend
+    if backend == "auto":
+        backend = "oxigraph" if ox is not None else "rdflib"
+    if backend == "oxigraph" and ox is None:
+        parser.error("pyoxigraph не установлен: pip install pyoxigraph")
+    if backend == "rdflib" and Dataset is None:
+        parser.error("rdflib не установлен: pip install rdflib")
+    dataset_cls = OxigraphDataset if backend == "oxigraph" else RdflibDataset
+    standin = Standin(dataset_cls, auth=(args.user, args.password) if args.user else None)
+    for name in args.dataset:
+        standin.create(name)
+    for spec in args.load:
+        name, _, path = spec.partition("=")
+        if not path:
+            parser.error(f"--load ожидает DS=FILE, получено {spec}")
+        standin.create(name)
+        count = standin.get(name).load_file(Path(path))
+        print(f"  /{name}: {count} триплетов из {path}")
+
+    handler = type("StandinHandler", (Handler,), {"standin": standin, "quiet": not args.verbose})
+    server = ThreadingHTTPServer((args.host, args.port), handler)
+    print(
+        f"Fuseki stand-in ({backend}): http://{args.host}:{args.port} "
+        f"(датасеты: {', '.join(sorted(standin.datasets)) or 'нет'})"
+    )
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,445 @@
+#!/usr/bin/env python3
+"""
+Заглушка OpenAI-совместимого LLM API (вместо LM Studio с 70B-моделью) для замеров пропускной
+способности цикла и чата без GPU: graphrag index, schema induction, rag_llm.call_llm.
+
+  POST /v1/chat/completions   ответ по типу промпта (см. ниже), stream=true — SSE по токенам
+  POST /v1/embeddings         детерминированные нормированные векторы (--embedding-dim)
+  GET  /v1/models             модели --model и --embedding-model
+  GET  /stats                 счётчики: запросы по типам, токены, пик одновременных, отказы 429
+
+Ответ определяется по промпту и детерминирован (зависит только от текста запроса):
+  extract      — extract_graph graphrag: кортежи ("entity"<|>...) / ("relationship"<|>...) из
+                 капитализированных слов входного текста, <|COMPLETE|>; gleaning — пустое продолжение / N
+  report       — community_report: JSON с title/summary/rating/findings
+  summarize    — summarize_descriptions: склейка описаний
+  schema       — schema induction: Turtle-онтология (owl:Class по типам, owl:ObjectProperty по связям)
+  chat         — всё остальное (RAG-чат): --answer
+
+Время ответа: --ttft (до первого токена) + completion_tokens / --tokens-per-sec; токены ≈ символы / 4.
+--max-concurrency ограничивает одновременную генерацию (как слоты LM Studio): сверх лимита запрос
+ждёт в очереди или, с --when-busy 429, получает 429 Too Many Requests (проверка retry клиентов).
+
+Использование:
+  python scripts/mock_llm.py --port 41234 --ttft 0.3 --tokens-per-sec 40 --max-concurrency 4
+  LLM_API_URL=http://127.0.0.1:41234/v1 — в .env backend и worker (graphrag берёт его же через settings.yaml)
+"""
+
+import argparse
+import hashlib
+import json
+import math
+import re
+import threading
+import time
+import uuid
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_ANSWER = "По данным графа знаний: ответ заглушки LLM для нагрузочного теста."
+CHARS_PER_TOKEN = 4
+
+_NAME_RE = re.compile(r"\b[A-ZА-ЯЁ][\w'-]+(?:\s+[A-ZА-ЯЁ][\w'-]+)*")
+_ENTITY_TYPES_RE = re.compile(r"Entity_types:\s*\[?([^\]\n]*)")
+_SCHEMA_TYPE_RE = re.compile(r"^\s*-\s*(\S[^:\n]*):\s*\d+\s+entities\s*$", re.MULTILINE)
+_SCHEMA_TRIPLET_RE = re.compile(r"^\s*-\s*(.+?)\s*->\s*(.+?):\s*(.*)$", re.MULTILINE)
+_STOPWORDS = {
+    "The", "A", "An", "In", "On", "At", "It", "This", "That", "He", "She", "They", "We", "And", "But",
+    # Заголовки таблиц во входе community_report
+    "Entities", "Relationships", "Claims",
+}
+
+
+def count_tokens(text: str) -> int:
+    return max(1, len(text) // CHARS_PER_TOKEN) if text else 0
+
+
+def _seed(text: str) -> int:
+    return int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "big")
+
+
+def _section(prompt: str, marker: str) -> str:
+    """Текст после последнего вхождения marker (реальные данные идут после примеров)."""
+    i = prompt.rfind(marker)
+    return prompt[i + len(marker):] if i >= 0 else prompt
+
+
+def _names(text: str, limit: int) -> list[str]:
+    seen: dict[str, None] = {}
+    for m in _NAME_RE.finditer(text):
+        name = m.group(0).strip()
+        if name in _STOPWORDS or len(name) < 3:
+            continue
+        seen.setdefault(name.upper(), None)
+        if len(seen) >= limit:
+            break
+    return list(seen)
+
+
+# --- ответы по типам промптов ---
+
+def classify(messages: list[dict]) -> str:
+    last = str(messages[-1].get("content", "")) if messages else ""
+    prompt = "\n".join(str(m.get("content", "")) for m in messages)
+    if "MANY entities and relationships were missed" in last:
+        return "extract_gleaning"
+    if "Answer Y if there are still entities" in last or "Answer Y or N" in last:
+        return "extract_loop"
+    if '("entity"' in prompt and "Entity_types:" in prompt:
+        return "extract"
+    if '"rating_explanation"' in prompt:
+        return "report"
+    if "Description List:" in prompt:
+        return "summarize"
+    if "owl:Class" in prompt and "Turtle" in prompt:
+        return "schema"
+    return "chat"
+
+
+def answer_extract(prompt: str) -> str:
+    text = _section(prompt, "Text:")
+    text = text.split("######################")[0]
+    m = _ENTITY_TYPES_RE.search(_section(prompt, "-Real Data-"))
+    types = [t.strip().upper() for t in (m.group(1) if m else "").split(",") if t.strip()] or ["ORGANIZATION"]
+    names = _names(text, 12)
+    records = []
+    for i, name in enumerate(names):
+        etype = types[_seed(name) % len(types)]
+        records.append(f'("entity"<|>{name}<|>{etype}<|>{name.title()} is a {etype.lower()} mentioned in the text)')
+    for a, b in zip(names, names[1:]):
+        strength = 1 + _seed(a + b) % 9
+        records.append(f'("relationship"<|>{a}<|>{b}<|>{a.title()} is related to {b.title()}<|>{strength})')
+    return "\n##\n".join(records) + "\n<|COMPLETE|>"
+
+
+def answer_report(prompt: str) -> str:
+    names = _names(_section(prompt, "Text:"), 6) or ["UNKNOWN COMMUNITY"]
+    title = " and ".join(n.title() for n in names[:2])
+    rating = float(1 + _seed(title) % 9)
+    return json.dumps({
+        "title": title,
+        "summary": f"The community revolves around {', '.join(n.title() for n in names)}.",
+        "rating": rating,
+        "rating_explanation": f"The impact severity rating is {rating} for a synthetic community.",
+        "findings": [
+            {
+                "summary": f"{name.title()} in the community",
+                "explanation": f"{name.title()} is one of the key entities of this community. [Data: Entities (0)]",
+            }
+            for name in names[:5]
+        ],
+    }, ensure_ascii=False, indent=4)
+
+
+def answer_summarize(prompt: str) -> str:
+    data = _section(prompt, "Description List:").split("#######")[0].strip()
+    try:
+        descriptions = json.loads(data)
+    except ValueError:
+        descriptions = [data]
+    if not isinstance(descriptions, list):
+        descriptions = [str(descriptions)]
+    return " ".join(str(d).strip().rstrip(".") + "." for d in descriptions if str(d).strip())
+
+
+def _local_name(text: str) -> str:
+    words = re.findall(r"[A-Za-zА-Яа-яЁё0-9]+", text)
+    return "".join(w[:1].upper() + w[1:].lower() for w in words) or "Thing"
+
+
+def answer_schema(prompt: str) -> str:
+    classes = [_local_name(t) for t in _SCHEMA_TYPE_RE.findall(prompt)] or ["Entity"]
+    props: dict[str, None] = {}
+    for _, _, desc in _SCHEMA_TRIPLET_RE.findall(prompt):
+        words = desc.split()
+        if len(words) >= 3:
+            name = _local_name(" ".join(words[1:3]))
+            props.setdefault(name[:1].lower() + name[1:], None)
+        if len(props) >= 20:
+            break
+    lines = [
+        "@prefix : <http://example.org/ferag/schema#> .",
+        "@prefix owl: <http://www.w3.org/2002/07/owl#> .",
+        "@prefix rdfs: <http://www.w3.org/2000/01/rdf-schema#> .",
+        "",
+    ]
+    for cls in classes:
+        lines.append(f":{cls} a owl:Class ; rdfs:label \"{cls}\" .")
+    for i, prop in enumerate(props or ["relatedTo"]):
+        domain, rng = classes[i % len(classes)], classes[(i + 1) % len(classes)]
+        lines.append(f":{prop} a owl:ObjectProperty ; rdfs:domain :{domain} ; rdfs:range :{rng} .")
+    return "```turtle\n" + "\n".join(lines) + "\n```"
+
+
+def make_answer(kind: str, prompt: str, default_answer: str) -> str:
+    if kind == "extract":
+        return answer_extract(prompt)
+    if kind == "extract_gleaning":
+        return "<|COMPLETE|>"
+    if kind == "extract_loop":
+        return "N"
+    if kind == "report":
+        return answer_report(prompt)
+    if kind == "summarize":
+        return answer_summarize(prompt)
+    if kind == "schema":
+        return answer_schema(prompt)
+    return default_answer
+
+
+def embedding(text: str, dim: int) -> list[float]:
+    """Детерминированный единичный вектор из SHA-256 текста."""
+    raw = b""
+    counter = 0
+    while len(raw) < dim:
+        raw += hashlib.sha256(f"{counter}:{text}".encode("utf-8")).digest()
+        counter += 1
+    vec = [b / 127.5 - 1.0 for b in raw[:dim]]
+    norm = math.sqrt(sum(v * v for v in vec)) or 1.0
+    return [v / norm for v in vec]
+
+
+# --- сервер ---
+
+class Stats:
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.requests: Counter = Counter()
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.rejected = 0
+
+    def start(self, kind: str, prompt_tokens: int) -> None:
+        with self.lock:
+            self.requests[kind] += 1
+            self.prompt_tokens += prompt_tokens
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+
+    def finish(self, completion_tokens: int) -> None:
+        with self.lock:
+            self.completion_tokens += completion_tokens
+            self.in_flight -= 1
+
+    def reject(self) -> None:
+        with self.lock:
+            self.rejected += 1
+
+    def snapshot(self) -> dict:
+        with self.lock:
+            return {
+                "requests": dict(self.requests),
+                "prompt_tokens": self.prompt_tokens,
+                "completion_tokens": self.completion_tokens,
+                "in_flight": self.in_flight,
+                "max_in_flight": self.max_in_flight,
+                "rejected": self.rejected,
+            }
+
+
+class Handler(BaseHTTPRequestHandler):
+    server_version = "MockLLM/2.0"
+    model = "mock-llm"
+    embedding_model = "mock-embedding"
+    embedding_dim = 768
+    answer = DEFAULT_ANSWER
+    ttft = 0.0
+    tokens_per_sec = 0.0
+    slots: threading.BoundedSemaphore | None = None
+    reject_when_busy = False
+    stats: Stats = Stats()
+
+    def log_message(self, fmt, *args):
+        pass
+
+    def _json(self, code: int, payload: dict, headers: dict | None = None) -> None:
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for k, v in (headers or {}).items():
+            self.send_header(k, v)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _error(self, code: int, message: str, err_type: str = "invalid_request_error", headers=None) -> None:
+        self._json(code, {"error": {"message": message, "type": err_type}}, headers)
+
+    def do_GET(self):
+        path = self.path.rstrip("/")
+        if path.endswith("/models"):
+            self._json(200, {"object": "list", "data": [
+                {"id": m, "object": "model", "owned_by": "mock"} for m in (self.model, self.embedding_model)
+            ]})
+        elif path == "/stats":
+            self._json(200, self.stats.snapshot())
+        else:
+            self._error(404, f"unknown path {self.path}")
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        try:
+            req = json.loads(self.rfile.read(length) or b"{}")
+        except json.JSONDecodeError:
+            self._error(400, "invalid JSON")
+            return
+        path = self.path.rstrip("/")
+        if path.endswith("/chat/completions"):
+            self._chat(req)
+        elif path.endswith("/embeddings"):
+            self._embeddings(req)
+        else:
+            self._error(404, f"unknown path {self.path}")
+
+    def _embeddings(self, req: dict) -> None:
+        inputs = req.get("input", "")
+        if isinstance(inputs, str):
+            inputs = [inputs]
+        data = [
+            {"object": "embedding", "index": i, "embedding": embedding(str(text), self.embedding_dim)}
+            for i, text in enumerate(inputs)
+        ]
+        tokens = sum(count_tokens(str(t)) for t in inputs)
+        self.stats.start("embeddings", tokens)
+        self.stats.finish(0)
+        self._json(200, {
+            "object": "list",
+            "data": data,
+            "model": req.get("model") or self.embedding_model,
+            "usage": {"prompt_tokens": tokens, "total_tokens": tokens},
+        })
+
+    def _acquire_slot(self) -> bool:
+        if self.slots is None:
+            return True
+        if self.reject_when_busy:
+            return self.slots.acquire(blocking=False)
+        self.slots.acquire()
+        return True
+
+    def _chat(self, req: dict) -> None:
+        messages = req.get("messages") or []
+        prompt = "\n".join(str(m.get("content", "")) for m in messages)
+        kind = classify(messages)
+        content = make_answer(kind, prompt, self.answer)
+        finish_reason = "stop"
+        max_tokens = req.get("max_tokens") or req.get("max_completion_tokens")
+        if max_tokens and count_tokens(content) > max_tokens:
+            content = content[: max_tokens * CHARS_PER_TOKEN]
+            finish_reason = "length"
+        if isinstance(req.get("response_format"), dict) and req["response_format"].get("type") == "json_object":
+            if kind != "report":
+                content = json.dumps({"answer": content}, ensure_ascii=False)
+
+        if not self._acquire_slot():
+            self.stats.reject()
+            self._error(429, "Too many concurrent requests", "rate_limit_error", {"Retry-After": "1"})
+            return
+        prompt_tokens = count_tokens(prompt)
+        completion_tokens = count_tokens(content)
+        self.stats.start(kind, prompt_tokens)
+        try:
+            meta = {
+                "id": f"chatcmpl-{uuid.uuid4().hex[:12]}",
+                "created": int(time.time()),
+                "model": req.get("model") or self.model,
+            }
+            usage = {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens,
+            }
+            if req.get("stream"):
+                include_usage = bool((req.get("stream_options") or {}).get("include_usage"))
+                self._stream(meta, content, finish_reason, usage if include_usage else None)
+                return
+            time.sleep(self.ttft + (completion_tokens / self.tokens_per_sec if self.tokens_per_sec else 0.0))
+            self._json(200, {
+                **meta,
+                "object": "chat.completion",
+                "choices": [{
+                    "index": 0,
+                    "message": {"role": "assistant", "content": content},
+                    "finish_reason": finish_reason,
+                }],
+                "usage": usage,
+            })
+        finally:
+            self.stats.finish(completion_tokens)
+            if self.slots is not None:
+                self.slots.release()
+
+    def _stream(self, meta: dict, content: str, finish_reason: str, usage: dict | None) -> None:
+        """SSE как у OpenAI: role, затем content по ~токену с темпом --tokens-per-sec, finish, [DONE]."""
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+
+        def send(delta: dict, finish: str | None = None, extra: dict | None = None) -> None:
+            chunk = {**meta, "object": "chat.completion.chunk",
+                     "choices": [{"index": 0, "delta": delta, "finish_reason": finish}], **(extra or {})}
+            self.wfile.write(f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n".encode("utf-8"))
+            self.wfile.flush()
+
+        time.sleep(self.ttft)
+        send({"role": "assistant", "content": ""})
+        pieces = [content[i:i + CHARS_PER_TOKEN] for i in range(0, len(content), CHARS_PER_TOKEN)]
+        interval = 1.0 / self.tokens_per_sec if self.tokens_per_sec else 0.0
+        for piece in pieces:
+            if interval:
+                time.sleep(interval)
+            send({"content": piece})
+        send({}, finish_reason)
+        if usage is not None:
+            chunk = {**meta, "object": "chat.completion.chunk", "choices": [], "usage": usage}
+            self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.wfile.flush()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Заглушка OpenAI-совместимого LLM API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=41234)
+    parser.add_argument("--model", default="mock-llm")
+    parser.add_argument("--embedding-model", default="mock-embedding")
+    parser.add_argument("--embedding-dim", type=int, default=768)
+    parser.add_argument("--ttft", type=float, default=0.0, help="Время до первого токена, с")
+    parser.add_argument("--tokens-per-sec", type=float, default=0.0, help="Скорость генерации; 0 — мгновенно")
+    parser.add_argument("--max-concurrency", type=int, default=0, help="Одновременных генераций; 0 — без лимита")
+    parser.add_argument(
+        "--when-busy", choices=("queue", "429"), default="queue",
+        help="Сверх --max-concurrency: ждать слот или отвечать 429",
+    )
+    parser.add_argument("--answer", default=DEFAULT_ANSWER, help="Ответ на промпты чата")
+    args = parser.parse_args()
+
+    handler = type("MockLLMHandler", (Handler,), {
+        "model": args.model,
+        "embedding_model": args.embedding_model,
+        "embedding_dim": args.embedding_dim,
+        "answer": args.answer,
+        "ttft": args.ttft,
+        "tokens_per_sec": args.tokens_per_sec,
+        "slots": threading.BoundedSemaphore(args.max_concurrency) if args.max_concurrency > 0 else None,
+        "reject_when_busy": args.when_busy == "429",
+        "stats": Stats(),
+    })
+    server = ThreadingHTTPServer((args.host, args.port), handler)
+    print(
+        f"Mock LLM: http://{args.host}:{args.port}/v1 (model={args.model}, ttft={args.ttft}s, "
+        f"{args.tokens_per_sec or '∞'} tok/s, concurrency={args.max_concurrency or '∞'}, busy={args.when_busy})"
+    )
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -70,16 +70,18 @@ def main():
     print(f"   OK, cycle_id={cycle_id}, task_id={task_id}")
 
     print("5. WebSocket: wait for status 'done' (polling /tasks/{id})...")
+    # ETag: пока задача не изменилась, сервер отвечает 304 без тела
+    etag, t = None, {}
     for _ in range(1440):  # 2 hours
-        r = requests.get(
-            f"{BASE_URL}/tasks/{task_id}",
-            headers={"Authorization": f"Bearer {token}"},
-            timeout=5,
-        )
-        r.raise_for_status()
-        t = r.json()
+        headers = {"Authorization": f"Bearer {token}"}
+        if etag:
+            headers["If-None-Match"] = etag
+        r = requests.get(f"{BASE_URL}/tasks/{task_id}", headers=headers, timeout=5)
+        if r.status_code != 304:
+            r.raise_for_status()
+            etag, t = r.headers.get("ETag"), r.json()
         status = t.get("status")
-        print(f"   status={status}")
+        print(f"   status={status} step={t.get('step') or ''}")
         if status == "done":
             break
         if status == "failed":